@@ -1,6 +1,7 @@
-import openai
 import os
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
+
+from app.services.llm_gateway import LlmGateway
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -9,14 +10,15 @@ load_dotenv()
 class ProofReaderAgent:
     """Agent responsible for reviewing and improving paper summaries"""
     
-    def __init__(self):
-        # Initialize OpenAI client (assuming API key is set in environment variables)
-        self.client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    def __init__(self, gateway: Optional[LlmGateway] = None):
+        # Chat completions go through the gateway shared by all agents (rate limits, retries)
+        self.gateway = gateway or LlmGateway()
         
-    def review_summary(
+    async def review_summary(
         self, 
         draft_summary: Dict[str, Any],
-        full_text: str
+        full_text: str,
+        on_token: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
         """
         Review and improve a draft summary to make it brief and precise
@@ -24,6 +26,7 @@ class ProofReaderAgent:
         Args:
             draft_summary: Draft summary generated by the SummaryWriterAgent
             full_text: Full text of the paper
+            on_token: Stream the improved summary, calling this with each piece as it arrives
             
         Returns:
             Improved summary dictionary with plain text only
@@ -59,24 +62,21 @@ class ProofReaderAgent:
         3. Keep it brief but comprehensive (3-4 paragraphs maximum)
         4. Make sure the language is clear and direct
         
-        First few paragraphs of the paper:
-        {full_text[:5000]}
+        {self._paper_context(draft_summary, full_text)}
         """
         
         # Generate improved summary using OpenAI API
-        response = self.client.chat.completions.create(
+        improved_summary_text = await self.gateway.chat(
             model="gpt-4-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             temperature=0.3,
-            max_tokens=1000
+            max_tokens=1000,
+            on_token=on_token
         )
         
-        # Extract improved summary text - plain text only
-        improved_summary_text = response.choices[0].message.content
-        
         # Clean up any markdown that might have been included despite instructions
         # improved_summary_text = self._clean_markdown(improved_summary_text)
         
@@ -91,6 +91,24 @@ class ProofReaderAgent:
         
         return result
     
+    def _paper_context(self, draft_summary: Dict[str, Any], full_text: str) -> str:
+        """
+        Build the paper excerpt the draft is checked against
+        
+        Args:
+            draft_summary: Draft summary generated by the SummaryWriterAgent
+            full_text: Full text of the paper
+            
+        Returns:
+            Prompt section with paper context
+        """
+        # Long-document drafts come with per-section summaries covering the whole paper
+        section_summaries = draft_summary.get("section_summaries")
+        if section_summaries:
+            return "Summaries of each part of the full paper:\n" + "\n\n".join(section_summaries)
+            
+        return f"First few paragraphs of the paper:\n{full_text[:5000]}"
+    
     # def _clean_markdown(self, text: str) -> str:
     #     """
     #     Remove markdown formatting from text
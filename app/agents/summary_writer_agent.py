@@ -1,7 +1,10 @@
-import openai
+import asyncio
 import os
 import re
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional
+
+from app.services.llm_gateway import LlmGateway
+from app.services.text_chunker import chunk_text, estimate_tokens
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -10,22 +13,39 @@ load_dotenv()
 class SummaryWriterAgent:
     """Agent responsible for generating initial paper summaries"""
     
-    def __init__(self):
-        # Initialize OpenAI client (assuming API key is set in environment variables)
-        self.client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+    def __init__(self, gateway: Optional[LlmGateway] = None):
+        # Chat completions go through the gateway shared by all agents (rate limits, retries)
+        self.gateway = gateway or LlmGateway()
         
-    def generate_summary(
-        self, 
-        full_text: str
-    ) -> Dict[str, Any]:
+        # Long-document (map-reduce) settings
+        self.summary_mode = os.environ.get("SUMMARY_MODE", "short")  # short, auto, long
+        self.long_document_threshold = int(os.environ.get("LONG_DOCUMENT_THRESHOLD_CHARS", "12000"))
+        self.chunk_tokens = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "3000"))
+        self.max_parallel_calls = int(os.environ.get("LLM_MAX_PARALLEL_PER_PAPER", "4"))
+        
+    def is_long_document(self, full_text: str) -> bool:
         """
-        Generate a brief summary of a research paper clearly outlining methodologies and key ideas
+        Whether a paper is summarized chunk by chunk (map-reduce) rather than from its beginning
         
         Args:
             full_text: Full text of the paper
             
         Returns:
-            Dictionary containing summary sections
+            True for map-reduce summarization, as decided by SUMMARY_MODE and the text length
+        """
+        return self.summary_mode == "long" or (
+            self.summary_mode == "auto" and len(full_text) > self.long_document_threshold
+        )
+        
+    def draft_request(self, full_text: str) -> Dict[str, Any]:
+        """
+        Build the chat completion request for a summary of the beginning of a paper
+        
+        Args:
+            full_text: Full text of the paper
+            
+        Returns:
+            Request body (model, messages, temperature, max_tokens)
         """
         # Prepare prompt for the LLM
         system_prompt = """
@@ -51,26 +71,186 @@ class SummaryWriterAgent:
         Important: Provide your response as plain text only, without any markdown formatting, lists, or bullet points.
         """
         
-        # Generate summary using OpenAI API
-        response = self.client.chat.completions.create(
-            model="gpt-4-turbo",  # or any appropriate model
-            messages=[
+        return {
+            "model": "gpt-4-turbo",  # or any appropriate model
+            "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
-            temperature=0.3,  # Lower temperature for more focused output
-            max_tokens=1000
-        )
+            "temperature": 0.3,  # Lower temperature for more focused output
+            "max_tokens": 1000
+        }
+        
+    async def generate_summary(
+        self, 
+        full_text: str,
+        long_document: Optional[bool] = None,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Generate a brief summary of a research paper clearly outlining methodologies and key ideas
         
-        # Extract summary text
-        summary_text = response.choices[0].message.content
+        Args:
+            full_text: Full text of the paper
+            long_document: Summarize the whole paper chunk by chunk (map-reduce) instead of
+                only its beginning; by default decided by SUMMARY_MODE and the text length
+            on_token: Stream the summary text, calling this with each piece as it arrives
+                (for long documents only the final merge is streamed)
+            
+        Returns:
+            Dictionary containing summary sections
+        """
+        if long_document is None:
+            long_document = self.is_long_document(full_text)
+        if long_document:
+            return await self._generate_long_summary(full_text, on_token)
+            
+        # Generate summary using OpenAI API
+        summary_text = await self.gateway.chat(**self.draft_request(full_text), on_token=on_token)
         
         # Extract specific sections using a more robust method
-        sections = self._extract_sections_from_summary(summary_text)
+        return self.extract_sections(summary_text)
+        
+    async def _generate_long_summary(
+        self,
+        full_text: str,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Summarize a full-length paper with map-reduce over section-bounded chunks
         
+        Args:
+            full_text: Full text of the paper
+            on_token: Callback streaming the text of the final merge
+            
+        Returns:
+            Dictionary containing summary sections, plus the per-chunk summaries
+        """
+        chunks = chunk_text(full_text, max_tokens=self.chunk_tokens)
+        if not chunks:
+            chunks = [full_text[:5000]]
+        
+        # Map: summarize chunks concurrently, bounded by the per-paper parallelism knob
+        semaphore = asyncio.Semaphore(max(1, self.max_parallel_calls))
+        
+        async def bounded(call):
+            async with semaphore:
+                return await call
+                
+        section_summaries = list(await asyncio.gather(*(
+            bounded(self._summarize_chunk(chunk, index, len(chunks)))
+            for index, chunk in enumerate(chunks)
+        )))
+        
+        # Reduce: merge partial summaries, in rounds if they don't fit in one prompt
+        partials = section_summaries
+        while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > self.chunk_tokens:
+            groups = chunk_text("\n\n".join(partials), max_tokens=self.chunk_tokens, drop_references=False)
+            if len(groups) >= len(partials):
+                break
+            partials = list(await asyncio.gather(*(bounded(self._reduce_summaries(group)) for group in groups)))
+        
+        summary_text = await self._reduce_summaries("\n\n".join(partials), final=True, on_token=on_token)
+        sections = self.extract_sections(summary_text)
+        sections["section_summaries"] = section_summaries
         return sections
         
-    def _extract_sections_from_summary(self, summary_text: str) -> Dict[str, Any]:
+    async def _summarize_chunk(self, chunk: str, index: int, total: int) -> str:
+        """
+        Summarize one chunk of a long paper (the map step)
+        
+        Args:
+            chunk: Chunk text
+            index: Zero-based position of the chunk in the paper
+            total: Total number of chunks
+            
+        Returns:
+            Plain text summary of the chunk
+        """
+        system_prompt = """
+        You are a research paper summarization expert. You will receive one part of a longer
+        academic paper. Summarize this part in one short paragraph, capturing every methodology,
+        key idea, result and number it contains. Use plain text only, without markdown or lists.
+        """
+        
+        user_prompt = f"""
+        Part {index + 1} of {total} of the paper:
+        
+        {chunk}
+        """
+        
+        return await self._complete(system_prompt, user_prompt, max_tokens=400)
+        
+    async def _reduce_summaries(
+        self,
+        partial_summaries: str,
+        final: bool = False,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Combine partial summaries into one summary (the reduce step)
+        
+        Args:
+            partial_summaries: Partial summaries in document order
+            final: Whether this produces the final paper summary
+            on_token: Callback streaming the combined summary
+            
+        Returns:
+            Combined plain text summary
+        """
+        system_prompt = """
+        You are a research paper summarization expert. You will receive summaries of consecutive
+        parts of one academic paper. Combine them into a single brief summary focusing on:
+        
+        1. The main findings of the research and their usecases
+        2. ALL methodologies used 
+        3. The key ideas presented in the paper
+        4. The results and implications of the research
+        5. Future directions or recommendations if mentioned
+        
+        Use plain text format only. Do not use markdown formatting, lists, bullets, or headers.
+        """
+        
+        length = "about 3-4 paragraphs maximum" if final else "one or two paragraphs"
+        user_prompt = f"""
+        Combine these summaries of the paper's parts into one summary ({length}):
+        
+        {partial_summaries}
+        """
+        
+        return await self._complete(system_prompt, user_prompt, max_tokens=1000, on_token=on_token)
+        
+    async def _complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: int = 1000,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Run a single chat completion
+        
+        Args:
+            system_prompt: System message
+            user_prompt: User message
+            max_tokens: Maximum tokens in the response
+            on_token: Optional callback streaming the response
+            
+        Returns:
+            Response text
+        """
+        return await self.gateway.chat(
+            model="gpt-4-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=0.3,
+            max_tokens=max_tokens,
+            on_token=on_token
+        )
+        
+    def extract_sections(self, summary_text: str) -> Dict[str, Any]:
         """
         Extract structured sections from the generated summary
         
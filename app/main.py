@@ -1,15 +1,21 @@
-from fastapi import FastAPI, UploadFile, File, Form, Query, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, Query, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from typing import List, Optional, Dict, Any
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
 import uvicorn
 import os
 import uuid
 import shutil
 import json
+import re
+import tarfile
+import zipfile
 from datetime import datetime
 from pydantic import BaseModel, HttpUrl, Field
 
+from app.models.paper import PaperMetadata, PaperSummary, TopicClassification
+
 app = FastAPI(
     title="Research Paper Summarization System",
     description="A multi-agent system to search, process, and summarize research papers"
@@ -29,7 +35,43 @@ class PaperRequest(BaseModel):
     url: Optional[HttpUrl] = None
     doi: Optional[str] = None
     topic_list: Optional[List[str]] = []
+    priority: str = "interactive"  # interactive, bulk
     
+class DoiBatchRequest(BaseModel):
+    dois: List[str]
+    topic_list: Optional[List[str]] = []
+    priority: str = "bulk"  # interactive, bulk
+
+class DoiBatchItem(BaseModel):
+    doi: str
+    task_id: str
+    status: str
+    message: Optional[str] = None
+
+class BatchItem(BaseModel):
+    task_id: str
+    source: str  # upload, url, doi
+    name: str  # archive member, URL or DOI
+    status: str
+    stage: Optional[str] = None
+    message: Optional[str] = None
+    summary_id: Optional[str] = None
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    status: str  # pending, processing, completed
+    total: int
+    counts: Dict[str, int]  # number of items by task status
+    progress: float  # fraction of items completed or failed
+    items: List[BatchItem]
+
+class SummarySearchResult(BaseModel):
+    summary_id: str
+    title: str
+    authors: List[str]
+    score: float  # BM25 relevance (keyword) or cosine similarity (semantic)
+    snippet: Optional[str] = None  # matching passage with [highlighted] terms (keyword only)
+
 class ArxivSearchParams(BaseModel):
     query: str
     max_results: int = 10
@@ -38,91 +80,191 @@ class ArxivSearchParams(BaseModel):
     year_from: Optional[int] = None
     year_to: Optional[int] = None
 
-class PaperMetadata(BaseModel):
-    title: str
-    authors: List[str]
-    abstract: str
-    publication_date: Optional[datetime] = None
-    doi: Optional[str] = None
-    url: Optional[str] = None
-    topics: List[str] = []
-    source: str  # arxiv, doi, upload, url
-
-class PaperSummary(BaseModel):
-    paper_id: str
-    metadata: PaperMetadata
-    summary: str
-    key_findings: List[str]
-    methodology: str
-    implications: str
-    citations: List[str] = []
-    audio_file_path: Optional[str] = None
-    
-    class Config:
-        # Allow arbitrary types to handle datetime serialization
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda dt: dt.isoformat() if dt else None
-        }
-    
 class ProcessingStatus(BaseModel):
     task_id: str
     status: str  # pending, processing, completed, failed
     message: Optional[str] = None
+    stage: Optional[str] = None  # downloading, extracting, drafting, proofreading, audio, completed, failed
+    queue_wait_seconds: Optional[float] = None
+    pipeline_timings: Optional[Dict[str, Dict[str, float]]] = None  # start/end/seconds of each stage
+    critical_path: Optional[List[str]] = None  # stages that determined the total time
+    topic_classifications: Optional[List[TopicClassification]] = None  # submitted topics found in the paper
     result: Optional[PaperSummary] = None
 
-# In-memory storage (replace with a proper database in production)
-processing_tasks = {}
-papers_db = {}
-summaries_db = {}
+# Import services and agents
+from app.services.archive import iter_archive_pdfs
+from app.services.http_client import get_http_client
+from app.services.progress import PARKED_STAGES
+from app.services.range_response import ranged_file_response
+from app.services.scheduler import QueueFullError
+from app.services.summary_cache import hash_stream, normalize_doi, normalize_url
+
+from app.pipeline import (
+    arxiv_service, audio_service, complete_from_cache, doi_service, executor, fail_task, llm_batches, llm_cache,
+    llm_gateway, pdf_service, process_doi_batch_task, process_doi_task, process_paper_task, process_url_task,
+    progress, scheduler, search_index, start_background_tasks, start_summary_audio, stop_background_tasks, store,
+    summary_cache, text_cache
+)
 
-# Create directories for uploads and outputs
-os.makedirs("uploads", exist_ok=True)
-os.makedirs("outputs", exist_ok=True)
-os.makedirs("outputs/audio", exist_ok=True)
-os.makedirs("outputs/summaries", exist_ok=True)  # Add directory for storing summaries
+PROGRESS_POLL_SECONDS = float(os.environ.get("PROGRESS_POLL_SECONDS", "1"))
+PROGRESS_HEARTBEAT_SECONDS = 15
 
-# Import services and agents
-from app.services.arxiv_service import ArxivService
-from app.services.doi_service import DoiService
-from app.services.pdf_service import PdfService
-from app.services.audio_service import AudioService
-from app.services.classification import classify_paper
-
-from app.agents.summary_writer_agent import SummaryWriterAgent
-from app.agents.proof_reader_agent import ProofReaderAgent
-
-# Initialize services and agents
-arxiv_service = ArxivService()
-doi_service = DoiService()
-pdf_service = PdfService()
-audio_service = AudioService()
-
-summary_writer = SummaryWriterAgent()
-proof_reader = ProofReaderAgent()
-
-# Helper function to save summary to file
-def save_summary_to_file(summary_id: str, paper_summary: PaperSummary):
-    """Save the paper summary to a JSON file"""
-    # Convert the PaperSummary to a dictionary
-    summary_dict = paper_summary.dict()
-    
-    # Handle datetime serialization
-    if summary_dict['metadata']['publication_date']:
-        summary_dict['metadata']['publication_date'] = summary_dict['metadata']['publication_date'].isoformat()
-    
-    # Save to file
-    summary_file_path = f"outputs/summaries/{summary_id}.json"
-    with open(summary_file_path, "w") as f:
-        json.dump(summary_dict, f, indent=2)
+# Maximum number of papers in one /papers/batch request
+BATCH_MAX_ITEMS = int(os.environ.get("BATCH_MAX_ITEMS", "1000"))
+
+# Whether this process runs queued jobs itself; disable for API-only processes
+# when separate workers (python -m app.worker) consume a shared JOB_QUEUE_URL
+API_RUN_JOBS = os.environ.get("API_RUN_JOBS", "true").lower() in ("1", "true", "yes")
+
+# Helper function to persist an uploaded file
+def save_upload_to_file(source, file_path: str):
+    """Copy an uploaded file object to disk, returning its SHA-256 and size"""
+    with open(file_path, "wb") as buffer:
+        return hash_stream(source, buffer)
+
+def save_archive_members(source, max_items: int, max_member_bytes: int) -> List[Dict[str, Any]]:
+    """
+    Stream the PDFs of an uploaded zip/tar archive to disk, one member at a time
+
+    Returns one dictionary per PDF with a new task_id and the member name, plus
+    either its file_path and content_hash or an error for oversized members.
+    """
+    members = []
+    try:
+        for name, size, member in iter_archive_pdfs(source):
+            if len(members) >= max_items:
+                raise ValueError(f"The archive contains more than {max_items} PDFs")
+            task_id = str(uuid.uuid4())
+            item = {"task_id": task_id, "name": name}
+            if size > max_member_bytes:
+                item["error"] = f"PDF exceeds the maximum size of {max_member_bytes} bytes"
+            else:
+                item["file_path"] = f"uploads/{task_id}_{os.path.basename(name)}"
+                item["content_hash"], _ = save_upload_to_file(member, item["file_path"])
+            members.append(item)
+    except Exception:
+        remove_archive_members(members)
+        raise
+    return members
+
+def remove_archive_members(members: List[Dict[str, Any]]) -> None:
+    """Delete the files saved from an archive whose batch was rejected"""
+    for member in members:
+        if member.get("file_path") and os.path.exists(member["file_path"]):
+            os.remove(member["file_path"])
+
+def split_list(value: str) -> List[str]:
+    """Split a form field of URLs or DOIs separated by newlines, commas or spaces"""
+    return [item for item in re.split(r"[\s,]+", value) if item]
+
+async def batch_status(batch: Dict[str, Any]) -> BatchStatus:
+    """Aggregate the current status of every task in a batch"""
+    tasks = await executor.run_io(store.get_tasks, [item["task_id"] for item in batch["items"]])
+    counts = {"pending": 0, "processing": 0, "completed": 0, "failed": 0}
+    items = []
+    for item in batch["items"]:
+        task = tasks.get(item["task_id"], {})
+        status = task.get("status", "pending")
+        counts[status] = counts.get(status, 0) + 1
+        items.append(BatchItem(
+            **item,
+            status=status,
+            stage=task.get("stage"),
+            message=task.get("message"),
+            summary_id=task.get("summary_id")
+        ))
     
-    return summary_file_path
+    total = len(items)
+    finished = counts["completed"] + counts["failed"]
+    if finished == total:
+        status = "completed"
+    elif counts["pending"] == total:
+        status = "pending"
+    else:
+        status = "processing"
+    return BatchStatus(
+        batch_id=batch["batch_id"],
+        status=status,
+        total=total,
+        counts=counts,
+        progress=round(finished / total, 3) if total else 1.0,
+        items=items
+    )
+
+def queue_full_error(error: QueueFullError) -> HTTPException:
+    """Tell bulk clients to slow down (429) and interactive clients that the server is busy (503)"""
+    return HTTPException(
+        status_code=503 if error.priority == "interactive" else 429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+def check_queue_capacity(priority: str, jobs: int = 1) -> None:
+    """Reject a request up front if its jobs wouldn't fit in the queue"""
+    try:
+        scheduler.ensure_capacity(priority, jobs)
+    except QueueFullError as e:
+        raise queue_full_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def enqueue_task(job_id: str, func, *args: Any, priority: str = "interactive", **kwargs: Any) -> None:
+    """Queue the pipeline job of a task, failing the task if the queue filled up meanwhile"""
+    try:
+        scheduler.submit(job_id, func, *args, priority=priority, **kwargs)
+    except QueueFullError as e:
+        await fail_task(job_id, str(e))
+        raise queue_full_error(e)
+
+@app.on_event("startup")
+async def start_scheduler():
+    """Start the job queue workers"""
+    # Summaries stored before the search index existed (or whose indexing failed)
+    await executor.run_io(search_index.sync, store)
+    if not API_RUN_JOBS:
+        if not scheduler.queue.shared:
+            raise RuntimeError("API_RUN_JOBS=false requires a shared JOB_QUEUE_URL (sqlite:// or redis://)")
+        return
+    scheduler.start()
+    start_background_tasks()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """Release the pipeline worker pools and pooled HTTP connections"""
+    await stop_background_tasks()
+    await scheduler.stop()
+    executor.shutdown(wait=False)
+    await get_http_client().aclose()
+
+def cache_stats() -> Dict[str, Any]:
+    """Collect the counters and sizes of the caches (several of them query SQLite)"""
+    return {
+        "summaries": summary_cache.stats(),
+        "arxiv": arxiv_service.cache.stats(),
+        "doi": doi_service.cache.stats(),
+        "text": text_cache.stats(),
+        "audio": audio_service.stats(),
+        "llm": llm_cache.stats()
+    }
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get hit/miss counters and sizes of the caches"""
+    return await executor.run_io(cache_stats)
+
+@app.get("/llm/stats")
+async def get_llm_stats():
+    """Get chat completion, retry and rate limit counters and the Batch API backlog"""
+    return {
+        "gateway": llm_gateway.stats(),
+        "batches": await executor.run_io(llm_batches.stats)
+    }
 
 @app.post("/papers/search", response_model=List[PaperMetadata])
 async def search_papers(params: ArxivSearchParams):
     """Search for papers on arXiv based on provided parameters"""
     try:
-        papers = arxiv_service.search(
+        papers = await arxiv_service.search_async(
             query=params.query,
             max_results=params.max_results,
             sort_by=params.sort_by,
@@ -166,112 +308,505 @@ async def search_papers(params: ArxivSearchParams):
 
 @app.post("/papers/upload", response_model=ProcessingStatus)
 async def upload_paper(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    topics: str = Form("")
+    topics: str = Form(""),
+    priority: str = Form("interactive")
 ):
     """Upload a research paper PDF for processing"""
+    check_queue_capacity(priority)
     task_id = str(uuid.uuid4())
     
     try:
         # Save uploaded file
         file_path = f"uploads/{task_id}_{file.filename}"
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        content_hash, _ = await executor.run_io(save_upload_to_file, file.file, file_path)
             
         # Create processing task
-        processing_tasks[task_id] = {"status": "pending", "file_path": file_path}
+        await executor.run_io(store.create_task, task_id, source="upload", file_path=file_path, content_hash=content_hash)
+        
+        # Complete immediately if this exact PDF was summarized before
+        cached_summary_id = await executor.run_io(summary_cache.lookup_hash, content_hash)
+        if cached_summary_id:
+            cached_summary = await complete_from_cache(task_id, cached_summary_id, content_hash, [])
+            if cached_summary:
+                return ProcessingStatus(
+                    task_id=task_id,
+                    status="completed",
+                    message="Completed from cached summary",
+                    result=cached_summary
+                )
         
         # Parse topics
         topic_list = [t.strip() for t in topics.split(",")] if topics else []
         
         # Process paper in background
-        background_tasks.add_task(
+        await enqueue_task(
+            task_id,
             process_paper_task, 
             task_id=task_id, 
             file_path=file_path, 
-            topics=topic_list
+            topics=topic_list,
+            content_hash=content_hash,
+            priority=priority
         )
         
         return ProcessingStatus(task_id=task_id, status="pending")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
 
 @app.post("/papers/url", response_model=ProcessingStatus)
-async def process_paper_url(background_tasks: BackgroundTasks, paper_req: PaperRequest):
+async def process_paper_url(paper_req: PaperRequest):
     """Process a paper from a URL"""
     if not paper_req.url:
         raise HTTPException(status_code=400, detail="URL is required")
+    check_queue_capacity(paper_req.priority)
         
     task_id = str(uuid.uuid4())
-    processing_tasks[task_id] = {"status": "pending", "url": str(paper_req.url)}
+    await executor.run_io(store.create_task, task_id, source="url", url=str(paper_req.url))
+    
+    # Complete immediately if this paper was summarized before
+    alias = normalize_url(str(paper_req.url))
+    cached = await executor.run_io(summary_cache.lookup_alias, alias)
+    if cached:
+        cached_summary = await complete_from_cache(task_id, cached[1], cached[0], [alias])
+        if cached_summary:
+            return ProcessingStatus(
+                task_id=task_id,
+                status="completed",
+                message="Completed from cached summary",
+                result=cached_summary
+            )
     
-    background_tasks.add_task(
+    await enqueue_task(
+        task_id,
         process_url_task,
         task_id=task_id,
         url=str(paper_req.url),
-        topics=paper_req.topic_list or []
+        topics=paper_req.topic_list or [],
+        aliases=[alias],
+        priority=paper_req.priority
     )
     
     return ProcessingStatus(task_id=task_id, status="pending")
 
 @app.post("/papers/doi", response_model=ProcessingStatus)
-async def process_paper_doi(background_tasks: BackgroundTasks, paper_req: PaperRequest):
+async def process_paper_doi(paper_req: PaperRequest):
     """Process a paper using its DOI"""
     if not paper_req.doi:
         raise HTTPException(status_code=400, detail="DOI is required")
+    check_queue_capacity(paper_req.priority)
         
     task_id = str(uuid.uuid4())
-    processing_tasks[task_id] = {"status": "pending", "doi": paper_req.doi}
+    await executor.run_io(store.create_task, task_id, source="doi", doi=paper_req.doi)
+    
+    # Complete immediately if this paper was summarized before
+    alias = normalize_doi(paper_req.doi)
+    cached = await executor.run_io(summary_cache.lookup_alias, alias)
+    if cached:
+        cached_summary = await complete_from_cache(task_id, cached[1], cached[0], [alias])
+        if cached_summary:
+            return ProcessingStatus(
+                task_id=task_id,
+                status="completed",
+                message="Completed from cached summary",
+                result=cached_summary
+            )
     
-    background_tasks.add_task(
+    await enqueue_task(
+        task_id,
         process_doi_task,
         task_id=task_id,
         doi=paper_req.doi,
-        topics=paper_req.topic_list
+        topics=paper_req.topic_list,
+        aliases=[alias],
+        priority=paper_req.priority
     )
     
     return ProcessingStatus(task_id=task_id, status="pending")
 
+@app.post("/papers/doi/batch", response_model=List[DoiBatchItem])
+async def process_paper_doi_batch(batch_req: DoiBatchRequest):
+    """Process many papers by DOI, returning one task per DOI"""
+    if not batch_req.dois:
+        raise HTTPException(status_code=400, detail="At least one DOI is required")
+    # The whole batch is admitted or rejected, so it never ends up half queued
+    check_queue_capacity(batch_req.priority, len(batch_req.dois))
+        
+    items = []
+    pending = []
+    seen_aliases = set()
+    for doi in batch_req.dois:
+        doi = doi.strip()
+        alias = normalize_doi(doi)
+        # Reading lists often repeat entries; resolve each paper once
+        if not doi or alias in seen_aliases:
+            continue
+        seen_aliases.add(alias)
+        
+        task_id = str(uuid.uuid4())
+        await executor.run_io(store.create_task, task_id, source="doi", doi=doi)
+        
+        cached = await executor.run_io(summary_cache.lookup_alias, alias)
+        if cached and await complete_from_cache(task_id, cached[1], cached[0], [alias]):
+            items.append(DoiBatchItem(doi=doi, task_id=task_id, status="completed", message="Completed from cached summary"))
+            continue
+            
+        items.append(DoiBatchItem(doi=doi, task_id=task_id, status="pending"))
+        pending.append((task_id, doi, alias))
+    
+    if pending:
+        scheduler.submit(
+            f"batch:{uuid.uuid4()}",
+            process_doi_batch_task,
+            items=pending,
+            topics=batch_req.topic_list or [],
+            item_priority=batch_req.priority,
+            priority=batch_req.priority,
+            force=True
+        )
+    
+    return items
+
+@app.post("/papers/batch", response_model=BatchStatus)
+async def process_paper_batch(
+    file: Optional[UploadFile] = File(None),
+    urls: str = Form(""),
+    dois: str = Form(""),
+    topics: str = Form(""),
+    priority: str = Form("bulk")
+):
+    """Process many papers at once from a zip/tar archive of PDFs and/or lists of URLs and DOIs"""
+    url_list = split_list(urls)
+    doi_list = split_list(dois)
+    if file is None and not url_list and not doi_list:
+        raise HTTPException(status_code=400, detail="An archive, URLs or DOIs are required")
+    invalid_urls = [url for url in url_list if not url.startswith(("http://", "https://"))]
+    if invalid_urls:
+        raise HTTPException(status_code=400, detail=f"Invalid URL: {invalid_urls[0]}")
+    if len(url_list) + len(doi_list) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {BATCH_MAX_ITEMS} papers")
+    check_queue_capacity(priority, len(url_list) + len(doi_list) or 1)
+    
+    # Archive members are copied straight from the spooled upload to their own files
+    members = []
+    if file is not None:
+        try:
+            members = await executor.run_io(
+                save_archive_members,
+                file.file,
+                BATCH_MAX_ITEMS - len(url_list) - len(doi_list),
+                pdf_service.max_download_bytes
+            )
+        except (ValueError, zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid archive: {str(e)}")
+    if not members and not url_list and not doi_list:
+        raise HTTPException(status_code=400, detail="The archive contains no PDFs")
+        
+    # The whole batch is admitted or rejected, so it never ends up half queued
+    try:
+        check_queue_capacity(priority, len(members) + len(url_list) + len(doi_list))
+    except HTTPException:
+        await executor.run_io(remove_archive_members, members)
+        raise
+    
+    batch_id = str(uuid.uuid4())
+    topic_list = [t.strip() for t in topics.split(",")] if topics else []
+    items = []
+    
+    for member in members:
+        task_id = member["task_id"]
+        items.append({"task_id": task_id, "source": "upload", "name": member["name"]})
+        await executor.run_io(
+            store.create_task,
+            task_id,
+            source="upload",
+            file_path=member.get("file_path"),
+            content_hash=member.get("content_hash"),
+            batch_id=batch_id
+        )
+        if "error" in member:
+            await fail_task(task_id, member["error"])
+            continue
+        cached_summary_id = await executor.run_io(summary_cache.lookup_hash, member["content_hash"])
+        if cached_summary_id and await complete_from_cache(task_id, cached_summary_id, member["content_hash"], []):
+            continue
+        scheduler.submit(
+            task_id,
+            process_paper_task,
+            task_id=task_id,
+            file_path=member["file_path"],
+            topics=topic_list,
+            content_hash=member["content_hash"],
+            priority=priority,
+            force=True
+        )
+    
+    seen_aliases = set()
+    for url in url_list:
+        alias = normalize_url(url)
+        if alias in seen_aliases:
+            continue
+        seen_aliases.add(alias)
+        
+        task_id = str(uuid.uuid4())
+        items.append({"task_id": task_id, "source": "url", "name": url})
+        await executor.run_io(store.create_task, task_id, source="url", url=url, batch_id=batch_id)
+        cached = await executor.run_io(summary_cache.lookup_alias, alias)
+        if cached and await complete_from_cache(task_id, cached[1], cached[0], [alias]):
+            continue
+        scheduler.submit(
+            task_id,
+            process_url_task,
+            task_id=task_id,
+            url=url,
+            topics=topic_list,
+            aliases=[alias],
+            priority=priority,
+            force=True
+        )
+    
+    pending_dois = []
+    for doi in doi_list:
+        alias = normalize_doi(doi)
+        if alias in seen_aliases:
+            continue
+        seen_aliases.add(alias)
+        
+        task_id = str(uuid.uuid4())
+        items.append({"task_id": task_id, "source": "doi", "name": doi})
+        await executor.run_io(store.create_task, task_id, source="doi", doi=doi, batch_id=batch_id)
+        cached = await executor.run_io(summary_cache.lookup_alias, alias)
+        if cached and await complete_from_cache(task_id, cached[1], cached[0], [alias]):
+            continue
+        pending_dois.append((task_id, doi, alias))
+    
+    # DOIs are resolved together (rate-limited and cached) before their papers are queued
+    if pending_dois:
+        scheduler.submit(
+            f"batch:{batch_id}",
+            process_doi_batch_task,
+            items=pending_dois,
+            topics=topic_list,
+            item_priority=priority,
+            priority=priority,
+            force=True
+        )
+    
+    await executor.run_io(store.create_batch, batch_id, items, priority=priority, topics=topic_list)
+    return await batch_status(await executor.run_io(store.get_batch, batch_id))
+
+@app.get("/papers/batch/{batch_id}", response_model=BatchStatus)
+async def get_batch_status(batch_id: str):
+    """Get the aggregate progress of a batch and the status of each of its papers"""
+    batch = await executor.run_io(store.get_batch, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return await batch_status(batch)
+
+@app.get("/tasks")
+async def list_tasks(
+    status: Optional[str] = Query(None, description="Only return tasks with this status"),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """List recent tasks along with the job queue's depth and wait times"""
+    return {
+        "queue": scheduler.stats(),
+        "tasks": await executor.run_io(store.list_tasks, status=status, limit=limit)
+    }
+
 @app.get("/tasks/{task_id}", response_model=ProcessingStatus)
 async def get_task_status(task_id: str):
     """Check the status of a processing task"""
-    if task_id not in processing_tasks:
+    task = await executor.run_io(store.get_task, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
         
-    task = processing_tasks[task_id]
     result = None
     
     if task["status"] == "completed":
-        result = summaries_db.get(task_id)
+        result = await executor.run_io(store.get_summary, task.get("summary_id") or task_id)
         
     return ProcessingStatus(
         task_id=task_id,
         status=task["status"],
         message=task.get("message"),
+        stage=task.get("stage"),
+        queue_wait_seconds=task.get("queue_wait_seconds"),
+        pipeline_timings=task.get("pipeline_timings"),
+        critical_path=task.get("critical_path"),
+        topic_classifications=task.get("topic_classifications"),
         result=result
     )
 
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode a progress event as a server-sent event"""
+    lines = [f"id: {event['id']}"] if "id" in event else []
+    lines += [f"event: {event['stage']}", f"data: {json.dumps(event)}"]
+    return "\n".join(lines) + "\n\n"
+
+async def task_event_stream(task_id: str, task: Dict[str, Any], last_event_id: int):
+    """Relay a task's stage transitions, following the store for tasks run by another process"""
+    last_stage = None
+    while True:
+        tracked = progress.get(task_id)
+        if tracked is not None:
+            async for event in tracked.iter_events(last_event_id, PROGRESS_HEARTBEAT_SECONDS):
+                yield format_sse(event) if event is not None else ": keep-alive\n\n"
+            return
+        
+        # Not published in this process (yet): report the stored stage whenever it changes
+        stage = task.get("stage") or task["status"]
+        if stage != last_stage:
+            last_stage = stage
+            event = {
+                "task_id": task_id,
+                "stage": stage,
+                "status": task["status"],
+                "timings": task.get("stage_timings") or {},
+                "message": task.get("message"),
+                "summary_id": task.get("summary_id")
+            }
+            if stage in PARKED_STAGES:
+                event["poll_url"] = f"/tasks/{task_id}"
+            yield format_sse(event)
+        if task["status"] in ("completed", "failed") or stage in PARKED_STAGES:
+            return
+        await asyncio.sleep(PROGRESS_POLL_SECONDS)
+        task = await executor.run_io(store.get_task, task_id) or task
+
+@app.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str, request: Request):
+    """Stream the stage transitions of a task as server-sent events"""
+    task = await executor.run_io(store.get_task, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    # Reconnecting EventSource clients resume after the last event they received
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "-1"))
+    except ValueError:
+        last_event_id = -1
+    
+    # A parked task (e.g. a queued Batch API draft) publishes nothing for a long
+    # time; 204 tells a reconnecting EventSource that saw the parking event to stop
+    if last_event_id >= 0 and task.get("stage") in PARKED_STAGES:
+        tracked = progress.get(task_id)
+        if tracked is None or last_event_id >= len(tracked.events) - 1:
+            return Response(status_code=204)
+        
+    return StreamingResponse(
+        task_event_stream(task_id, task, last_event_id),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"}
+    )
+
+async def task_text_stream(task_id: str, task: Dict[str, Any]):
+    """Relay a task's draft and final summary text as it is generated, then its outcome"""
+    streamed_final = False
+    tracked = progress.get(task_id)
+    while tracked is None and task["status"] not in ("completed", "failed") and task.get("stage") not in PARKED_STAGES:
+        # Not started in this process yet (or run by another worker process)
+        yield ": keep-alive\n\n"
+        await asyncio.sleep(PROGRESS_POLL_SECONDS)
+        task = await executor.run_io(store.get_task, task_id) or task
+        tracked = progress.get(task_id)
+    
+    if tracked is not None:
+        async for item in tracked.iter_text(PROGRESS_HEARTBEAT_SECONDS):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            name, delta = item
+            streamed_final = streamed_final or name == "final"
+            yield format_sse({"stage": name, "text": delta})
+        task = await executor.run_io(store.get_task, task_id) or task
+    
+    # Tasks completed from the cache or by another process send their summary in one piece
+    summary = None
+    if task["status"] == "completed":
+        summary = await executor.run_io(store.get_summary, task.get("summary_id") or task_id)
+    if summary is not None and not streamed_final:
+        yield format_sse({"stage": "final", "text": summary.summary})
+    outcome = {
+        "task_id": task_id,
+        "stage": task["status"],
+        "message": task.get("message"),
+        "summary_id": task.get("summary_id")
+    }
+    parked_stage = tracked.stage if tracked is not None else task.get("stage")
+    if parked_stage in PARKED_STAGES:
+        outcome.update(stage=parked_stage, poll_url=f"/tasks/{task_id}")
+    yield format_sse(outcome)
+
+@app.get("/tasks/{task_id}/stream")
+async def stream_task_text(task_id: str):
+    """Stream the draft and final summary of a task token by token as server-sent events"""
+    task = await executor.run_io(store.get_task, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    return StreamingResponse(
+        task_text_stream(task_id, task),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache", "x-accel-buffering": "no"}
+    )
+
+# Declared before /summaries/{summary_id}, which would otherwise match "search"
+@app.get("/summaries/search", response_model=List[SummarySearchResult])
+async def search_summaries(
+    q: str = Query(..., min_length=1, description="Words to search titles, authors, summaries and key findings for"),
+    mode: str = Query("keyword", description="keyword (full-text, BM25) or semantic (embedding similarity)"),
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Search the summaries of processed papers"""
+    if mode == "keyword":
+        return await executor.run_io(search_index.search, q, limit)
+    if mode == "semantic":
+        if not search_index.embeddings:
+            raise HTTPException(status_code=400, detail="Semantic search is disabled (SEARCH_EMBEDDINGS=false)")
+        return await executor.run_io(search_index.search_semantic, q, limit)
+    raise HTTPException(status_code=400, detail="mode must be keyword or semantic")
+
 @app.get("/summaries/{summary_id}", response_model=PaperSummary)
 async def get_summary(summary_id: str):
     """Get a specific paper summary"""
-    if summary_id not in summaries_db:
+    summary = await executor.run_io(store.get_summary, summary_id)
+    if summary is None:
         raise HTTPException(status_code=404, detail="Summary not found")
         
-    return summaries_db[summary_id]
+    return summary
 
 @app.get("/summaries/{summary_id}/audio")
-async def get_summary_audio(summary_id: str):
-    """Get the audio version of a summary"""
-    if summary_id not in summaries_db:
+async def get_summary_audio(
+    summary_id: str,
+    request: Request,
+    stream: bool = Query(False, description="Stream audio segments while they are still being synthesized")
+):
+    """Get the audio version of a summary, with support for Range and conditional requests"""
+    summary = await executor.run_io(store.get_summary, summary_id)
+    if summary is None:
         raise HTTPException(status_code=404, detail="Summary not found")
         
-    summary = summaries_db[summary_id]
-    if not summary.audio_file_path or not os.path.exists(summary.audio_file_path):
-        raise HTTPException(status_code=404, detail="Audio not generated for this summary")
+    # Audio is generated on first request when it wasn't produced with the summary
+    audio_file_path = summary.audio_file_path
+    if not audio_file_path or not os.path.exists(audio_file_path):
+        job = start_summary_audio(summary_id, summary)
+        if stream:
+            # Chunked response of segments as they are synthesized; not cacheable or seekable yet
+            return StreamingResponse(
+                job.iter_segments(),
+                media_type="audio/mpeg",
+                headers={"cache-control": "no-store"}
+            )
+        audio_file_path = await job.wait()
+    if not audio_file_path:
+        raise HTTPException(status_code=500, detail="Audio generation failed for this summary")
         
-    return FileResponse(
-        summary.audio_file_path, 
+    return ranged_file_response(
+        request,
+        audio_file_path, 
         media_type="audio/mpeg", 
         filename=f"summary_{summary_id}.mp3"
     )
@@ -279,7 +814,7 @@ async def get_summary_audio(summary_id: str):
 @app.get("/summaries/{summary_id}/file")
 async def get_summary_file(summary_id: str):
     """Get the JSON file for a summary"""
-    if summary_id not in summaries_db:
+    if not await executor.run_io(store.has_summary, summary_id):
         raise HTTPException(status_code=404, detail="Summary not found")
         
     summary_file_path = f"outputs/summaries/{summary_id}.json"
@@ -292,226 +827,5 @@ async def get_summary_file(summary_id: str):
         filename=f"summary_{summary_id}.json"
     )
 
-async def process_paper_task(task_id: str, file_path: str, topics: List[str]):
-    """Background task to process an uploaded paper"""
-    try:
-        processing_tasks[task_id]["status"] = "processing"
-        
-        # Extract text from PDF
-        text_content = pdf_service.extract_text(file_path)
-        if not text_content:
-            raise ValueError("Could not extract text from the PDF")
-        
-        # Extract basic metadata from the PDF (filename or attempt to parse title)
-        filename = os.path.basename(file_path)
-        # Create basic metadata for the uploaded file
-        metadata = PaperMetadata(
-            title=f"Uploaded document: {filename}",
-            authors=["Unknown"],  # You might want to extract this from the PDF if possible
-            abstract="Abstract not available for uploaded document",
-            source="upload",
-            topics=topics
-        )
-        
-        # Generate summary using the writer agent
-        draft_summary = summary_writer.generate_summary(
-            full_text=text_content
-        )
-        
-        # Proof-read and improve the summary
-        final_summary = proof_reader.review_summary(
-            draft_summary=draft_summary,
-            full_text=text_content
-        )
-        
-        # Generate audio for the summary
-        audio_file_path = f"outputs/audio/summary_{task_id}.mp3"
-        audio_service.generate_audio(final_summary["summary"], audio_file_path)
-        
-        # Create summary object
-        summary_id = task_id
-        paper_summary = PaperSummary(
-            paper_id=task_id,
-            metadata=metadata,  # Add the metadata here
-            summary=final_summary["summary"],
-            key_findings=final_summary["key_findings"],
-            methodology=final_summary["methodology"],
-            implications=final_summary["implications"],
-            citations=final_summary["citations"],
-            audio_file_path=audio_file_path
-        )
-        
-        # Save summary to in-memory database
-        summaries_db[summary_id] = paper_summary
-        
-        # Save summary to file
-        summary_file_path = save_summary_to_file(summary_id, paper_summary)
-        
-        # Update task status
-        processing_tasks[task_id].update({
-            "status": "completed",
-            "summary_file_path": summary_file_path
-        })
-        
-    except Exception as e:
-        processing_tasks[task_id].update({
-            "status": "failed",
-            "message": str(e)
-        })
-
-
-async def process_url_task(task_id: str, url: str, topics: List[str]):
-    """Background task to process a paper from URL"""
-    try:
-        # print(f"Starting URL task processing for task_id: {task_id}, URL: {url}")
-        processing_tasks[task_id]["status"] = "processing"
-        
-        # Create the uploads directory if it doesn't exist
-        os.makedirs("uploads", exist_ok=True)
-        
-        # Download paper from URL
-        file_path = f"uploads/url_{task_id}.pdf"
-        
-        # print(f"Attempting to download PDF from {url}")
-        try:
-            pdf_service.download_pdf(url, file_path)
-        except Exception as download_error:
-            # print(f"Download failed: {str(download_error)}")
-            processing_tasks[task_id].update({
-                "status": "failed",
-                "message": f"Failed to download PDF from URL: {str(download_error)}"
-            })
-            return
-        
-        # print(f"Download completed. Checking file at {file_path}")
-        # Verify the file exists and has content
-        if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
-            # print(f"File verification failed: File empty or not found")
-            processing_tasks[task_id].update({
-                "status": "failed",
-                "message": "Downloaded file is empty or does not exist"
-            })
-            return
-            
-        # print(f"Successfully downloaded PDF from URL to {file_path}")
-        
-        # Extract text from PDF
-        # print(f"Extracting text from PDF")
-        text_content = pdf_service.extract_text(file_path)
-        if not text_content:
-            # print(f"Text extraction failed: No text content extracted")
-            processing_tasks[task_id].update({
-                "status": "failed",
-                "message": "Could not extract text from the PDF"
-            })
-            return
-        
-        # print(f"Text extraction successful. Content length: {len(text_content)}")
-        
-        # Create basic metadata for the downloaded file
-        metadata = PaperMetadata(
-            title=f"Downloaded document from URL",
-            authors=["Unknown"],
-            abstract="Abstract not available for URL document",
-            source="url",
-            url=url,
-            topics=topics
-        )
-        
-        # Generate summary using the writer agent
-        # print(f"Generating summary draft")
-        try:
-            draft_summary = summary_writer.generate_summary(
-                full_text=text_content
-            )
-            
-            # print(f"Draft summary generated. Sending to proof reader")
-            # Proof-read and improve the summary
-            final_summary = proof_reader.review_summary(
-                draft_summary=draft_summary,
-                full_text=text_content
-            )
-            # print(f"Final summary created")
-        except Exception as summary_error:
-            # print(f"Summary generation failed: {str(summary_error)}")
-            processing_tasks[task_id].update({
-                "status": "failed",
-                "message": f"Error generating summary: {str(summary_error)}"
-            })
-            return
-        
-        # Generate audio for the summary
-        # print(f"Generating audio")
-        audio_file_path = f"outputs/audio/summary_{task_id}.mp3"
-        try:
-            audio_service.generate_audio(final_summary["summary"], audio_file_path)
-            # print(f"Audio generation complete")
-        except Exception as audio_error:
-            # print(f"Audio generation failed: {str(audio_error)}")
-            # Continue even if audio fails - it's not critical
-            audio_file_path = None
-        
-        # Create summary object
-        summary_id = task_id
-        paper_summary = PaperSummary(
-            paper_id=task_id,
-            metadata=metadata,
-            summary=final_summary["summary"],
-            key_findings=final_summary["key_findings"],
-            methodology=final_summary["methodology"],
-            implications=final_summary["implications"],
-            citations=final_summary.get("citations", []),
-            audio_file_path=audio_file_path
-        )
-        
-        # Save summary to in-memory database
-        # print(f"Saving summary with ID: {summary_id}")
-        summaries_db[summary_id] = paper_summary
-        
-        # Save summary to file
-        summary_file_path = save_summary_to_file(summary_id, paper_summary)
-        # print(f"Summary saved to file: {summary_file_path}")
-        
-        # Update task status
-        processing_tasks[task_id].update({
-            "status": "completed",
-            "summary_file_path": summary_file_path
-        })
-        # print(f"Task completed successfully")
-        
-    except Exception as e:
-        # print(f"Unexpected error in process_url_task: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        processing_tasks[task_id].update({
-            "status": "failed",
-            "message": str(e)
-        })
-
-
-async def process_doi_task(task_id: str, doi: str, topics: List[str]):
-    """Background task to process a paper from DOI"""
-    try:
-        processing_tasks[task_id]["status"] = "processing"
-        
-        # Get paper details and PDF URL from DOI
-        paper_details = doi_service.get_paper_details(doi)
-        
-        if not paper_details or "pdf_url" not in paper_details:
-            raise ValueError("Could not retrieve PDF URL from DOI")
-            
-        # Download the paper
-        file_path = f"uploads/doi_{task_id}.pdf"
-        pdf_service.download_pdf(paper_details["pdf_url"], file_path)
-        
-        # Process the downloaded PDF
-        await process_paper_task(task_id, file_path, topics)
-        
-    except Exception as e:
-        processing_tasks[task_id].update({
-            "status": "failed",
-            "message": str(e)
-        })
-
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
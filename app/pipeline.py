@@ -0,0 +1,767 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.models.paper import PaperMetadata, PaperSummary, TopicClassification
+
+# Create directories for uploads and outputs
+os.makedirs("uploads", exist_ok=True)
+os.makedirs("outputs", exist_ok=True)
+os.makedirs("outputs/audio", exist_ok=True)
+os.makedirs("outputs/summaries", exist_ok=True)  # Add directory for storing summaries
+
+# Import services and agents
+from app.services.arxiv_service import ArxivService
+from app.services.dag import DagRun, Stage, StageGraph, StopPipeline
+from app.services.doi_service import DoiService
+from app.services.doi_cache import DoiCache
+from app.services.pdf_service import PdfService
+from app.services.audio_service import AudioJob, AudioService
+from app.services.classification import BatchClassifier
+from app.services.executor import ExecutionService
+from app.services.job_queue import create_job_queue
+from app.services.llm_batch import LlmBatchQueue
+from app.services.llm_cache import LlmResponseCache
+from app.services.llm_gateway import LlmGateway
+from app.services.progress import ProgressBroker
+from app.services.scheduler import JobScheduler, QueueFullError
+from app.services.search_index import SummarySearchIndex
+from app.services.storage import create_store
+from app.services.summary_cache import SummaryCache, hash_file, normalize_url
+from app.services.text_cache import TextCache
+
+from app.agents.summary_writer_agent import SummaryWriterAgent
+from app.agents.proof_reader_agent import ProofReaderAgent
+
+# Persistent task and summary storage shared by all worker processes
+store = create_store()
+
+# Initialize services and agents
+arxiv_service = ArxivService()
+doi_service = DoiService(
+    cache=DoiCache(
+        store.db_path,
+        ttl_seconds=float(os.environ.get("DOI_CACHE_TTL_DAYS", "30")) * 24 * 3600,
+        negative_ttl_seconds=float(os.environ.get("DOI_CACHE_NEGATIVE_TTL_HOURS", "24")) * 3600
+    )
+)
+pdf_service = PdfService()
+audio_service = AudioService()
+
+# Content-addressed cache so duplicate submissions reuse finished summaries
+summary_cache = SummaryCache(
+    store.db_path,
+    max_entries=int(os.environ.get("SUMMARY_CACHE_MAX_ENTRIES", "10000")),
+    max_age_seconds=float(os.environ.get("SUMMARY_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+)
+
+# Extracted page text by PDF hash, so retries and re-summarizations skip PDF parsing
+text_cache = TextCache(
+    store.db_path,
+    cache_dir=os.environ.get("TEXT_CACHE_DIR", "outputs/text_cache"),
+    max_bytes=int(float(os.environ.get("TEXT_CACHE_MAX_MB", "512")) * 1024 * 1024)
+)
+
+# Full-text (and optionally embedding) index of stored summaries for /summaries/search
+search_index = SummarySearchIndex(
+    store.db_path,
+    embeddings=os.environ.get("SEARCH_EMBEDDINGS", "true").lower() in ("1", "true", "yes")
+)
+
+# When summary audio is generated: "eager" before the task completes, "lazy" on the
+# first /summaries/{id}/audio request, "background" by a low-priority job after completion
+AUDIO_MODE = os.environ.get("AUDIO_MODE", "eager")
+
+# In-flight audio syntheses by summary ID, so concurrent first requests share one
+audio_jobs: Dict[str, AudioJob] = {}
+
+# Stage transitions pushed to /tasks/{task_id}/events subscribers
+progress = ProgressBroker(
+    retention_seconds=float(os.environ.get("PROGRESS_RETENTION_SECONDS", "600")),
+    idle_seconds=float(os.environ.get("PROGRESS_IDLE_SECONDS", "3600"))
+)
+
+# Whether summaries are generated with streamed completions, relayed to /tasks/{task_id}/stream
+STREAM_SUMMARIES = os.environ.get("STREAM_SUMMARIES", "true").lower() in ("1", "true", "yes")
+
+# Bounded worker pools for the blocking pipeline stages
+executor = ExecutionService()
+
+# Bounded job queue: at most JOB_WORKERS papers are processed at once per process,
+# the rest wait by priority class, and each stage has its own concurrency limit.
+# With a shared JOB_QUEUE_URL, jobs can be run by separate worker processes.
+scheduler = JobScheduler(
+    workers=int(os.environ.get("JOB_WORKERS", "16")),
+    max_queued={
+        "interactive": int(os.environ.get("QUEUE_MAX_INTERACTIVE", "100")),
+        "bulk": int(os.environ.get("QUEUE_MAX_BULK", "1000")),
+        "background": int(os.environ.get("QUEUE_MAX_BACKGROUND", "1000"))
+    },
+    stage_limits={
+        "download": int(os.environ.get("STAGE_LIMIT_DOWNLOAD", "16")),
+        "extract": int(os.environ.get("STAGE_LIMIT_EXTRACT", str(executor.cpu_workers))),
+        "llm": int(os.environ.get("STAGE_LIMIT_LLM", "8")),
+        "audio": int(os.environ.get("STAGE_LIMIT_AUDIO", "4"))
+    },
+    on_start=lambda task_id, wait: store.update_task(task_id, queue_wait_seconds=round(wait, 3)),
+    queue=create_job_queue(),
+    visibility_timeout=float(os.environ.get("JOB_VISIBILITY_TIMEOUT", "3600"))
+)
+
+# How submitted topics are checked against the paper: "keyword" (whole-word mentions)
+# or "semantic" (similarity of hashed n-gram embeddings). Papers classified at the
+# same time, e.g. by a bulk import, are scored as one batch.
+topic_classifier = BatchClassifier(
+    executor,
+    mode=os.environ.get("CLASSIFICATION_MODE", "keyword"),
+    min_similarity=float(os.environ.get("CLASSIFICATION_MIN_SIMILARITY", "0.7")),
+    max_batch=int(os.environ.get("CLASSIFICATION_BATCH_SIZE", "32")),
+    max_wait_seconds=float(os.environ.get("CLASSIFICATION_BATCH_WAIT_MS", "500")) / 1000
+)
+
+# Chat completions of every agent share one client, rate limits and retry policy;
+# identical requests (retries, re-summarizations) are answered from the response cache
+llm_cache = LlmResponseCache(
+    store.db_path,
+    max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+    max_age_seconds=float(os.environ.get("LLM_CACHE_TTL_DAYS", "30")) * 24 * 3600
+)
+llm_gateway = LlmGateway(
+    cache=llm_cache if os.environ.get("LLM_CACHE", "true").lower() in ("1", "true", "yes") else None
+)
+summary_writer = SummaryWriterAgent(gateway=llm_gateway)
+proof_reader = ProofReaderAgent(gateway=llm_gateway)
+
+# Jobs of these priority classes (e.g. "bulk") draft their summaries through the
+# Batch API: cheaper, but results may take up to a day. Off when empty.
+LLM_BATCH_PRIORITIES = {
+    priority.strip() for priority in os.environ.get("LLM_BATCH_PRIORITIES", "").split(",") if priority.strip()
+}
+LLM_BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "100"))
+LLM_BATCH_MAX_WAIT_SECONDS = float(os.environ.get("LLM_BATCH_MAX_WAIT_SECONDS", "300"))
+LLM_BATCH_POLL_SECONDS = float(os.environ.get("LLM_BATCH_POLL_SECONDS", "60"))
+llm_batches = LlmBatchQueue(store.db_path)
+
+# Loops started next to the scheduler (Batch API submission and collection)
+background_tasks: List[asyncio.Task] = []
+
+# Only parse as many PDF pages as the summary can use: short summaries read the
+# first 5000 characters, map-reduce summaries are capped by PDF_TEXT_MAX_CHARS
+TEXT_CHAR_BUDGET = 5000 if summary_writer.summary_mode == "short" else int(
+    os.environ.get("PDF_TEXT_MAX_CHARS", "200000")
+)
+
+# Helper function to save summary to file
+def save_summary_to_file(summary_id: str, paper_summary: PaperSummary):
+    """Save the paper summary to a JSON file"""
+    # Convert the PaperSummary to a dictionary
+    summary_dict = paper_summary.dict()
+    
+    # Handle datetime serialization
+    if summary_dict['metadata']['publication_date']:
+        summary_dict['metadata']['publication_date'] = summary_dict['metadata']['publication_date'].isoformat()
+    summary_dict['created_at'] = summary_dict['created_at'].isoformat()
+    
+    # Save to file
+    summary_file_path = f"outputs/summaries/{summary_id}.json"
+    with open(summary_file_path, "w") as f:
+        json.dump(summary_dict, f, indent=2)
+    
+    return summary_file_path
+
+async def report_stage(task_id: str, stage: str, **data: Any) -> None:
+    """Record the stage a task entered and push it, with any partial results, to subscribers"""
+    event = progress.publish(task_id, stage, **data)
+    await executor.run_io(store.update_task, task_id, stage=stage, stage_timings=event["timings"])
+
+def relay_tokens(task_id: str, name: str) -> Optional[Callable[[str], None]]:
+    """Callback streaming a task's summary text to subscribers, or None when streaming is off"""
+    if not STREAM_SUMMARIES:
+        return None
+    return lambda delta: progress.append_text(task_id, name, delta)
+
+async def fail_task(task_id: str, message: str) -> None:
+    """Mark a task as failed"""
+    await executor.run_io(store.update_task, task_id, status="failed", message=message)
+    await report_stage(task_id, "failed", message=message)
+
+# Helper function to reuse a summary for duplicate submissions
+async def complete_from_cache(task_id: str, summary_id: str, content_hash: str, aliases: List[str]) -> Optional[PaperSummary]:
+    """Mark a task completed with an existing summary, or return None if it no longer exists"""
+    paper_summary = await executor.run_io(store.get_summary, summary_id)
+    if paper_summary is None:
+        # The summary is gone, so forget the stale entry and process the paper again
+        await executor.run_io(summary_cache.invalidate, content_hash)
+        return None
+        
+    await executor.run_io(summary_cache.add_aliases, content_hash, aliases)
+    await executor.run_io(
+        store.update_task,
+        task_id,
+        status="completed",
+        message="Completed from cached summary",
+        summary_id=summary_id,
+        content_hash=content_hash
+    )
+    await report_stage(task_id, "completed", summary_id=summary_id, summary=paper_summary.summary, cached=True)
+    return paper_summary
+
+async def extract_paper_pages(file_path: str, content_hash: str) -> List[str]:
+    """Extract the pages the summary needs, reusing previously extracted pages of the same PDF"""
+    pages = await executor.run_io(text_cache.get_pages, content_hash, min_chars=TEXT_CHAR_BUDGET)
+    if pages is None:
+        async with scheduler.stage("extract"):
+            pages = await pdf_service.extract_pages_parallel(file_path, executor, max_chars=TEXT_CHAR_BUDGET)
+        if pages:
+            # Extraction only stops early once the budget is filled
+            complete = sum(len(page_text) + 2 for page_text in pages) < TEXT_CHAR_BUDGET
+            await executor.run_io(text_cache.put, content_hash, pages, complete)
+    return pages
+
+async def generate_summary_audio(summary_id: str, text: str, job: Optional[AudioJob] = None) -> Optional[str]:
+    """Synthesize the audio file for a summary, returning its path or None if synthesis failed"""
+    audio_file_path = f"outputs/audio/summary_{summary_id}.mp3"
+    on_segment = job.add_segment if job is not None else None
+    async with scheduler.stage("audio"):
+        if await audio_service.generate_audio(text, audio_file_path, executor, on_segment):
+            return audio_file_path
+    return None
+
+def start_summary_audio(summary_id: str, summary: PaperSummary) -> AudioJob:
+    """
+    Start synthesizing the audio of a stored summary, or join the synthesis already running
+
+    Concurrent first requests for the same summary share one job.
+    """
+    job = audio_jobs.get(summary_id)
+    if job is not None:
+        return job
+
+    job = AudioJob()
+    audio_jobs[summary_id] = job
+
+    async def run():
+        audio_file_path = None
+        try:
+            audio_file_path = await generate_summary_audio(summary_id, summary.summary, job)
+            if audio_file_path:
+                await executor.run_io(store.set_summary_audio, summary_id, audio_file_path)
+                summary.audio_file_path = audio_file_path
+                await executor.run_io(save_summary_to_file, summary_id, summary)
+        except Exception as e:
+            print(f"Error generating audio for summary {summary_id}: {str(e)}")
+        finally:
+            audio_jobs.pop(summary_id, None)
+            job.finish(audio_file_path)
+
+    # The job runs independently of the requests waiting on it, so a client
+    # disconnecting doesn't cancel synthesis other requests are streaming
+    job.task = asyncio.create_task(run())
+    return job
+
+async def ensure_summary_audio(summary_id: str) -> Optional[str]:
+    """Get the audio file of a stored summary, generating it on first use"""
+    summary = await executor.run_io(store.get_summary, summary_id)
+    if summary is None:
+        return None
+    if summary.audio_file_path and os.path.exists(summary.audio_file_path):
+        return summary.audio_file_path
+    return await start_summary_audio(summary_id, summary).wait()
+
+async def pipeline_audio(task_id: str, text: str) -> Optional[str]:
+    """Audio stage of the pipeline: only synthesizes before completion in eager mode"""
+    if AUDIO_MODE != "eager":
+        return None
+    return await generate_summary_audio(task_id, text)
+
+def schedule_summary_audio(summary_id: str) -> None:
+    """Queue audio generation for a completed summary in background mode"""
+    if AUDIO_MODE != "background":
+        return
+    try:
+        scheduler.submit(f"audio:{summary_id}", ensure_summary_audio, summary_id, priority="background")
+    except QueueFullError:
+        # Not critical: the audio is generated on first request instead
+        pass
+
+# Placeholder metadata by source, for fields neither the PDF nor a lookup provided
+PLACEHOLDER_METADATA = {
+    "upload": ("Uploaded document: {filename}", "Abstract not available for uploaded document"),
+    "url": ("Downloaded document from URL", "Abstract not available for URL document"),
+    "doi": ("Document {doi}", "Abstract not available for DOI document")
+}
+
+def parse_publication_date(value: Any) -> Optional[datetime]:
+    """Parse a publication date from PDF metadata, arXiv or CrossRef ("2020", "2020-04" or "2020-04-28")"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        parts = [int(part) for part in str(value)[:10].split("-")]
+        return datetime(*(parts + [1, 1])[:3])
+    except (TypeError, ValueError):
+        return None
+
+# Pipeline stages: each takes the DagRun and returns its result (see the graphs below)
+async def lookup_doi(run: DagRun) -> Dict[str, Any]:
+    """Resolve a DOI through CrossRef, for the PDF URL and the paper's metadata"""
+    await report_stage(run.context["task_id"], "downloading", doi=run.context["doi"])
+    paper_details = await doi_service.get_paper_details_async(run.context["doi"])
+    if not paper_details or not paper_details.get("pdf_url"):
+        raise ValueError("Could not retrieve PDF URL from DOI")
+    return paper_details
+
+async def lookup_arxiv(run: DagRun) -> Optional[Dict[str, Any]]:
+    """Look up the arXiv record of an arXiv URL (None for other URLs)"""
+    alias = normalize_url(run.context["url"])
+    if not alias.startswith("arxiv:"):
+        return None
+    paper = await arxiv_service.get_paper_by_id_async(alias[len("arxiv:"):])
+    if paper is None:
+        return None
+    return {
+        "title": paper.title,
+        "authors": [author.name for author in paper.authors],
+        "abstract": paper.summary,
+        "publication_date": paper.published,
+        "doi": paper.doi
+    }
+
+async def uploaded_paper(run: DagRun) -> str:
+    """Use the PDF already saved to uploads/"""
+    return run.context["file_path"]
+
+async def download_paper(run: DagRun) -> str:
+    """Download the PDF of a URL or DOI submission to uploads/"""
+    task_id = run.context["task_id"]
+    if run.context["source"] == "doi":
+        url = run.results["lookup_metadata"]["pdf_url"]
+        file_path = f"uploads/doi_{task_id}.pdf"
+    else:
+        url = run.context["url"]
+        file_path = f"uploads/url_{task_id}.pdf"
+        await report_stage(task_id, "downloading", url=url)
+    
+    os.makedirs("uploads", exist_ok=True)
+    try:
+        async with scheduler.stage("download"):
+            await pdf_service.download_pdf_async(url, file_path)
+    except Exception as download_error:
+        raise ValueError(f"Failed to download PDF from URL: {str(download_error)}")
+    
+    # Verify the file exists and has content
+    if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
+        raise ValueError("Downloaded file is empty or does not exist")
+    await executor.run_io(store.update_task, task_id, file_path=file_path)
+    return file_path
+
+async def hash_paper(run: DagRun) -> str:
+    """Hash the PDF, ending the run if the same PDF was already summarized"""
+    content_hash = run.context.get("content_hash")
+    if content_hash is not None:
+        # Uploads are hashed and looked up while they are saved
+        return content_hash
+    
+    task_id = run.context["task_id"]
+    content_hash, _ = await executor.run_io(hash_file, run.results["fetch"])
+    await executor.run_io(store.update_task, task_id, content_hash=content_hash)
+    cached_summary_id = await executor.run_io(summary_cache.lookup_hash, content_hash)
+    if cached_summary_id and await complete_from_cache(task_id, cached_summary_id, content_hash, run.context["aliases"]):
+        raise StopPipeline()
+    return content_hash
+
+async def extract_pages(run: DagRun) -> List[str]:
+    """Extract the text of the pages the summary needs"""
+    file_path = run.results["fetch"]
+    await report_stage(run.context["task_id"], "extracting", size_bytes=os.path.getsize(file_path))
+    pages = await extract_paper_pages(file_path, run.results["hash"])
+    if not any(pages):
+        raise ValueError("Could not extract text from the PDF")
+    return pages
+
+async def extract_text(run: DagRun) -> str:
+    """Join the extracted pages into the text the summary is written from"""
+    return pdf_service.join_pages(run.results["extract_pages"], TEXT_CHAR_BUDGET)
+
+async def extract_metadata(run: DagRun) -> Dict[str, Any]:
+    """Read title, authors, date and abstract from the PDF itself"""
+    # The abstract comes from the first page, which text extraction already parsed
+    return await executor.run_io(
+        pdf_service.extract_metadata, run.results["fetch"], first_page_text=run.results["extract_pages"][0]
+    )
+
+async def classify_topics(run: DagRun) -> List[TopicClassification]:
+    """Score the submitted topics against the paper's text"""
+    task_id = run.context["task_id"]
+    classifications = await topic_classifier.classify(run.results["extract_text"], run.context["topics"])
+    await executor.run_io(
+        store.update_task, task_id, topic_classifications=[classification.dict() for classification in classifications]
+    )
+    return classifications
+
+async def build_metadata(run: DagRun) -> PaperMetadata:
+    """Combine the looked-up record, the PDF's own metadata and placeholders"""
+    context = run.context
+    title, abstract = PLACEHOLDER_METADATA[context["source"]]
+    
+    # Only topics the paper is actually about are kept (all of them if classification failed)
+    topics = context["topics"]
+    classifications = run.results.get("classify")
+    if classifications is not None:
+        matched = {classification.topic for classification in classifications}
+        topics = [topic for topic in topics if topic in matched]
+    
+    fields = {
+        "title": title.format(filename=os.path.basename(run.results["fetch"]), doi=context.get("doi")),
+        "authors": ["Unknown"],
+        "abstract": abstract,
+        "publication_date": None,
+        "doi": context.get("doi"),
+        "url": context.get("url"),
+        "source": context["source"],
+        "topics": topics
+    }
+    
+    # Looked-up records are more reliable than PDF metadata, so they are applied last
+    for found in (run.results.get("extract_metadata"), run.results.get("lookup_metadata")):
+        for key in ("title", "authors", "abstract", "publication_date", "doi"):
+            value = (found or {}).get(key)
+            if value and value != "Unknown Title":
+                fields[key] = value
+    fields["publication_date"] = parse_publication_date(fields["publication_date"])
+    return PaperMetadata(**fields)
+
+async def draft_summary(run: DagRun) -> Optional[Dict[str, Any]]:
+    """
+    Draft the summary with the writer agent
+
+    Bulk jobs (LLM_BATCH_PRIORITIES) that need a single completion return None
+    instead; store_summary then queues the draft for the Batch API.
+    """
+    text_content = run.results["extract_text"]
+    if scheduler.current_priority() in LLM_BATCH_PRIORITIES and not summary_writer.is_long_document(text_content):
+        return None
+    
+    task_id = run.context["task_id"]
+    await report_stage(task_id, "drafting", text_chars=len(text_content))
+    try:
+        async with scheduler.stage("llm"):
+            return await summary_writer.generate_summary(
+                full_text=text_content,
+                on_token=relay_tokens(task_id, "draft")
+            )
+    except Exception as summary_error:
+        raise RuntimeError(f"Error generating summary: {str(summary_error)}")
+
+async def proofread_summary(run: DagRun) -> Optional[Dict[str, Any]]:
+    """Proof-read and improve the draft"""
+    draft = run.results["draft"]
+    if draft is None:
+        return None
+    
+    task_id = run.context["task_id"]
+    await report_stage(task_id, "proofreading", draft_summary=draft["summary"])
+    async with scheduler.stage("llm"):
+        return await proof_reader.review_summary(
+            draft_summary=draft,
+            full_text=run.results["extract_text"],
+            on_token=relay_tokens(task_id, "final")
+        )
+
+async def summary_audio(run: DagRun) -> Optional[str]:
+    """Generate audio for the summary (deferred unless AUDIO_MODE is eager)"""
+    final_summary = run.results["proofread"]
+    if final_summary is None:
+        return None
+    
+    task_id = run.context["task_id"]
+    if AUDIO_MODE == "eager":
+        await report_stage(task_id, "audio", summary=final_summary["summary"])
+    return await pipeline_audio(task_id, final_summary["summary"])
+
+async def store_summary(run: DagRun) -> str:
+    """Save the finished summary, or queue a deferred draft for the Batch API and end the run"""
+    context = run.context
+    task_id = context["task_id"]
+    file_path = run.results["fetch"]
+    content_hash = run.results["hash"]
+    metadata = run.results["metadata"]
+    
+    if run.results["draft"] is None:
+        # resume_batched_draft picks the task up from here once the batch finishes
+        text_content = run.results["extract_text"]
+        await executor.run_io(store.update_task, task_id, batch_draft={
+            "metadata": metadata.dict(),
+            "file_path": file_path,
+            "content_hash": content_hash,
+            "aliases": context["aliases"]
+        })
+        await executor.run_io(llm_batches.add, f"draft:{task_id}", task_id, summary_writer.draft_request(text_content))
+        await report_stage(task_id, "batched", text_chars=len(text_content), poll_url=f"/tasks/{task_id}")
+        raise StopPipeline()
+    
+    # Create summary object
+    final_summary = run.results["proofread"]
+    summary_id = task_id
+    paper_summary = PaperSummary(
+        paper_id=task_id,
+        metadata=metadata,
+        summary=final_summary["summary"],
+        key_findings=final_summary["key_findings"],
+        methodology=final_summary["methodology"],
+        implications=final_summary["implications"],
+        citations=final_summary.get("citations", []),
+        audio_file_path=run.results["audio"]
+    )
+    
+    # Save summary to the database
+    await executor.run_io(store.save_summary, summary_id, paper_summary)
+    try:
+        await executor.run_io(search_index.index, summary_id, paper_summary)
+    except Exception as e:
+        # The summary is indexed by the next startup's sync instead
+        print(f"Error indexing summary {summary_id}: {str(e)}")
+    
+    # Save summary to file
+    summary_file_path = await executor.run_io(save_summary_to_file, summary_id, paper_summary)
+    
+    # Update task status
+    await executor.run_io(
+        store.update_task,
+        task_id,
+        status="completed",
+        summary_id=summary_id,
+        summary_file_path=summary_file_path
+    )
+    
+    await report_stage(task_id, "completed", summary_id=summary_id, summary=final_summary["summary"])
+    
+    # Remember the summary for duplicate submissions of the same PDF
+    await executor.run_io(summary_cache.put, content_hash, summary_id, os.path.getsize(file_path), context["aliases"])
+    schedule_summary_audio(summary_id)
+    return summary_id
+
+async def batched_draft(run: DagRun) -> Dict[str, Any]:
+    """Parse a draft returned by the Batch API"""
+    return summary_writer.extract_sections(run.context["summary_text"])
+
+async def batched_metadata(run: DagRun) -> PaperMetadata:
+    """Restore the metadata built before the draft was batched"""
+    return PaperMetadata(**run.context["metadata"])
+
+# Stages shared by every flow once the draft is known
+SUMMARY_STAGES = [
+    Stage("proofread", proofread_summary, requires=["draft", "extract_text"]),
+    Stage("audio", summary_audio, requires=["proofread"]),
+    Stage("save", store_summary, requires=["proofread", "audio", "metadata"])
+]
+
+def paper_pipeline(*source_stages: Stage) -> StageGraph:
+    """
+    Build the stage graph of a submission flow
+
+    Metadata extraction, lookups and topic classification run next to drafting,
+    so they only add to the total time if they outlast the draft.
+
+    Args:
+        *source_stages: Stages producing the PDF path ("fetch") and optionally a
+            looked-up metadata record ("lookup_metadata")
+
+    Returns:
+        The flow's stage graph
+    """
+    metadata_sources = ["extract_metadata", "classify"]
+    if any(stage.name == "lookup_metadata" for stage in source_stages):
+        metadata_sources.append("lookup_metadata")
+    return StageGraph([
+        *source_stages,
+        Stage("hash", hash_paper, requires=["fetch"]),
+        Stage("extract_pages", extract_pages, requires=["hash"]),
+        Stage("extract_text", extract_text, requires=["extract_pages"]),
+        # Only build_metadata needs it, which also waits for classify (after extract_text)
+        Stage("extract_metadata", extract_metadata, requires=["extract_pages"], optional=True),
+        Stage("classify", classify_topics, requires=["extract_text"], optional=True),
+        Stage("metadata", build_metadata, requires=metadata_sources),
+        Stage("draft", draft_summary, requires=["extract_text"]),
+        *SUMMARY_STAGES
+    ])
+
+UPLOAD_PIPELINE = paper_pipeline(Stage("fetch", uploaded_paper))
+URL_PIPELINE = paper_pipeline(
+    Stage("fetch", download_paper),
+    Stage("lookup_metadata", lookup_arxiv, optional=True)
+)
+DOI_PIPELINE = paper_pipeline(
+    Stage("lookup_metadata", lookup_doi),
+    Stage("fetch", download_paper, requires=["lookup_metadata"])
+)
+RESUME_PIPELINE = StageGraph([
+    Stage("fetch", uploaded_paper),
+    Stage("hash", hash_paper, requires=["fetch"]),
+    Stage("extract_pages", extract_pages, requires=["hash"]),
+    Stage("extract_text", extract_text, requires=["extract_pages"]),
+    Stage("draft", batched_draft),
+    Stage("metadata", batched_metadata),
+    *SUMMARY_STAGES
+])
+
+def record_pipeline_timings(run: DagRun) -> None:
+    """Store when each stage of a task ran and which ones made up the critical path"""
+    store.update_task(
+        run.context["task_id"],
+        pipeline_timings=run.timings(),
+        critical_path=run.critical_path()
+    )
+
+async def run_pipeline(graph: StageGraph, task_id: str, **context: Any) -> None:
+    """
+    Run a task through a stage graph, failing the task if a stage fails
+
+    Args:
+        graph: Stage graph of the flow
+        task_id: Task ID
+        **context: Inputs of the flow's stages
+    """
+    finished: List[DagRun] = []
+    try:
+        await executor.run_io(store.update_task, task_id, status="processing")
+        await graph.run({"task_id": task_id, **context}, on_finish=finished.append)
+    except Exception as e:
+        await fail_task(task_id, str(e))
+    finally:
+        if finished:
+            await executor.run_io(record_pipeline_timings, finished[0])
+
+async def process_paper_task(
+    task_id: str,
+    file_path: str,
+    topics: List[str],
+    content_hash: Optional[str] = None,
+    aliases: Optional[List[str]] = None
+):
+    """Background task to process an uploaded paper"""
+    await run_pipeline(
+        UPLOAD_PIPELINE, task_id,
+        source="upload", file_path=file_path, content_hash=content_hash, topics=topics, aliases=aliases or []
+    )
+
+async def process_url_task(task_id: str, url: str, topics: List[str], aliases: Optional[List[str]] = None):
+    """Background task to process a paper from URL"""
+    await run_pipeline(URL_PIPELINE, task_id, source="url", url=url, topics=topics, aliases=aliases or [])
+
+async def process_doi_task(task_id: str, doi: str, topics: List[str], aliases: Optional[List[str]] = None):
+    """Background task to process a paper from DOI"""
+    await run_pipeline(DOI_PIPELINE, task_id, source="doi", doi=doi, topics=topics, aliases=aliases or [])
+
+async def resume_batched_draft(task_id: str, summary_text: str):
+    """Background task to finish a paper whose draft came back from the Batch API"""
+    task = await executor.run_io(store.get_task, task_id)
+    if task is None or "batch_draft" not in task:
+        print(f"Error resuming batched draft: no batch context for task {task_id}")
+        return
+    
+    # The extracted text is served from the text cache
+    context = task["batch_draft"]
+    await run_pipeline(
+        RESUME_PIPELINE, task_id,
+        source=context["metadata"]["source"],
+        file_path=context["file_path"],
+        content_hash=context["content_hash"],
+        aliases=context["aliases"],
+        metadata=context["metadata"],
+        summary_text=summary_text
+    )
+
+async def process_doi_batch_task(items: List[Tuple[str, str, str]], topics: List[str], item_priority: str = "bulk"):
+    """Background task to resolve a batch of DOIs concurrently and queue the papers"""
+    # Resolve all DOIs first; DoiService rate-limits CrossRef requests and caches the results
+    details = await asyncio.gather(
+        *(doi_service.get_paper_details_async(doi) for _, doi, _ in items)
+    )
+    
+    for (task_id, doi, alias), paper_details in zip(items, details):
+        if not paper_details or not paper_details.get("pdf_url"):
+            await fail_task(task_id, "Could not retrieve PDF URL from DOI")
+            continue
+        # Capacity was reserved when the batch was accepted; the DOI lookups
+        # inside process_doi_task are now served from the cache
+        scheduler.submit(task_id, process_doi_task, task_id, doi, topics, aliases=[alias], priority=item_priority, force=True)
+
+async def flush_llm_batches() -> None:
+    """Submit queued Batch API requests once there are enough of them or the oldest has waited long enough"""
+    pending = await executor.run_io(llm_batches.pending)
+    if not pending["requests"]:
+        return
+    if pending["requests"] < LLM_BATCH_SIZE and pending["oldest_seconds"] < LLM_BATCH_MAX_WAIT_SECONDS:
+        return
+    
+    requests = await executor.run_io(llm_batches.claim_queued, LLM_BATCH_SIZE)
+    if not requests:
+        return
+    batch_id = None
+    try:
+        batch_id = await llm_gateway.submit_batch(requests)
+    finally:
+        # Requests of a failed submission are queued again for the next round
+        await executor.run_io(llm_batches.mark_submitted, [request["custom_id"] for request in requests], batch_id)
+
+async def collect_llm_batches() -> None:
+    """Hand the results of finished batches back to their tasks"""
+    for batch_id in await executor.run_io(llm_batches.submitted_batches):
+        batch = await llm_gateway.get_batch(batch_id)
+        if batch["status"] not in ("completed", "failed", "expired", "cancelled"):
+            continue
+        
+        requests = await executor.run_io(llm_batches.claim_batch, batch_id)
+        if not requests:
+            continue
+        try:
+            results = await llm_gateway.batch_results(batch)
+        except Exception:
+            await executor.run_io(llm_batches.release_batch, batch_id)
+            raise
+        
+        for request in requests:
+            result = results.get(request["custom_id"]) or {"error": f"Batch {batch['status']} without a result"}
+            if "content" in result:
+                scheduler.submit(
+                    request["task_id"], resume_batched_draft, request["task_id"], result["content"],
+                    priority="bulk", force=True
+                )
+            else:
+                await fail_task(request["task_id"], f"Error generating summary: {result['error']}")
+        await executor.run_io(llm_batches.remove, [request["custom_id"] for request in requests])
+
+async def run_llm_batches() -> None:
+    """Submit and collect Batch API requests until cancelled"""
+    while True:
+        try:
+            await flush_llm_batches()
+            await collect_llm_batches()
+        except Exception as e:
+            print(f"Error processing LLM batches: {str(e)}")
+        await asyncio.sleep(LLM_BATCH_POLL_SECONDS)
+
+def start_background_tasks() -> None:
+    """Start the loops that run next to the scheduler in API and worker processes"""
+    if LLM_BATCH_PRIORITIES and not background_tasks:
+        background_tasks.append(asyncio.create_task(run_llm_batches()))
+
+async def stop_background_tasks() -> None:
+    """Cancel the loops started by start_background_tasks"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
+
+# Jobs refer to these by name, so any process importing the pipeline can run them
+scheduler.register(
+    process_paper_task,
+    process_url_task,
+    process_doi_task,
+    process_doi_batch_task,
+    resume_batched_draft,
+    ensure_summary_audio
+)
@@ -0,0 +1,56 @@
+import os
+import tarfile
+import zipfile
+from typing import BinaryIO, Iterator, Tuple
+
+
+def is_pdf_member(name: str) -> bool:
+    """Whether an archive member looks like a PDF (skipping macOS resource forks)"""
+    basename = os.path.basename(name)
+    return (
+        basename.lower().endswith(".pdf")
+        and not basename.startswith("._")
+        and not name.startswith("__MACOSX/")
+    )
+
+
+def iter_archive_pdfs(fileobj: BinaryIO) -> Iterator[Tuple[str, int, BinaryIO]]:
+    """
+    Iterate over the PDFs in a zip or tar archive (optionally gzip/bzip2/xz compressed)
+
+    Members are read straight from the archive one at a time, so nothing is
+    extracted up front and only one member is open at once. Tar archives are
+    read as a stream, so each member has to be consumed before moving on.
+
+    Args:
+        fileobj: Archive file object (seekable for zip archives)
+
+    Yields:
+        Tuples of (member name, uncompressed size, readable member stream)
+
+    Raises:
+        ValueError: If the file is neither a zip nor a tar archive
+    """
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_pdf_member(info.filename):
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, info.file_size, member
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r|*")
+    except tarfile.TarError:
+        raise ValueError("Expected a zip or tar archive")
+
+    with archive:
+        for info in archive:
+            if not info.isfile() or not is_pdf_member(info.name):
+                continue
+            member = archive.extractfile(info)
+            if member is not None:
+                yield info.name, info.size, member
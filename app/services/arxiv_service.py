@@ -1,22 +1,56 @@
 import arxiv
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import asyncio
+import calendar
+import feedparser
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Dict, Any, Tuple
+
+from app.services.http_client import get_http_client
+from app.services.search_cache import SearchCache
 
 class ArxivService:
     """Service for interacting with the arXiv API to search and retrieve papers"""
-    
-    def search(
-        self, 
-        query: str, 
-        max_results: int = 10, 
+
+    SORT_BY_VALUES = ("relevance", "lastUpdatedDate", "submittedDate")
+    SORT_ORDER_VALUES = ("ascending", "descending")
+    # arXiv boolean operators are case sensitive, everything else in a query is not
+    QUERY_OPERATORS = ("AND", "OR", "ANDNOT")
+
+    def __init__(self, cache: Optional[SearchCache] = None):
+        # Searches and paper lookups share one cache, so papers seen in search
+        # results can be served by get_paper_by_id without another request
+        self.cache = cache or SearchCache(
+            ttl_seconds=float(os.environ.get("ARXIV_CACHE_TTL_SECONDS", "3600")),
+            max_entries=int(os.environ.get("ARXIV_CACHE_MAX_ENTRIES", "1024")),
+            disk_dir=os.environ.get("ARXIV_CACHE_DIR") or None,
+            max_disk_bytes=int(float(os.environ.get("ARXIV_CACHE_MAX_MB", "64")) * 1024 * 1024),
+            serialize=self._serialize_cached,
+            deserialize=self._deserialize_cached
+        )
+
+        # A single client keeps arXiv's politeness delay across calls
+        self.client = arxiv.Client()
+        self.page_size = self.client.page_size
+        self.delay_seconds = self.client.delay_seconds
+        self.query_url = "https://export.arxiv.org/api/query"
+        self._request_lock: Optional[asyncio.Lock] = None
+        self._last_request_time = 0.0
+
+    def _build_search(
+        self,
+        query: str,
+        max_results: int = 10,
         sort_by: str = "relevance",
         sort_order: str = "descending",
         year_from: Optional[int] = None,
         year_to: Optional[int] = None
-    ) -> List[Any]:
+    ) -> arxiv.Search:
         """
-        Search for papers on arXiv based on provided parameters
-        
+        Build an arXiv search from the API search parameters
+
         Args:
             query: Search query string
             max_results: Maximum number of results to return
@@ -24,9 +58,9 @@ class ArxivService:
             sort_order: Sort order (ascending or descending)
             year_from: Filter papers published from this year
             year_to: Filter papers published until this year
-            
+
         Returns:
-            List of arXiv paper objects
+            arXiv search object
         """
         # Build date filter if years are provided
         date_filter = ""
@@ -35,50 +69,431 @@ class ArxivService:
             date_filter += f"{year_to}1231]" if year_to else "99991231]"
         elif year_to:
             date_filter += f" AND submittedDate:[00010101 TO {year_to}1231]"
-            
+
         # Combine with main query
         full_query = query + date_filter
-        
+
         # Map sort parameters to arXiv API options
         sort_options = {
             "relevance": arxiv.SortCriterion.Relevance,
             "lastUpdatedDate": arxiv.SortCriterion.LastUpdatedDate,
             "submittedDate": arxiv.SortCriterion.SubmittedDate
         }
-        
+
         sort_order_options = {
             "ascending": arxiv.SortOrder.Ascending,
             "descending": arxiv.SortOrder.Descending
         }
-        
-        # Create client and search
-        client = arxiv.Client()
-        search = arxiv.Search(
+
+        return arxiv.Search(
             query=full_query,
             max_results=max_results,
             sort_by=sort_options.get(sort_by, arxiv.SortCriterion.Relevance),
             sort_order=sort_order_options.get(sort_order, arxiv.SortOrder.Descending)
         )
-        
+
+    def search(
+        self,
+        query: str,
+        max_results: int = 10,
+        sort_by: str = "relevance",
+        sort_order: str = "descending",
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Search for papers on arXiv based on provided parameters
+
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+            sort_by: Sort method (relevance, lastUpdatedDate, submittedDate)
+            sort_order: Sort order (ascending or descending)
+            year_from: Filter papers published from this year
+            year_to: Filter papers published until this year
+
+        Returns:
+            List of arXiv paper objects
+        """
+        key = self._search_key(query, sort_by, sort_order, year_from, year_to)
+        cached = self._get_cached_search(key, max_results)
+        if cached is not None:
+            return cached
+
+        search = self._build_search(query, max_results, sort_by, sort_order, year_from, year_to)
+
         # Execute search and return results
-        results = list(client.results(search))
+        results = list(self.client.results(search))
+        self.cache.set_many(self._search_entries(key, max_results, results))
+        return results
+
+    async def search_async(
+        self,
+        query: str,
+        max_results: int = 10,
+        sort_by: str = "relevance",
+        sort_order: str = "descending",
+        year_from: Optional[int] = None,
+        year_to: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Search for papers on arXiv over the shared async HTTP client
+
+        Args:
+            query: Search query string
+            max_results: Maximum number of results to return
+            sort_by: Sort method (relevance, lastUpdatedDate, submittedDate)
+            sort_order: Sort order (ascending or descending)
+            year_from: Filter papers published from this year
+            year_to: Filter papers published until this year
+
+        Returns:
+            List of arXiv paper objects
+        """
+        key = self._search_key(query, sort_by, sort_order, year_from, year_to)
+        cached = await self.cache.get_async(key, accept=self._covers(max_results))
+        if cached is not None:
+            return cached["results"][:max_results]
+
+        search = self._build_search(query, max_results, sort_by, sort_order, year_from, year_to)
+        results = await self._fetch_results(search)
+        await self.cache.set_many_async(self._search_entries(key, max_results, results))
         return results
-        
+
     def get_paper_by_id(self, arxiv_id: str) -> Any:
         """
         Retrieve a specific paper by its arXiv ID
-        
+
         Args:
             arxiv_id: The arXiv identifier
-            
+
         Returns:
             arXiv paper object
         """
-        client = arxiv.Client()
+        cached = self.cache.get(("id", arxiv_id))
+        if cached is not None:
+            return cached
+
         search = arxiv.Search(id_list=[arxiv_id])
-        results = list(client.results(search))
-        
+        results = list(self.client.results(search))
+
+        if not results:
+            return None
+
+        self.cache.set_many(self._paper_entries(results[0], arxiv_id))
+        return results[0]
+
+    async def get_paper_by_id_async(self, arxiv_id: str) -> Any:
+        """
+        Retrieve a specific paper by its arXiv ID over the shared async HTTP client
+
+        Args:
+            arxiv_id: The arXiv identifier
+
+        Returns:
+            arXiv paper object
+        """
+        cached = await self.cache.get_async(("id", arxiv_id))
+        if cached is not None:
+            return cached
+
+        results = await self._fetch_results(arxiv.Search(id_list=[arxiv_id]))
+
         if not results:
             return None
-        
-        return results[0]
\ No newline at end of file
+
+        await self.cache.set_many_async(self._paper_entries(results[0], arxiv_id))
+        return results[0]
+
+    def _search_key(
+        self,
+        query: str,
+        sort_by: str,
+        sort_order: str,
+        year_from: Optional[int],
+        year_to: Optional[int]
+    ) -> Tuple[Any, ...]:
+        """
+        Build the cache key for a search (max_results is deliberately left out)
+
+        Args:
+            query: Search query string
+            sort_by: Sort method
+            sort_order: Sort order
+            year_from: Filter papers published from this year
+            year_to: Filter papers published until this year
+
+        Returns:
+            Normalized cache key
+        """
+        normalized_query = " ".join(
+            token if token in self.QUERY_OPERATORS else token.lower()
+            for token in query.split()
+        )
+        # Unknown sort values fall back to the defaults in _build_search
+        sort_by = sort_by if sort_by in self.SORT_BY_VALUES else "relevance"
+        sort_order = sort_order if sort_order in self.SORT_ORDER_VALUES else "descending"
+        return ("search", normalized_query, sort_by, sort_order, year_from or None, year_to or None)
+
+    def _get_cached_search(self, key: Tuple[Any, ...], max_results: int) -> Optional[List[Any]]:
+        """
+        Serve a search from the cache if a cached result set covers it
+
+        Args:
+            key: Cache key from _search_key
+            max_results: Number of results requested
+
+        Returns:
+            List of arXiv paper objects, or None on a miss
+        """
+        entry = self.cache.get(key, accept=self._covers(max_results))
+        if entry is None:
+            return None
+        return entry["results"][:max_results]
+
+    @staticmethod
+    def _covers(max_results: int) -> Callable[[Dict[str, Any]], bool]:
+        """
+        Build the check that a cached search can serve a request
+
+        A cached search with a larger max_results (or one that returned every
+        available result) also serves smaller requests for the same query.
+
+        Args:
+            max_results: Number of results requested
+
+        Returns:
+            Predicate over cached search entries
+        """
+        return lambda e: e["max_results"] >= max_results or len(e["results"]) < e["max_results"]
+
+    def _search_entries(
+        self,
+        key: Tuple[Any, ...],
+        max_results: int,
+        results: List[Any]
+    ) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """
+        Build the cache entries for search results, indexing each paper for get_paper_by_id
+
+        Args:
+            key: Cache key from _search_key
+            max_results: Number of results requested
+            results: Results returned by arXiv
+
+        Returns:
+            (key, value) pairs to cache
+        """
+        entries = [(key, {"max_results": max_results, "results": results})]
+        for result in results:
+            entries.extend(self._paper_entries(result))
+        return entries
+
+    def _paper_entries(self, result: Any, requested_id: Optional[str] = None) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """
+        Build the cache entries of a paper under its versioned and unversioned arXiv IDs
+
+        Args:
+            result: arXiv paper object
+            requested_id: ID the paper was requested under, if any
+
+        Returns:
+            (key, value) pairs to cache
+        """
+        short_id = result.get_short_id()
+        ids = {short_id, re.sub(r"v\d+$", "", short_id)}
+        if requested_id:
+            ids.add(requested_id)
+        return [(("id", arxiv_id), result) for arxiv_id in ids]
+
+    @staticmethod
+    def _result_to_dict(result: arxiv.Result) -> Dict[str, Any]:
+        """
+        Convert an arXiv paper object into JSON types
+
+        Args:
+            result: arXiv paper object
+
+        Returns:
+            Dictionary accepted by _result_from_dict
+        """
+        return {
+            "entry_id": result.entry_id,
+            "updated": result.updated.isoformat() if result.updated else None,
+            "published": result.published.isoformat() if result.published else None,
+            "title": result.title,
+            "authors": [author.name for author in result.authors],
+            "summary": result.summary,
+            "comment": result.comment,
+            "journal_ref": result.journal_ref,
+            "doi": result.doi,
+            "primary_category": result.primary_category,
+            "categories": result.categories,
+            "links": [
+                {"href": link.href, "title": link.title, "rel": link.rel, "content_type": link.content_type}
+                for link in result.links
+            ]
+        }
+
+    @staticmethod
+    def _result_from_dict(data: Dict[str, Any]) -> arxiv.Result:
+        """
+        Rebuild an arXiv paper object from _result_to_dict output
+
+        Args:
+            data: Dictionary from _result_to_dict
+
+        Returns:
+            arXiv paper object
+        """
+        return arxiv.Result(
+            entry_id=data["entry_id"],
+            updated=datetime.fromisoformat(data["updated"]) if data["updated"] else None,
+            published=datetime.fromisoformat(data["published"]) if data["published"] else None,
+            title=data["title"],
+            authors=[arxiv.Result.Author(name) for name in data["authors"]],
+            summary=data["summary"],
+            comment=data["comment"],
+            journal_ref=data["journal_ref"],
+            doi=data["doi"],
+            primary_category=data["primary_category"],
+            categories=data["categories"],
+            links=[arxiv.Result.Link(**link) for link in data["links"]]
+        )
+
+    def _serialize_cached(self, value: Any) -> Dict[str, Any]:
+        """Convert a cached paper or search entry into JSON types for the disk tier"""
+        if isinstance(value, arxiv.Result):
+            return {"paper": self._result_to_dict(value)}
+        return {
+            "max_results": value["max_results"],
+            "results": [self._result_to_dict(result) for result in value["results"]]
+        }
+
+    def _deserialize_cached(self, data: Dict[str, Any]) -> Any:
+        """Rebuild a cached paper or search entry read from the disk tier"""
+        if "paper" in data:
+            return self._result_from_dict(data["paper"])
+        return {
+            "max_results": data["max_results"],
+            "results": [self._result_from_dict(result) for result in data["results"]]
+        }
+
+    def _query_args(self, search: arxiv.Search) -> Dict[str, Any]:
+        """
+        Build the export API query string arguments of a search
+
+        Args:
+            search: arXiv search object
+
+        Returns:
+            Query string arguments (without paging)
+        """
+        return {
+            "search_query": search.query,
+            "id_list": ",".join(search.id_list),
+            "sortBy": search.sort_by.value,
+            "sortOrder": search.sort_order.value
+        }
+
+    def _parse_entry(self, entry: feedparser.FeedParserDict) -> Optional[arxiv.Result]:
+        """
+        Convert an Atom feed entry into an arXiv paper object
+
+        Args:
+            entry: Parsed feed entry
+
+        Returns:
+            arXiv paper object, or None for entries without an ID (e.g. error entries)
+        """
+        if "id" not in entry:
+            return None
+
+        def to_datetime(value: Optional[time.struct_time]) -> Optional[datetime]:
+            return datetime.fromtimestamp(calendar.timegm(value), tz=timezone.utc) if value else None
+
+        return arxiv.Result(
+            entry_id=entry.id,
+            updated=to_datetime(entry.get("updated_parsed")),
+            published=to_datetime(entry.get("published_parsed")),
+            title=re.sub(r"\s+", " ", entry.get("title", "0")),
+            authors=[arxiv.Result.Author(author.get("name", "")) for author in entry.get("authors", [])],
+            summary=entry.get("summary", ""),
+            comment=entry.get("arxiv_comment"),
+            journal_ref=entry.get("arxiv_journal_ref"),
+            doi=entry.get("arxiv_doi"),
+            primary_category=entry.get("arxiv_primary_category", {}).get("term"),
+            categories=[tag.get("term") for tag in entry.get("tags", [])],
+            links=[
+                arxiv.Result.Link(
+                    href=link.href,
+                    title=link.get("title"),
+                    rel=link.get("rel"),
+                    content_type=link.get("type")
+                )
+                for link in entry.get("links", [])
+            ]
+        )
+
+    async def _fetch_results(self, search: arxiv.Search) -> List[Any]:
+        """
+        Fetch all pages of a search from the arXiv export API
+
+        Args:
+            search: arXiv search object
+
+        Returns:
+            List of arXiv paper objects
+        """
+        results = []
+        total_results = search.max_results
+        offset = 0
+        first_page = True
+
+        while offset < total_results:
+            page_size = min(self.page_size, search.max_results - offset)
+            url_args = self._query_args(search)
+            url_args.update({"start": offset, "max_results": page_size})
+            feed = await self._fetch_feed(url_args)
+
+            if first_page:
+                # arXiv reports totalResults=1 for empty result sets
+                if len(feed.entries) == 0:
+                    break
+                total_results = min(total_results, int(feed.feed.opensearch_totalresults))
+                first_page = False
+            elif len(feed.entries) == 0:
+                break
+
+            offset += len(feed.entries)
+            for entry in feed.entries:
+                result = self._parse_entry(entry)
+                if result is not None:
+                    results.append(result)
+
+        return results
+
+    async def _fetch_feed(self, url_args: Dict[str, Any]) -> feedparser.FeedParserDict:
+        """
+        Fetch and parse one page of the arXiv Atom feed, honouring arXiv's delay between requests
+
+        Args:
+            url_args: Query string arguments
+
+        Returns:
+            Parsed feed
+        """
+        if self._request_lock is None:
+            self._request_lock = asyncio.Lock()
+
+        async with self._request_lock:
+            wait = self._last_request_time + self.delay_seconds - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                response = await get_http_client().get(self.query_url, params=url_args)
+            finally:
+                self._last_request_time = time.monotonic()
+
+        response.raise_for_status()
+        return feedparser.parse(response.text)
@@ -1,30 +1,445 @@
+import abc
+import asyncio
+import hashlib
+import io
+import json
 import os
+import re
+import threading
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple, Type
+
 from gtts import gTTS
 
+from app.services.executor import ExecutionService
+
+# Bitrates (kbps) and sample rates (Hz) for MPEG audio layer III frame headers
+MP3_BITRATES = {
+    3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],  # MPEG-1
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2
+    0: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],      # MPEG-2.5
+}
+MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# Sentence ends followed by whitespace, where a summary can be split for synthesis
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def _mp3_frame_length(header: bytes) -> int:
+    """
+    Length in bytes of the layer III frame starting with a 4-byte header
+
+    Returns:
+        Frame length, or 0 if the bytes aren't a valid layer III frame header
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return 0
+    version = (header[1] >> 3) & 0x03
+    layer = (header[1] >> 1) & 0x03
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return 0
+
+    bitrate = MP3_BITRATES[version][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    samples_per_frame = 1152 if version == 3 else 576
+    return samples_per_frame // 8 * bitrate // sample_rate + padding
+
+
+def mp3_frames(data: bytes) -> bytes:
+    """
+    Strip everything but the audio frames from an MP3 file
+
+    ID3 tags and the Xing/Info/VBRI header frame describe a single file; when
+    several synthesized segments are concatenated they would be read as part
+    of the audio (or give players the wrong duration), so only the raw frames
+    are kept. The frames themselves are copied as-is, without re-encoding.
+
+    Args:
+        data: MP3 file contents
+
+    Returns:
+        The MP3 audio frames
+    """
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        # ID3v2 size is a 28-bit "syncsafe" integer, excluding the 10-byte header (and footer, if flagged)
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+
+    frame_length = _mp3_frame_length(data[start:start + 4])
+    if frame_length:
+        first_frame = data[start:start + frame_length]
+        if b"Xing" in first_frame or b"Info" in first_frame or b"VBRI" in first_frame:
+            start += frame_length
+    return data[start:end]
+
+
+class TtsBackend(abc.ABC):
+    """Text-to-speech engine producing MP3 audio for one segment of text"""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def synthesize(self, text: str, lang: str, tld: str, slow: bool) -> bytes:
+        """
+        Synthesize speech for a segment of text
+
+        Args:
+            text: Text to speak
+            lang: Language code
+            tld: Top-level domain selecting the accent (e.g. "com", "co.in")
+            slow: Whether to speak slowly
+
+        Returns:
+            MP3 file contents
+        """
+
+
+class GttsBackend(TtsBackend):
+    """Google Text-to-Speech"""
+
+    name = "gtts"
+
+    def synthesize(self, text: str, lang: str, tld: str, slow: bool) -> bytes:
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=lang, tld=tld, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class StubBackend(TtsBackend):
+    """Offline stand-in producing silence roughly as long as the text would take to read"""
+
+    name = "stub"
+
+    # MPEG-1 layer III, 32 kbps, 44.1 kHz, mono: 104-byte frames of 1152 samples (~26 ms)
+    FRAME = b"\xff\xfb\x10\xc0" + bytes(100)
+    FRAMES_PER_CHAR = 2.5  # ~15 characters per second
+
+    def synthesize(self, text: str, lang: str, tld: str, slow: bool) -> bytes:
+        frames = max(1, int(len(text) * self.FRAMES_PER_CHAR * (1.5 if slow else 1.0)))
+        return self.FRAME * frames
+
+
+TTS_BACKENDS: Dict[str, Type[TtsBackend]] = {
+    GttsBackend.name: GttsBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+class AudioJob:
+    """
+    Audio synthesis in progress, whose segments any number of listeners can
+    stream while it runs
+
+    Methods must be called from the event loop thread.
+    """
+
+    def __init__(self):
+        self.segments: List[bytes] = []
+        self.finished = False
+        self.audio_file_path: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        """Wake up everyone waiting for the next change"""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def add_segment(self, frames: bytes) -> None:
+        """Publish the MP3 frames of the next segment"""
+        self.segments.append(frames)
+        self._notify()
+
+    def finish(self, audio_file_path: Optional[str]) -> None:
+        """Mark synthesis as done, with the path of the audio file or None if it failed"""
+        self.audio_file_path = audio_file_path
+        self.finished = True
+        self._notify()
+
+    async def wait(self) -> Optional[str]:
+        """
+        Wait for synthesis to finish
+
+        Returns:
+            Path of the audio file, or None if synthesis failed
+        """
+        while not self.finished:
+            await self._changed.wait()
+        return self.audio_file_path
+
+    async def iter_segments(self) -> AsyncIterator[bytes]:
+        """
+        Yield every segment from the first one, waiting for segments still being synthesized
+
+        Yields:
+            MP3 audio frames of each segment
+        """
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.segments):
+                yield self.segments[index]
+                index += 1
+            if self.finished:
+                return
+            await changed.wait()
+
+
 class AudioService:
     """Service for converting text to speech"""
-    
-    def generate_audio(self, text: str, output_path: str) -> bool:
+
+    def __init__(
+        self,
+        backend: Optional[TtsBackend] = None,
+        lang: Optional[str] = None,
+        tld: Optional[str] = None,
+        slow: bool = False,
+        max_parallel: Optional[int] = None,
+        segment_chars: Optional[int] = None,
+        first_segment_chars: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: Optional[int] = None
+    ):
+        self.backend = backend or TTS_BACKENDS[os.environ.get("TTS_BACKEND", "gtts")]()
+        self.lang = lang or os.environ.get("TTS_LANG", "en")
+        # Set TTS_TLD=co.in for an Indian English accent
+        self.tld = tld or os.environ.get("TTS_TLD", "com")
+        self.slow = slow
+        self.max_parallel = max_parallel or int(os.environ.get("TTS_MAX_PARALLEL", "4"))
+        self.segment_chars = segment_chars or int(os.environ.get("TTS_SEGMENT_CHARS", "400"))
+        # A short first segment lets streamed playback start after a single TTS request
+        self.first_segment_chars = first_segment_chars or int(os.environ.get("TTS_FIRST_SEGMENT_CHARS", "100"))
+        self.cache_dir = cache_dir or os.environ.get("TTS_CACHE_DIR", "outputs/audio/segments")
+        self.cache_max_bytes = cache_max_bytes or int(float(os.environ.get("TTS_CACHE_MAX_MB", "256")) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._cache_bytes = sum(size for _, size, _ in self._scan_cache())
+
+    def split_segments(self, text: str) -> List[str]:
+        """
+        Split text into segments of whole sentences, each at most segment_chars long
+
+        The first segment is limited to first_segment_chars; sentences longer
+        than the limit become segments of their own.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List of segments in reading order
+        """
+        segments = []
+        current = ""
+        for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+            if not sentence:
+                continue
+            limit = self.segment_chars if segments else self.first_segment_chars
+            if current and len(current) + 1 + len(sentence) > limit:
+                segments.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            segments.append(current)
+        return segments
+
+    def _segment_key(self, segment: str) -> str:
+        """Cache key of a segment for the current voice settings"""
+        key = json.dumps([self.backend.name, segment, self.lang, self.tld, self.slow])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def synthesize_segment(self, segment: str) -> bytes:
+        """
+        Get the MP3 frames for one segment, from the cache or the TTS backend
+
+        Args:
+            segment: Text of the segment
+
+        Returns:
+            MP3 audio frames without tags
+        """
+        path = os.path.join(self.cache_dir, f"{self._segment_key(segment)}.mp3")
+        try:
+            with open(path, "rb") as f:
+                frames = f.read()
+            with self._lock:
+                self.hits += 1
+        except FileNotFoundError:
+            pass
+        else:
+            try:
+                # Mark the segment as recently used for eviction
+                os.utime(path)
+            except OSError:
+                pass
+            return frames
+
+        with self._lock:
+            self.misses += 1
+        frames = mp3_frames(self.backend.synthesize(segment, self.lang, self.tld, self.slow))
+
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(frames)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing audio segment cache: {str(e)}")
+            return frames
+
+        with self._lock:
+            self._cache_bytes += len(frames)
+            if self._cache_bytes > self.cache_max_bytes:
+                self.evict()
+        return frames
+
+    def _scan_cache(self) -> List[Tuple[float, int, str]]:
+        """List (mtime, size, path) of the cached segments"""
+        files = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".mp3"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used segments until the cache fits in cache_max_bytes
+
+        The directory is rescanned, so segments cached by other workers count too.
+
+        Returns:
+            Number of evicted segments
+        """
+        files = sorted(self._scan_cache())
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if total <= self.cache_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        self._cache_bytes = total
+        return evicted
+
+    async def iter_audio(self, text: str, executor: ExecutionService) -> AsyncIterator[bytes]:
+        """
+        Synthesize text segment by segment, yielding MP3 frames in reading order
+
+        Up to max_parallel segments are synthesized concurrently on the executor's
+        thread pool; each segment is yielded as soon as it and all segments before
+        it are done.
+
+        Args:
+            text: Text content to convert to speech
+            executor: Execution service whose thread pool runs the TTS requests
+
+        Yields:
+            MP3 audio frames of each segment
+        """
+        segments = self.split_segments(text)
+        if not segments:
+            raise ValueError("No text to speak")
+
+        remaining = iter(segments)
+        running: Deque[asyncio.Future] = deque()
+
+        def start_next() -> None:
+            segment = next(remaining, None)
+            if segment is not None:
+                running.append(asyncio.ensure_future(executor.run_io(self.synthesize_segment, segment)))
+
+        for _ in range(self.max_parallel):
+            start_next()
+        try:
+            while running:
+                frames = await running[0]
+                running.popleft()
+                start_next()
+                yield frames
+        finally:
+            for future in running:
+                future.cancel()
+
+    async def generate_audio(
+        self,
+        text: str,
+        output_path: str,
+        executor: ExecutionService,
+        on_segment: Optional[Callable[[bytes], None]] = None
+    ) -> bool:
         """
-        Generate an audio file from text using gTTS
-        
+        Generate an audio file from text
+
         Args:
             text: Text content to convert to speech
             output_path: Path where the audio file will be saved
-            
+            executor: Execution service whose thread pool runs TTS requests and file writes
+            on_segment: Called on the event loop with the MP3 frames of each
+                segment, in order, as soon as they are written
+
         Returns:
             True if successful, False otherwise
         """
+        tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp"
         try:
             # Make sure the directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Generate audio file using Google Text-to-Speech
-            tts = gTTS(text=text, lang='en', slow=False)
-            # tts = gTTS(text=text, lang='en', slow=False, tld='co.in') // Uncomment for Indian English accent
-            tts.save(output_path)
-            
+            await executor.run_io(os.makedirs, os.path.dirname(output_path), exist_ok=True)
+
+            # Segments are plain MP3 frames, so the file is just their concatenation
+            f = await executor.run_io(open, tmp_path, "wb")
+            try:
+                async with aclosing(self.iter_audio(text, executor)) as audio:
+                    async for frames in audio:
+                        await executor.run_io(f.write, frames)
+                        if on_segment is not None:
+                            on_segment(frames)
+            finally:
+                await executor.run_io(f.close)
+            await executor.run_io(os.replace, tmp_path, output_path)
+
             return True
         except Exception as e:
             print(f"Error generating audio: {str(e)}")
-            return False
\ No newline at end of file
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get segment cache hit/miss counters for this process
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cache_bytes": self._cache_bytes,
+            "cache_max_bytes": self.cache_max_bytes,
+            "backend": self.backend.name
+        }
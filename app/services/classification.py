@@ -1,33 +1,468 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Set, Tuple
+from collections import Counter
+from functools import lru_cache
+import asyncio
+import math
 import re
+import zlib
+
+import numpy as np
+
+from app.models.paper import TopicClassification
+
+# Words, and punctuation as tokens of its own so topics like "k-means" or "C++" match exactly
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Mentions at which a topic's confidence reaches about 63%
+CONFIDENCE_SCALE = 3.0
+
+# Size of the hashed character n-gram embeddings used by the semantic mode
+EMBEDDING_DIM = 1024
+
+# Character n-grams a phrase is embedded from
+NGRAM_SIZES = (3, 4, 5)
+
+# Phrases embedded per matrix multiplication, bounding memory for large batches
+EMBEDDING_BLOCK = 1024
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word and punctuation tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class TopicMatcher:
+    """
+    Multi-pattern matcher for a fixed set of topics
+
+    Topics are stored in a trie over their tokens, so a single pass over the
+    paper's tokens counts every topic at once, including topics nested in
+    longer ones ("network" inside "neural network").
+    """
+
+    def __init__(self, topics: Tuple[str, ...]):
+        """
+        Args:
+            topics: Topics to match, as given by the user
+        """
+        self.topics = topics
+        self.trie: Dict[str, Any] = {}
+        self.max_depth = 0
+        for topic in topics:
+            tokens = tokenize(topic)
+            if not tokens:
+                continue
+            node = self.trie
+            for token in tokens:
+                node = node.setdefault(token, {})
+            # None marks the end of a topic; spellings differing only in case share a node
+            ends = node.setdefault(None, [])
+            if topic not in ends:
+                ends.append(topic)
+            self.max_depth = max(self.max_depth, len(tokens))
+
+    def count(self, text: str) -> Dict[str, int]:
+        """
+        Count whole-word mentions of each topic
+
+        Args:
+            text: Text to search
+
+        Returns:
+            Dictionary of mention counts by topic (topics without mentions are left out)
+        """
+        counts: Dict[str, int] = {}
+        tokens = tokenize(text)
+        trie = self.trie
+        for start in range(len(tokens)):
+            node = trie.get(tokens[start])
+            position = start + 1
+            while node is not None:
+                for topic in node.get(None, ()):
+                    counts[topic] = counts.get(topic, 0) + 1
+                if position == len(tokens) or position - start >= self.max_depth:
+                    break
+                node = node.get(tokens[position])
+                position += 1
+        return counts
+
+
+@lru_cache(maxsize=32)
+def compile_topics(topics: Tuple[str, ...]) -> TopicMatcher:
+    """
+    Build the matcher for a topic set, reusing it for later calls with the same topics
+
+    Args:
+        topics: Topics to match
+
+    Returns:
+        Compiled matcher
+    """
+    return TopicMatcher(topics)
+
+
+def confidence(mentions: float) -> float:
+    """Map a (possibly fractional) number of mentions to a confidence that saturates towards 1"""
+    return round(1 - math.exp(-mentions / CONFIDENCE_SCALE), 4)
+
+
+def score_topics(text: str, user_topics: List[str]) -> List[TopicClassification]:
+    """
+    Score how strongly a paper is about each of the user's topics
+
+    Confidence grows with the number of mentions and saturates towards 1
+    (1 - exp(-mentions / CONFIDENCE_SCALE)).
+
+    Args:
+        text: Full text content of the paper
+        user_topics: List of topics provided by the user
+
+    Returns:
+        Classifications of the topics mentioned at least once, most confident first
+    """
+    if not user_topics:
+        return []
+
+    counts = compile_topics(tuple(user_topics)).count(text)
+    scores = [
+        TopicClassification(topic=topic, confidence=confidence(count))
+        for topic, count in counts.items()
+    ]
+    return sorted(scores, key=lambda score: score.confidence, reverse=True)
+
 
 def classify_paper(text: str, user_topics: List[str]) -> List[str]:
     """
     Classify paper text according to user-provided topics
-    
+
     Args:
         text: Full text content of the paper
         user_topics: List of topics provided by the user
-        
+
     Returns:
         List of matched topics
     """
     if not user_topics:
         return []
-        
-    # Convert text and topics to lowercase for case-insensitive matching
-    text_lower = text.lower()
-    
-    # Count occurrences of each topic in the text
-    topic_counts = {}
-    for topic in user_topics:
-        topic_lower = topic.lower()
-        # Use word boundary to avoid partial matches
-        pattern = r'\b' + re.escape(topic_lower) + r'\b'
-        count = len(re.findall(pattern, text_lower))
-        topic_counts[topic] = count
-    
-    # Filter topics that appear at least once
-    matched_topics = [topic for topic, count in topic_counts.items() if count > 0]
-    
-    return matched_topics
\ No newline at end of file
+
+    # Keep the user's order; every topic mentioned at least once matches
+    counts = compile_topics(tuple(user_topics)).count(text)
+    return [topic for topic in user_topics if counts.get(topic, 0) > 0]
+
+
+@lru_cache(maxsize=262144)
+def _ngram_feature(ngram: str) -> Tuple[int, float]:
+    """Hashed slot and sign of a character n-gram"""
+    # crc32 rather than hash(), so every worker process computes the same embedding
+    digest = zlib.crc32(ngram.encode("utf-8"))
+    return digest % EMBEDDING_DIM, 1.0 if digest & 0x80000000 else -1.0
+
+
+@lru_cache(maxsize=100000)
+def _ngram_features(phrase: str) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Hashed slots and signs of a phrase's character n-grams"""
+    padded = f"<{phrase}>"
+    # Phrases of a paper share most of their n-grams, so each is hashed once
+    features = [
+        _ngram_feature(padded[start:start + size])
+        for size in NGRAM_SIZES
+        for start in range(max(len(padded) - size + 1, 1))
+    ]
+    slots, signs = zip(*features)
+    return slots, signs
+
+
+def embed_phrases(phrases: Sequence[str]) -> np.ndarray:
+    """
+    Embed phrases as L2-normalized hashed character n-gram vectors
+
+    Spelling variants share most of their n-grams ("load balancer" and "load
+    balancing", "network" and "networks"), so their vectors are close, without
+    a trained model.
+
+    Args:
+        phrases: Lowercase phrases, tokens separated by single spaces
+
+    Returns:
+        Array of shape (len(phrases), EMBEDDING_DIM)
+    """
+    rows, slots, signs = [], [], []
+    for row, phrase in enumerate(phrases):
+        phrase_slots, phrase_signs = _ngram_features(phrase)
+        rows.extend([row] * len(phrase_slots))
+        slots.extend(phrase_slots)
+        signs.extend(phrase_signs)
+
+    flat = np.asarray(rows, dtype=np.intp) * EMBEDDING_DIM + np.asarray(slots, dtype=np.intp)
+    vectors = np.bincount(
+        flat, weights=np.asarray(signs, dtype=np.float32), minlength=len(phrases) * EMBEDDING_DIM
+    ).astype(np.float32).reshape(len(phrases), EMBEDDING_DIM)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def embed_text(text: str) -> np.ndarray:
+    """
+    Embed a longer text as the normalized, log-weighted sum of its word embeddings
+
+    Args:
+        text: Text to embed
+
+    Returns:
+        L2-normalized array of shape (EMBEDDING_DIM,)
+    """
+    # Very short words (articles, prepositions) carry little meaning
+    counts = Counter(token for token in tokenize(text) if len(token) > 2 and token.isalnum())
+    if not counts:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    words = list(counts)
+    weights = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(words)))
+    vector = weights @ embed_phrases(words)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class FuzzyTopicMatcher:
+    """
+    Matches paper phrases to a fixed set of topics by embedding similarity
+
+    Each topic is embedded once; a phrase of a paper is compared only with the
+    topics that have as many tokens as the phrase.
+    """
+
+    def __init__(self, topics: Tuple[str, ...]):
+        """
+        Args:
+            topics: Topics to match, as given by the user
+        """
+        self.topics = topics
+        phrases = [" ".join(tokenize(topic)) for topic in topics]
+        self.vectors = embed_phrases(phrases)
+        # Topic columns by number of tokens
+        self.columns: Dict[int, np.ndarray] = {}
+        for column, phrase in enumerate(phrases):
+            if phrase:
+                self.columns.setdefault(phrase.count(" ") + 1, []).append(column)
+        self.columns = {length: np.array(columns, dtype=np.intp) for length, columns in self.columns.items()}
+
+
+@lru_cache(maxsize=32)
+def compile_fuzzy_topics(topics: Tuple[str, ...]) -> FuzzyTopicMatcher:
+    """
+    Build the fuzzy matcher for a topic set, reusing it for later calls with the same topics
+
+    Args:
+        topics: Topics to match
+
+    Returns:
+        Compiled fuzzy matcher
+    """
+    return FuzzyTopicMatcher(topics)
+
+
+def _paper_phrases(text: str, lengths: Sequence[int]) -> Counter:
+    """Count the token n-grams of a paper that have as many tokens as some topic"""
+    tokens = tokenize(text)
+    phrases: Counter = Counter()
+    for length in lengths:
+        for start in range(len(tokens) - length + 1):
+            phrases[" ".join(tokens[start:start + length])] += 1
+    return phrases
+
+
+def score_papers_semantic(
+    texts: List[str],
+    user_topics: List[str],
+    min_similarity: float = 0.7
+) -> List[List[TopicClassification]]:
+    """
+    Score papers against the user's topics by embedding similarity
+
+    Every distinct phrase of the batch is embedded once and compared with the
+    topics of the same length. A phrase counts as a mention of a topic,
+    weighted by its cosine similarity, when the similarity reaches
+    min_similarity, so exact mentions score as in keyword mode and close
+    variants add to them. Phrases are processed in blocks of EMBEDDING_BLOCK,
+    so memory stays bounded whatever the batch size and text length.
+
+    Args:
+        texts: Full text content of each paper
+        user_topics: List of topics provided by the user
+        min_similarity: Cosine similarity from which a phrase counts as a mention
+
+    Returns:
+        For each paper, the classifications of the topics mentioned, most confident first
+    """
+    if not user_topics:
+        return [[] for _ in texts]
+
+    matcher = compile_fuzzy_topics(tuple(user_topics))
+    papers = [_paper_phrases(text, sorted(matcher.columns)) for text in texts]
+    mentions = np.zeros((len(texts), len(matcher.topics)), dtype=np.float32)
+
+    # Phrases shared by several papers of the batch are embedded and compared only once
+    vocabulary: Dict[int, Dict[str, int]] = {length: {} for length in matcher.columns}
+    occurrences: Dict[int, Tuple[List[int], List[int], List[int]]] = {
+        length: ([], [], []) for length in matcher.columns
+    }
+    for paper, phrases in enumerate(papers):
+        for phrase, count in phrases.items():
+            length = phrase.count(" ") + 1
+            index = vocabulary[length]
+            papers_of, rows_of, counts_of = occurrences[length]
+            papers_of.append(paper)
+            rows_of.append(index.setdefault(phrase, len(index)))
+            counts_of.append(count)
+
+    for length, columns in matcher.columns.items():
+        phrases = list(vocabulary[length])
+        if not phrases:
+            continue
+        topic_vectors = matcher.vectors[columns].T
+        paper_ids, rows, counts = (np.asarray(values) for values in occurrences[length])
+        order = np.argsort(rows, kind="stable")
+        paper_ids, rows, counts = paper_ids[order], rows[order], counts[order].astype(np.float32)
+
+        for start in range(0, len(phrases), EMBEDDING_BLOCK):
+            stop = min(start + EMBEDDING_BLOCK, len(phrases))
+            similarity = embed_phrases(phrases[start:stop]) @ topic_vectors
+            similarity[similarity < min_similarity] = 0.0
+            # Mention counts of the block's phrases in each paper
+            first, last = np.searchsorted(rows, (start, stop))
+            block_counts = np.zeros((len(texts), stop - start), dtype=np.float32)
+            np.add.at(block_counts, (paper_ids[first:last], rows[first:last] - start), counts[first:last])
+            mentions[:, columns] += block_counts @ similarity
+
+    results = []
+    for paper_mentions in mentions:
+        scores = [
+            TopicClassification(topic=topic, confidence=confidence(float(paper_mentions[column])))
+            for column, topic in enumerate(matcher.topics)
+            if paper_mentions[column] > 0
+        ]
+        results.append(sorted(scores, key=lambda score: score.confidence, reverse=True))
+    return results
+
+
+def classify_papers(
+    texts: List[str],
+    user_topics: List[str],
+    mode: str = "keyword",
+    min_similarity: float = 0.7
+) -> List[List[TopicClassification]]:
+    """
+    Score a batch of papers against the same topics
+
+    Args:
+        texts: Full text content of each paper
+        user_topics: List of topics provided by the user
+        mode: "keyword" for whole-word mentions, "semantic" for embedding similarity
+        min_similarity: Cosine similarity from which a phrase counts as a mention (semantic mode)
+
+    Returns:
+        For each paper, the classifications of the topics mentioned, most confident first
+    """
+    if mode == "semantic":
+        return score_papers_semantic(texts, user_topics, min_similarity)
+    if mode != "keyword":
+        raise ValueError(f"Unknown classification mode: {mode}")
+    return [score_topics(text, user_topics) for text in texts]
+
+
+class BatchClassifier:
+    """
+    Classifies papers in batches
+
+    A paper submitted while no batch is being scored is scored right away.
+    Papers submitted while one is (e.g. by the concurrent jobs of a bulk
+    import) are collected and scored together on the process pool once it
+    finishes, so topic vectors and shared phrases are computed once per batch
+    instead of once per paper.
+    """
+
+    def __init__(
+        self,
+        executor: Any,
+        mode: str = "keyword",
+        min_similarity: float = 0.7,
+        max_batch: int = 32,
+        max_wait_seconds: float = 0.5
+    ):
+        """
+        Args:
+            executor: ExecutionService whose process pool runs the scoring
+            mode: "keyword" or "semantic"
+            min_similarity: Cosine similarity from which a phrase counts as a mention (semantic mode)
+            max_batch: Papers after which a batch is scored without waiting further
+            max_wait_seconds: Longest a collected paper waits for the running batches
+        """
+        if mode not in ("keyword", "semantic"):
+            raise ValueError(f"Unknown classification mode: {mode}")
+        self.executor = executor
+        self.mode = mode
+        self.min_similarity = min_similarity
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: List[Tuple[str, Tuple[str, ...], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set["asyncio.Task[None]"] = set()
+
+    async def classify(self, text: str, user_topics: List[str]) -> List[TopicClassification]:
+        """
+        Score a paper against the user's topics, batched with concurrent calls
+
+        Args:
+            text: Full text content of the paper
+            user_topics: List of topics provided by the user
+
+        Returns:
+            Classifications of the topics mentioned, most confident first
+        """
+        if not user_topics:
+            return []
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, tuple(user_topics), future))
+        if len(self._pending) >= self.max_batch or not self._running:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        """Score everything pending, one process pool call per distinct topic list"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+
+        groups: Dict[Tuple[str, ...], List[Tuple[str, asyncio.Future]]] = {}
+        for text, topics, future in pending:
+            groups.setdefault(topics, []).append((text, future))
+        for topics, items in groups.items():
+            task = asyncio.ensure_future(self._score(list(topics), items))
+            self._running.add(task)
+            task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: "asyncio.Task[None]") -> None:
+        """Forget a finished batch and score the papers collected meanwhile"""
+        self._running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error classifying topics: {str(task.exception())}")
+        if self._pending and not self._running:
+            self._flush()
+
+    async def _score(self, topics: List[str], items: List[Tuple[str, asyncio.Future]]) -> None:
+        """Run one batch and hand each paper its result"""
+        try:
+            results = await self.executor.run_cpu(
+                classify_papers, [text for text, _ in items], topics, self.mode, self.min_similarity
+            )
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,199 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+class StopPipeline(Exception):
+    """Raised by a stage to finish a run early, e.g. when a cached result was reused"""
+
+
+class Stage:
+    """A named pipeline step and the stages whose results it needs"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[["DagRun"], Awaitable[Any]],
+        requires: Iterable[str] = (),
+        optional: bool = False
+    ):
+        """
+        Args:
+            name: Stage name, also the key of its result
+            func: Coroutine function called with the run once all required stages finished
+            requires: Names of the stages that must finish first
+            optional: Whether a failure only leaves the result as None instead of failing the run
+        """
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.optional = optional
+
+
+class DagRun:
+    """Inputs, stage results and timings of one execution of a StageGraph"""
+
+    def __init__(self, graph: "StageGraph", context: Dict[str, Any]):
+        self.graph = graph
+        self.context = context
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, str] = {}
+        self.started: Dict[str, float] = {}
+        self.finished: Dict[str, float] = {}
+        self.stopped = False
+        self._origin = time.monotonic()
+
+    def _now(self) -> float:
+        """Seconds since the run started"""
+        return time.monotonic() - self._origin
+
+    def timings(self) -> Dict[str, Dict[str, float]]:
+        """
+        Get when each stage started and finished, relative to the start of the run
+
+        Returns:
+            Dictionary by stage name with start, end and seconds
+        """
+        return {
+            name: {
+                "start": round(self.started[name], 3),
+                "end": round(self.finished[name], 3),
+                "seconds": round(self.finished[name] - self.started[name], 3)
+            }
+            for name in self.graph.order
+            if name in self.finished
+        }
+
+    def critical_path(self) -> List[str]:
+        """
+        Get the chain of stages that determined how long the run took
+
+        Starting from the stage that finished last, each step goes back to the
+        required stage that finished last, i.e. the one it actually waited for.
+
+        Returns:
+            Stage names in execution order
+        """
+        if not self.finished:
+            return []
+        path = [max(self.finished, key=self.finished.get)]
+        while True:
+            requires = [name for name in self.graph.stages[path[-1]].requires if name in self.finished]
+            if not requires:
+                break
+            path.append(max(requires, key=self.finished.get))
+        return path[::-1]
+
+
+class StageGraph:
+    """
+    Declarative DAG of async pipeline stages
+
+    Each stage starts as soon as the stages it requires have finished, so
+    independent stages (e.g. metadata lookups next to text extraction and
+    drafting) run concurrently. The first failing required stage cancels the
+    rest of the run; a stage raising StopPipeline ends the run early without
+    an error.
+    """
+
+    def __init__(self, stages: Iterable[Stage]):
+        """
+        Args:
+            stages: Stages of the graph, in any order
+
+        Raises:
+            ValueError: If names repeat, a requirement is unknown or the stages form a cycle
+        """
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage {stage.name}")
+            self.stages[stage.name] = stage
+
+        for stage in self.stages.values():
+            unknown = [name for name in stage.requires if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name} requires unknown stages: {', '.join(unknown)}")
+
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        """Order the stages so each comes after the stages it requires"""
+        order: List[str] = []
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if all(r not in remaining for r in stage.requires)]
+            if not ready:
+                raise ValueError(f"Stages form a cycle: {', '.join(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+        return order
+
+    async def run(
+        self,
+        context: Optional[Dict[str, Any]] = None,
+        on_finish: Optional[Callable[[DagRun], None]] = None
+    ) -> DagRun:
+        """
+        Execute the graph
+
+        Args:
+            context: Inputs shared by all stages (available as run.context)
+            on_finish: Called with the run when it ends, whether it completed,
+                stopped early or failed (e.g. to record timings)
+
+        Returns:
+            The finished run, with results by stage name (run.stopped is set if a
+            stage ended it early)
+
+        Raises:
+            Exception: The error of the first required stage that failed
+        """
+        run = DagRun(self, context if context is not None else {})
+        done: Dict[str, asyncio.Future] = {
+            name: asyncio.get_running_loop().create_future() for name in self.order
+        }
+
+        async def execute(stage: Stage) -> None:
+            for name in stage.requires:
+                await done[name]
+            run.started[stage.name] = run._now()
+            try:
+                result = await stage.func(run)
+            except asyncio.CancelledError:
+                # Cut short because the run ended, so not part of its timings
+                del run.started[stage.name]
+                raise
+            except Exception as e:
+                run.finished[stage.name] = run._now()
+                if isinstance(e, StopPipeline) or not stage.optional:
+                    raise
+                run.errors[stage.name] = str(e)
+                result = None
+            else:
+                run.finished[stage.name] = run._now()
+            run.results[stage.name] = result
+            done[stage.name].set_result(None)
+
+        tasks = [asyncio.create_task(execute(self.stages[name]), name=name) for name in self.order]
+        try:
+            pending = set(tasks)
+            while pending:
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in finished:
+                    if task.cancelled():
+                        continue
+                    error = task.exception()
+                    if isinstance(error, StopPipeline):
+                        run.stopped = True
+                        return run
+                    if error is not None:
+                        raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if on_finish is not None:
+                on_finish(run)
+        return run
@@ -0,0 +1,105 @@
+import json
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.storage import SqliteDatabase
+
+
+class DoiCache(SqliteDatabase):
+    """Persistent cache of CrossRef metadata, including negative entries for unknown DOIs"""
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl_seconds: float = 30 * 24 * 3600,
+        negative_ttl_seconds: float = 24 * 3600
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS doi_metadata (
+                doi TEXT PRIMARY KEY,
+                found INTEGER NOT NULL,
+                data TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_doi_metadata_fetched_at ON doi_metadata(fetched_at);
+        """)
+
+    def get(self, doi: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        Look up cached metadata for a DOI
+
+        Args:
+            doi: Clean DOI string
+
+        Returns:
+            Tuple of (cached, details). details is None for cached "not found" entries
+        """
+        row = self._connect().execute(
+            "SELECT found, data, fetched_at FROM doi_metadata WHERE doi = ?", (doi.lower(),)
+        ).fetchone()
+
+        if row is not None:
+            ttl = self.ttl_seconds if row["found"] else self.negative_ttl_seconds
+            if time.time() - row["fetched_at"] <= ttl:
+                if row["found"]:
+                    self.hits += 1
+                    return True, json.loads(row["data"])
+                self.negative_hits += 1
+                return True, None
+
+        self.misses += 1
+        return False, None
+
+    def set(self, doi: str, details: Dict[str, Any]) -> None:
+        """
+        Cache metadata for a DOI that CrossRef resolved
+
+        Args:
+            doi: Clean DOI string
+            details: Paper details returned by DoiService
+        """
+        self._connect().execute(
+            "INSERT OR REPLACE INTO doi_metadata (doi, found, data, fetched_at) VALUES (?, 1, ?, ?)",
+            (doi.lower(), json.dumps(details), time.time())
+        )
+
+    def set_not_found(self, doi: str) -> None:
+        """
+        Remember that CrossRef doesn't know a DOI
+
+        Args:
+            doi: Clean DOI string
+        """
+        self._connect().execute(
+            "INSERT OR REPLACE INTO doi_metadata (doi, found, data, fetched_at) VALUES (?, 0, NULL, ?)",
+            (doi.lower(), time.time())
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache size and hit/miss counters for this process
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(found = 0), 0) AS negative_entries FROM doi_metadata"
+        ).fetchone()
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "entries": row["entries"],
+            "negative_entries": row["negative_entries"],
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.negative_hits) / lookups if lookups else 0.0
+        }
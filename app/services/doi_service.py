@@ -1,16 +1,28 @@
+import asyncio
+import httpx
+import os
 import requests
 from typing import Optional, Dict, Any
 from urllib.parse import urlparse
 
+from app.services.doi_cache import DoiCache
+from app.services.http_client import get_http_client
+from app.services.rate_limit import AsyncRateLimiter
+
 
 class DoiService:
     """Service for resolving DOI references and retrieving paper details"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[DoiCache] = None):
         self.crossref_api_url = "https://api.crossref.org/works/"
+        # The mailto address puts our requests in CrossRef's "polite" pool
+        mailto = os.environ.get("CROSSREF_MAILTO", "contact@example.com")
         self.headers = {
-            "User-Agent": "ResearchPaperSummarizer/1.0 (mailto:contact@example.com)"
+            "User-Agent": f"ResearchPaperSummarizer/1.0 (mailto:{mailto})"
         }
+        self.cache = cache
+        # Stay under the polite pool's request rate when resolving many DOIs at once
+        self.rate_limiter = AsyncRateLimiter(rate=float(os.environ.get("CROSSREF_RATE_LIMIT", "10")))
         
     def get_paper_details(self, doi: str) -> Optional[Dict[str, Any]]:
         """
@@ -27,6 +39,11 @@ class DoiService:
         if not doi:
             return None
             
+        if self.cache is not None:
+            cached, details = self.cache.get(doi)
+            if cached:
+                return details
+            
         # Make request to CrossRef API
         try:
             response = requests.get(
@@ -35,37 +52,14 @@ class DoiService:
                 timeout=30  # Add timeout for safety
             )
             
+            if response.status_code == 404 and self.cache is not None:
+                self.cache.set_not_found(doi)
             response.raise_for_status()  # Raise exception for non-200 responses
                 
-            data = response.json()
-            message = data.get("message", {})
-            
-            # Extract relevant information
-            result = {
-                "title": message.get("title", ["Unknown Title"])[0] if message.get("title") else "Unknown Title",
-                "doi": message.get("DOI"),
-                "url": message.get("URL"),
-                "type": message.get("type"),
-                "publisher": message.get("publisher"),
-                "publication_date": self._extract_publication_date(message),
-                "authors": []
-            }
-            
-            # Extract authors
-            for author in message.get("author", []):
-                name_parts = []
-                if "given" in author:
-                    name_parts.append(author["given"])
-                if "family" in author:
-                    name_parts.append(author["family"])
-                    
-                if name_parts:
-                    result["authors"].append(" ".join(name_parts))
-            
-            # Try to find PDF URL
-            result["pdf_url"] = self._extract_pdf_url(message)
-            
-            return result
+            details = self._parse_message(response.json().get("message", {}))
+            if self.cache is not None:
+                self.cache.set(doi, details)
+            return details
             
         except requests.exceptions.HTTPError as e:
             print(f"HTTP error retrieving DOI information: {str(e)}")
@@ -83,6 +77,94 @@ class DoiService:
             print(f"Unexpected error processing DOI information: {str(e)}")
             return None
     
+    async def get_paper_details_async(self, doi: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve paper details from a DOI using the CrossRef API without blocking the event loop
+        
+        Args:
+            doi: Digital Object Identifier for the paper or DOI URL
+            
+        Returns:
+            Dictionary containing paper details or None if not found
+        """
+        # Clean and extract DOI string
+        doi = self._extract_doi(doi.strip())
+        if not doi:
+            return None
+            
+        # Cache reads and writes are SQLite calls, so they run on a worker thread
+        # to keep concurrent batch lookups from queuing behind each other
+        if self.cache is not None:
+            cached, details = await asyncio.to_thread(self.cache.get, doi)
+            if cached:
+                return details
+            
+        try:
+            await self.rate_limiter.acquire()
+            response = await get_http_client().get(
+                f"{self.crossref_api_url}{doi}",
+                headers=self.headers
+            )
+            
+            if response.status_code == 404 and self.cache is not None:
+                await asyncio.to_thread(self.cache.set_not_found, doi)
+            response.raise_for_status()  # Raise exception for non-200 responses
+            
+            details = self._parse_message(response.json().get("message", {}))
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.set, doi, details)
+            return details
+            
+        except httpx.HTTPStatusError as e:
+            print(f"HTTP error retrieving DOI information: {str(e)}")
+            return None
+        except httpx.TimeoutException as e:
+            print(f"Timeout error retrieving DOI information: {str(e)}")
+            return None
+        except httpx.TransportError as e:
+            print(f"Connection error retrieving DOI information: {str(e)}")
+            return None
+        except Exception as e:
+            print(f"Unexpected error processing DOI information: {str(e)}")
+            return None
+    
+    def _parse_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a CrossRef work record into paper details
+        
+        Args:
+            message: CrossRef API message data
+            
+        Returns:
+            Dictionary containing paper details
+        """
+        # Extract relevant information
+        result = {
+            "title": message.get("title", ["Unknown Title"])[0] if message.get("title") else "Unknown Title",
+            "doi": message.get("DOI"),
+            "url": message.get("URL"),
+            "type": message.get("type"),
+            "publisher": message.get("publisher"),
+            "publication_date": self._extract_publication_date(message),
+            "authors": []
+        }
+        
+        # Extract authors
+        for author in message.get("author", []):
+            name_parts = []
+            if "given" in author:
+                name_parts.append(author["given"])
+            if "family" in author:
+                name_parts.append(author["family"])
+                
+            if name_parts:
+                result["authors"].append(" ".join(name_parts))
+        
+        # Try to find PDF URL
+        result["pdf_url"] = self._extract_pdf_url(message)
+        
+        return result
+    
     def _extract_doi(self, doi_string: str) -> Optional[str]:
         """
         Extract DOI from a string that might be a DOI or a DOI URL
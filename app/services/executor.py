@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+
+class ExecutionService:
+    """Service for running blocking pipeline stages off the event loop"""
+
+    def __init__(self, io_workers: Optional[int] = None, cpu_workers: Optional[int] = None):
+        # I/O-bound stages (HTTP, LLM calls, TTS, file writes) spend most of their
+        # time waiting, so the thread pool can be much larger than the core count
+        self.io_workers = io_workers or int(os.environ.get("IO_WORKERS", "32"))
+        self.cpu_workers = cpu_workers or int(os.environ.get("CPU_WORKERS", str(os.cpu_count() or 1)))
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def thread_pool(self) -> Executor:
+        """Bounded thread pool for I/O-bound stages, created on first use"""
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.io_workers,
+                thread_name_prefix="pipeline-io"
+            )
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> Executor:
+        """Process pool for CPU-bound stages, created on first use"""
+        if self._process_pool is None:
+            # Use spawn so workers don't inherit locks held by the server's threads
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.cpu_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+    async def run_io(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a blocking I/O-bound callable on the thread pool
+
+        Args:
+            func: Callable to run
+            *args: Positional arguments for the callable
+            **kwargs: Keyword arguments for the callable
+
+        Returns:
+            The callable's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, partial(func, *args, **kwargs))
+
+    async def run_cpu(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a CPU-bound callable on the process pool
+
+        Args:
+            func: Picklable callable to run (module-level function or method of a picklable object)
+            *args: Picklable positional arguments for the callable
+            **kwargs: Picklable keyword arguments for the callable
+
+        Returns:
+            The callable's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool, partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shut down both worker pools
+
+        Args:
+            wait: Whether to wait for running work to finish
+        """
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+            self._process_pool = None
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Hosts that need a tighter concurrency limit than the default
+DEFAULT_HOST_LIMITS = {
+    "export.arxiv.org": 1,  # arXiv asks clients to send one request at a time
+}
+
+
+def _http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class AsyncHttpClient:
+    """Shared async HTTP client with keep-alive pools, per-host concurrency limits and retries"""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        host_limits: Optional[Dict[str, int]] = None,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 30.0,
+        http2: Optional[bool] = None
+    ):
+        self.max_connections = max_connections or int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive_connections = max_keepalive_connections or int(
+            os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20")
+        )
+        self.per_host_limit = per_host_limit or int(os.environ.get("HTTP_PER_HOST_LIMIT", "8"))
+        self.host_limits = dict(DEFAULT_HOST_LIMITS, **(host_limits or {}))
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        self.http2 = _http2_available() if http2 is None else http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The underlying httpx client, created on first use"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections
+                ),
+                timeout=self.timeout,
+                follow_redirects=True
+            )
+        return self._client
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        """Get the semaphore limiting concurrent requests to the URL's host"""
+        host = httpx.URL(url).host
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.per_host_limit))
+        return self._host_semaphores[host]
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """
+        Compute how long to wait before the next attempt
+
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            response: The failed response, if the server sent one
+
+        Returns:
+            Delay in seconds (Retry-After if the server sent one, otherwise exponential backoff with jitter)
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff_factor * (2 ** attempt) + random.uniform(0, self.backoff_factor)
+
+    async def request(self, method: str, url: str, retry: bool = True, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request, retrying transport errors and retryable status codes
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            retry: Whether to retry; pass False for requests that aren't safe to
+                send twice, e.g. a POST the server may have acted on before failing
+            **kwargs: Extra arguments passed to httpx (headers, params, json, ...)
+
+        Returns:
+            The final response (which may still have an error status)
+        """
+        semaphore = self._semaphore(url)
+        max_retries = self.max_retries if retry else 0
+        attempt = 0
+        while True:
+            response = None
+            try:
+                async with semaphore:
+                    response = await self.client.request(method, url, **kwargs)
+                if response.status_code not in RETRY_STATUSES or attempt >= max_retries:
+                    return response
+            except httpx.TransportError:
+                if attempt >= max_retries:
+                    raise
+
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        """
+        Send a GET request with retries
+
+        Args:
+            url: Request URL
+            **kwargs: Extra arguments passed to httpx
+
+        Returns:
+            The final response
+        """
+        return await self.request("GET", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """
+        Open a streaming response, retrying until the response headers arrive
+
+        The host's concurrency slot is held until the body has been consumed.
+
+        Args:
+            method: HTTP method
+            url: Request URL
+            **kwargs: Extra arguments passed to httpx.AsyncClient.build_request
+
+        Yields:
+            The response with its body not yet read
+        """
+        semaphore = self._semaphore(url)
+        attempt = 0
+        while True:
+            async with semaphore:
+                try:
+                    request = self.client.build_request(method, url, **kwargs)
+                    response = await self.client.send(request, stream=True)
+                except httpx.TransportError:
+                    if attempt >= self.max_retries:
+                        raise
+                    response = None
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                        try:
+                            yield response
+                        finally:
+                            await response.aclose()
+                        return
+                    await response.aclose()
+
+            await asyncio.sleep(self._retry_delay(attempt, response))
+            attempt += 1
+
+    async def aclose(self) -> None:
+        """Close pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_semaphores = {}
+
+
+_shared_client: Optional[AsyncHttpClient] = None
+
+
+def get_http_client() -> AsyncHttpClient:
+    """
+    Get the process-wide HTTP client shared by all services
+
+    Returns:
+        The shared AsyncHttpClient
+    """
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = AsyncHttpClient()
+    return _shared_client
@@ -0,0 +1,513 @@
+import abc
+import asyncio
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.services.storage import SqliteDatabase
+
+# Priority classes, most urgent first
+PRIORITIES = ("interactive", "bulk", "background")
+
+
+def worker_name() -> str:
+    """Identify the current process in claimed jobs, e.g. for finding stuck workers"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _encode_job(job: Dict[str, Any]) -> str:
+    """Serialize a job for a shared queue"""
+    return json.dumps(job)
+
+
+def _decode_job(payload: str) -> Dict[str, Any]:
+    """Deserialize a job taken from a shared queue"""
+    return json.loads(payload)
+
+
+class JobQueue(abc.ABC):
+    """
+    Storage for queued pipeline jobs
+
+    Jobs are dictionaries with job_id, name (of the registered handler),
+    priority, args, kwargs and enqueued_at (wall-clock seconds). A claimed job
+    stays owned by the worker that took it until it is acknowledged; shared
+    queues hand jobs of workers that disappeared to another worker once their
+    lease hasn't been extended for the visibility timeout.
+    """
+
+    name = "base"
+    # Whether other processes see the jobs (so API and worker processes can be separate)
+    shared = False
+
+    @abc.abstractmethod
+    def put(self, job: Dict[str, Any]) -> None:
+        """
+        Add a job
+
+        Args:
+            job: Job dictionary
+        """
+
+    @abc.abstractmethod
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Claim the oldest job of the most urgent priority class
+
+        Args:
+            timeout: Maximum number of seconds to wait for a job
+
+        Returns:
+            The claimed job, or None if no job arrived in time
+        """
+
+    @abc.abstractmethod
+    def ack(self, job: Dict[str, Any]) -> None:
+        """
+        Remove a claimed job once it ran
+
+        Does nothing if the claim expired and the job was handed to another worker.
+
+        Args:
+            job: Job returned by get
+        """
+
+    @abc.abstractmethod
+    def release(self, job: Dict[str, Any]) -> None:
+        """
+        Give back a claimed job that didn't run to completion, so another worker can take it
+
+        Does nothing if the claim expired and the job was handed to another worker.
+
+        Args:
+            job: Job returned by get
+        """
+
+    def extend_lease(self, job: Dict[str, Any]) -> bool:
+        """
+        Renew the claim of a job that is still running, so it isn't handed to another worker
+
+        Args:
+            job: Job returned by get
+
+        Returns:
+            False if the claim already expired and the job was requeued
+        """
+        return True
+
+    @abc.abstractmethod
+    def depth(self) -> Dict[str, int]:
+        """
+        Count the waiting jobs
+
+        Returns:
+            Number of waiting jobs by priority class
+        """
+
+    def requeue_stale(self, visibility_timeout: float) -> int:
+        """
+        Put back jobs that were claimed longer ago than the visibility timeout
+
+        Args:
+            visibility_timeout: Seconds after which a claimed job is considered abandoned
+
+        Returns:
+            Number of requeued jobs
+        """
+        return 0
+
+    async def _poll(self, claim: Callable[[], Optional[Dict[str, Any]]], timeout: float, poll_seconds: float) -> Optional[Dict[str, Any]]:
+        """Try a non-blocking claim every poll_seconds until it returns a job or timeout seconds passed"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self._claim_in_thread(claim)
+            if job is not None:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(poll_seconds, remaining))
+
+    async def _claim_in_thread(self, claim: Callable[..., Optional[Dict[str, Any]]], *args: Any) -> Optional[Dict[str, Any]]:
+        """
+        Run a blocking claim on a thread
+
+        The thread can't be interrupted, so if the waiting worker is cancelled
+        a job claimed afterwards is released instead of being lost.
+        """
+        future = asyncio.get_running_loop().run_in_executor(None, claim, *args)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            def release_claimed(done: "asyncio.Future[Optional[Dict[str, Any]]]") -> None:
+                if not done.cancelled() and done.exception() is None and done.result() is not None:
+                    self.release(done.result())
+            future.add_done_callback(release_claimed)
+            raise
+
+
+class MemoryJobQueue(JobQueue):
+    """In-process queue; only the process that created it can run its jobs"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._queue: Optional["asyncio.PriorityQueue[Tuple[int, int, Dict[str, Any]]]"] = None
+        self._sequence = itertools.count()
+        self._depth = {priority: 0 for priority in PRIORITIES}
+
+    @property
+    def queue(self) -> "asyncio.PriorityQueue[Tuple[int, int, Dict[str, Any]]]":
+        """The underlying priority queue, created on first use"""
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        return self._queue
+
+    def put(self, job: Dict[str, Any]) -> None:
+        self._depth[job["priority"]] += 1
+        self.queue.put_nowait((PRIORITIES.index(job["priority"]), next(self._sequence), job))
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            _, _, job = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._depth[job["priority"]] -= 1
+        return job
+
+    def ack(self, job: Dict[str, Any]) -> None:
+        self.queue.task_done()
+
+    def release(self, job: Dict[str, Any]) -> None:
+        # Nothing else can run it; the job is lost with the process
+        self.queue.task_done()
+
+    def depth(self) -> Dict[str, int]:
+        return dict(self._depth)
+
+
+class SqliteJobQueue(SqliteDatabase, JobQueue):
+    """
+    Queue in a SQLite table, shared by the API and worker processes of one node
+
+    Claiming a job is a single write transaction, so any number of worker
+    processes can poll the same database without taking a job twice. Each
+    claim gets its own lease ID (in claimed_by), so a worker whose claim
+    expired can't acknowledge or release the job another worker took over.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, db_path: str, poll_seconds: float = 0.5):
+        self.poll_seconds = poll_seconds
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS job_queue (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL,
+                priority INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                claimed_at REAL,
+                claimed_by TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_queue_waiting ON job_queue(claimed_at, priority, seq);
+        """)
+
+    def put(self, job: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "INSERT INTO job_queue (job_id, priority, payload) VALUES (?, ?, ?)",
+            (job["job_id"], PRIORITIES.index(job["priority"]), _encode_job(job))
+        )
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Take the next waiting job, or return None if there is none"""
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front, so two workers can't select the same row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT seq, payload FROM job_queue WHERE claimed_at IS NULL ORDER BY priority, seq LIMIT 1"
+            ).fetchone()
+            lease_id = f"{worker_name()}:{uuid.uuid4().hex}"
+            if row is not None:
+                conn.execute(
+                    "UPDATE job_queue SET claimed_at = ?, claimed_by = ? WHERE seq = ?",
+                    (time.time(), lease_id, row["seq"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is None:
+            return None
+        job = _decode_job(row["payload"])
+        job["_seq"] = row["seq"]
+        job["_lease_id"] = lease_id
+        return job
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        return await self._poll(self._claim, timeout, self.poll_seconds)
+
+    def ack(self, job: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "DELETE FROM job_queue WHERE seq = ? AND claimed_by = ?", (job["_seq"], job["_lease_id"])
+        )
+
+    def release(self, job: Dict[str, Any]) -> None:
+        self._connect().execute(
+            "UPDATE job_queue SET claimed_at = NULL, claimed_by = NULL WHERE seq = ? AND claimed_by = ?",
+            (job["_seq"], job["_lease_id"])
+        )
+
+    def extend_lease(self, job: Dict[str, Any]) -> bool:
+        cursor = self._connect().execute(
+            "UPDATE job_queue SET claimed_at = ? WHERE seq = ? AND claimed_by = ?",
+            (time.time(), job["_seq"], job["_lease_id"])
+        )
+        return cursor.rowcount == 1
+
+    def depth(self) -> Dict[str, int]:
+        rows = self._connect().execute(
+            "SELECT priority, COUNT(*) AS jobs FROM job_queue WHERE claimed_at IS NULL GROUP BY priority"
+        ).fetchall()
+        depth = {priority: 0 for priority in PRIORITIES}
+        for row in rows:
+            depth[PRIORITIES[row["priority"]]] = row["jobs"]
+        return depth
+
+    def requeue_stale(self, visibility_timeout: float) -> int:
+        cursor = self._connect().execute(
+            "UPDATE job_queue SET claimed_at = NULL, claimed_by = NULL WHERE claimed_at < ?",
+            (time.time() - visibility_timeout,)
+        )
+        return cursor.rowcount
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Queue in Redis (or any server speaking its protocol), shared across nodes
+
+    Each priority class is a list. Workers claim a job by moving it atomically
+    (LMOVE) from the most urgent non-empty class to a processing list, so a
+    worker dying mid-claim can't lose it, and record a lease for it in a hash.
+    Running jobs renew their lease; jobs whose lease expired, or that never
+    got one, are moved back to their class by requeue_stale.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, client: Any, prefix: str = "papers:jobs", poll_seconds: float = 0.5):
+        """
+        Args:
+            client: Redis client with decode_responses enabled (redis.Redis or
+                a compatible stand-in such as LocalRedis); LMOVE needs Redis 6.2
+            prefix: Prefix of the keys used by the queue
+            poll_seconds: How often an idle worker checks for new jobs
+        """
+        self.client = client
+        self.prefix = prefix
+        self.poll_seconds = poll_seconds
+        self._keys = [f"{prefix}:{priority}" for priority in PRIORITIES]
+        self._processing_key = f"{prefix}:processing"
+        self._claimed_key = f"{prefix}:claimed"
+
+    def put(self, job: Dict[str, Any]) -> None:
+        job = dict(job, claim_id=uuid.uuid4().hex)
+        self.client.lpush(f"{self.prefix}:{job['priority']}", _encode_job(job))
+
+    def _lease(self, lease_id: str) -> str:
+        """Lease record of a claim, renewed while the job runs"""
+        return json.dumps({"leased_at": time.time(), "claimed_by": worker_name(), "lease_id": lease_id})
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """Move the next job to the processing list and lease it, or return None if there is none"""
+        for key in self._keys:
+            payload = self.client.lmove(key, self._processing_key, "RIGHT", "LEFT")
+            if payload is not None:
+                break
+        else:
+            return None
+        job = _decode_job(payload)
+        job["_payload"] = payload
+        job["_lease_id"] = uuid.uuid4().hex
+        self.client.hset(self._claimed_key, job["claim_id"], self._lease(job["_lease_id"]))
+        return job
+
+    async def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        return await self._poll(self._claim, timeout, self.poll_seconds)
+
+    def _holds_lease(self, job: Dict[str, Any]) -> bool:
+        """Whether the job's claim is still the current one"""
+        lease = self.client.hget(self._claimed_key, job["claim_id"])
+        return lease is not None and json.loads(lease)["lease_id"] == job["_lease_id"]
+
+    def ack(self, job: Dict[str, Any]) -> None:
+        if self._holds_lease(job) and self.client.hdel(self._claimed_key, job["claim_id"]):
+            self.client.lrem(self._processing_key, 1, job["_payload"])
+
+    def release(self, job: Dict[str, Any]) -> None:
+        if self._holds_lease(job) and self.client.hdel(self._claimed_key, job["claim_id"]):
+            if self.client.lrem(self._processing_key, 1, job["_payload"]):
+                self.client.rpush(f"{self.prefix}:{job['priority']}", job["_payload"])
+
+    def extend_lease(self, job: Dict[str, Any]) -> bool:
+        if not self._holds_lease(job):
+            return False
+        self.client.hset(self._claimed_key, job["claim_id"], self._lease(job["_lease_id"]))
+        return True
+
+    def depth(self) -> Dict[str, int]:
+        return {priority: self.client.llen(key) for priority, key in zip(PRIORITIES, self._keys)}
+
+    def requeue_stale(self, visibility_timeout: float) -> int:
+        cutoff = time.time() - visibility_timeout
+        requeued = 0
+        for payload in self.client.lrange(self._processing_key, 0, -1):
+            job = _decode_job(payload)
+            lease = self.client.hget(self._claimed_key, job["claim_id"])
+            if lease is None:
+                # The claiming worker died before recording its lease (or is just
+                # about to): start the clock now
+                self.client.hsetnx(self._claimed_key, job["claim_id"], self._lease(""))
+                continue
+            # Only the worker whose HDEL removes the lease puts the job back
+            if json.loads(lease)["leased_at"] < cutoff and self.client.hdel(self._claimed_key, job["claim_id"]):
+                if self.client.lrem(self._processing_key, 1, payload):
+                    # Requeued jobs go to the front of their class
+                    self.client.rpush(f"{self.prefix}:{job['priority']}", payload)
+                    requeued += 1
+        return requeued
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the Redis commands RedisJobQueue uses
+
+    Behaves like a client created with decode_responses=True. Useful for
+    testing the Redis queue (and running API and workers in one process)
+    without a server; it is not shared between processes.
+    """
+
+    def __init__(self):
+        self._lists: Dict[str, Deque[str]] = {}
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def lpush(self, key: str, *values: str) -> int:
+        with self._lock:
+            items = self._lists.setdefault(key, deque())
+            items.extendleft(values)
+            return len(items)
+
+    def rpush(self, key: str, *values: str) -> int:
+        with self._lock:
+            items = self._lists.setdefault(key, deque())
+            items.extend(values)
+            return len(items)
+
+    def lmove(self, source: str, destination: str, src: str = "LEFT", dest: str = "RIGHT") -> Optional[str]:
+        with self._lock:
+            items = self._lists.get(source)
+            if not items:
+                return None
+            value = items.pop() if src == "RIGHT" else items.popleft()
+            target = self._lists.setdefault(destination, deque())
+            if dest == "RIGHT":
+                target.append(value)
+            else:
+                target.appendleft(value)
+            return value
+
+    def lrem(self, key: str, count: int, value: str) -> int:
+        # Only count > 0 (remove from the head) is used
+        with self._lock:
+            items = self._lists.get(key, deque())
+            removed = 0
+            while removed < count and value in items:
+                items.remove(value)
+                removed += 1
+            return removed
+
+    def lrange(self, key: str, start: int, end: int) -> List[str]:
+        with self._lock:
+            items = list(self._lists.get(key, ()))
+            return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key: str) -> int:
+        with self._lock:
+            return len(self._lists.get(key, ()))
+
+    def hset(self, key: str, field: str, value: str) -> int:
+        with self._lock:
+            fields = self._hashes.setdefault(key, {})
+            added = int(field not in fields)
+            fields[field] = value
+            return added
+
+    def hsetnx(self, key: str, field: str, value: str) -> int:
+        with self._lock:
+            fields = self._hashes.setdefault(key, {})
+            if field in fields:
+                return 0
+            fields[field] = value
+            return 1
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        with self._lock:
+            return self._hashes.get(key, {}).get(field)
+
+    def hdel(self, key: str, *fields: str) -> int:
+        with self._lock:
+            existing = self._hashes.get(key, {})
+            return sum(existing.pop(field, None) is not None for field in fields)
+
+    def hgetall(self, key: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._hashes.get(key, {}))
+
+
+def create_job_queue(queue_url: Optional[str] = None) -> JobQueue:
+    """
+    Create the job queue configured by JOB_QUEUE_URL
+
+    Args:
+        queue_url: Queue URL: memory:// (in-process, the default),
+            sqlite:///outputs/papers.db or redis://host:6379/0
+
+    Returns:
+        Job queue instance
+    """
+    queue_url = queue_url or os.environ.get("JOB_QUEUE_URL", "memory://")
+
+    if queue_url == "memory://":
+        return MemoryJobQueue()
+
+    if queue_url.startswith("sqlite:///"):
+        return SqliteJobQueue(
+            queue_url[len("sqlite:///"):],
+            poll_seconds=float(os.environ.get("JOB_QUEUE_POLL_SECONDS", "0.5"))
+        )
+
+    if queue_url.startswith(("redis://", "rediss://", "unix://")):
+        try:
+            import redis
+        except ImportError:
+            raise ValueError("The Redis job queue requires the redis package (pip install -r requirements-redis.txt)")
+        return RedisJobQueue(
+            redis.Redis.from_url(queue_url, decode_responses=True),
+            poll_seconds=float(os.environ.get("JOB_QUEUE_POLL_SECONDS", "0.5"))
+        )
+
+    raise ValueError(f"Unsupported job queue: {queue_url}")
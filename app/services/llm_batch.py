@@ -0,0 +1,187 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.storage import SqliteDatabase
+
+
+class LlmBatchQueue(SqliteDatabase):
+    """
+    Chat completions waiting to go through the Batch API, shared by all workers
+
+    Requests are queued, then submitted together as one batch; once the batch
+    finishes, the worker that claims it hands each result back to its task.
+    Claims are single write transactions, so several workers can flush and
+    poll without submitting or collecting anything twice.
+    """
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS llm_batch_requests (
+                custom_id TEXT PRIMARY KEY,
+                task_id TEXT NOT NULL,
+                body TEXT NOT NULL,
+                batch_id TEXT,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_batch_requests_status ON llm_batch_requests(status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_llm_batch_requests_batch ON llm_batch_requests(batch_id);
+        """)
+
+    def add(self, custom_id: str, task_id: str, body: Dict[str, Any]) -> None:
+        """
+        Queue a request for the next batch
+
+        Args:
+            custom_id: Unique request ID, used to match the result
+            task_id: Task the result belongs to
+            body: Chat completion request body
+        """
+        now = time.time()
+        self._connect().execute(
+            """
+            INSERT OR REPLACE INTO llm_batch_requests (custom_id, task_id, body, batch_id, status, created_at, updated_at)
+            VALUES (?, ?, ?, NULL, 'queued', ?, ?)
+            """,
+            (custom_id, task_id, json.dumps(body), now, now)
+        )
+
+    def pending(self) -> Dict[str, Any]:
+        """
+        Describe the requests not submitted yet
+
+        Returns:
+            Dictionary with the number of queued requests and the age of the oldest in seconds
+        """
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS requests, MIN(created_at) AS oldest FROM llm_batch_requests WHERE status = 'queued'"
+        ).fetchone()
+        return {
+            "requests": row["requests"],
+            "oldest_seconds": time.time() - row["oldest"] if row["oldest"] is not None else 0.0
+        }
+
+    def claim_queued(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Take queued requests for submission
+
+        Args:
+            limit: Maximum number of requests
+
+        Returns:
+            Requests with custom_id, task_id and body, oldest first
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Requests stuck in submission (the worker died mid-way) are retried after 10 minutes
+            rows = conn.execute(
+                "SELECT custom_id, task_id, body FROM llm_batch_requests "
+                "WHERE status = 'queued' OR (status = 'submitting' AND updated_at < ?) "
+                "ORDER BY created_at LIMIT ?",
+                (time.time() - 600, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE llm_batch_requests SET status = 'submitting', updated_at = ? WHERE custom_id = ?",
+                [(time.time(), row["custom_id"]) for row in rows]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [{"custom_id": row["custom_id"], "task_id": row["task_id"], "body": json.loads(row["body"])} for row in rows]
+
+    def mark_submitted(self, custom_ids: List[str], batch_id: Optional[str]) -> None:
+        """
+        Record the batch claimed requests were submitted in, or queue them again if batch_id is None
+
+        Args:
+            custom_ids: Claimed request IDs
+            batch_id: Batch ID, or None if submission failed
+        """
+        status = "submitted" if batch_id else "queued"
+        self._connect().executemany(
+            "UPDATE llm_batch_requests SET status = ?, batch_id = ?, updated_at = ? WHERE custom_id = ?",
+            [(status, batch_id, time.time(), custom_id) for custom_id in custom_ids]
+        )
+
+    def submitted_batches(self) -> List[str]:
+        """
+        List the batches still waiting for results
+
+        Returns:
+            Batch IDs
+        """
+        rows = self._connect().execute(
+            "SELECT DISTINCT batch_id FROM llm_batch_requests WHERE status = 'submitted'"
+        ).fetchall()
+        return [row["batch_id"] for row in rows]
+
+    def claim_batch(self, batch_id: str) -> List[Dict[str, Any]]:
+        """
+        Take the requests of a finished batch for collection
+
+        Args:
+            batch_id: Batch ID
+
+        Returns:
+            Requests with custom_id and task_id, empty if another worker claimed the batch first
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT custom_id, task_id FROM llm_batch_requests WHERE batch_id = ? AND status = 'submitted'",
+                (batch_id,)
+            ).fetchall()
+            conn.execute(
+                "UPDATE llm_batch_requests SET status = 'collecting', updated_at = ? WHERE batch_id = ? AND status = 'submitted'",
+                (time.time(), batch_id)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [{"custom_id": row["custom_id"], "task_id": row["task_id"]} for row in rows]
+
+    def release_batch(self, batch_id: str) -> None:
+        """
+        Put a claimed batch back, e.g. after failing to download its results
+
+        Args:
+            batch_id: Batch ID
+        """
+        self._connect().execute(
+            "UPDATE llm_batch_requests SET status = 'submitted', updated_at = ? WHERE batch_id = ? AND status = 'collecting'",
+            (time.time(), batch_id)
+        )
+
+    def remove(self, custom_ids: List[str]) -> None:
+        """
+        Forget collected requests
+
+        Args:
+            custom_ids: Request IDs
+        """
+        self._connect().executemany(
+            "DELETE FROM llm_batch_requests WHERE custom_id = ?", [(custom_id,) for custom_id in custom_ids]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Count requests by status
+
+        Returns:
+            Dictionary of request counts and the number of open batches
+        """
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) AS requests, COUNT(DISTINCT batch_id) AS batches "
+            "FROM llm_batch_requests GROUP BY status"
+        ).fetchall()
+        return {
+            "requests": {row["status"]: row["requests"] for row in rows},
+            "open_batches": sum(row["batches"] for row in rows if row["status"] in ("submitted", "collecting"))
+        }
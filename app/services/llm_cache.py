@@ -0,0 +1,229 @@
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.storage import SqliteDatabase
+
+# USD per 1K prompt and completion tokens, used to estimate what cache hits saved
+MODEL_PRICES = {
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015)
+}
+
+
+def request_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Estimate the price of a chat completion
+
+    Args:
+        model: Model name
+        prompt_tokens: Prompt tokens used
+        completion_tokens: Completion tokens used
+
+    Returns:
+        Cost in USD (0 for models without a known price)
+    """
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class LlmResponseCache(SqliteDatabase):
+    """
+    Persistent cache of chat completion responses, keyed by a hash of the request
+
+    Retries and re-summarizations send byte-identical prompts, so their
+    responses are served from here instead of paying for them again.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age_seconds: float = 30 * 24 * 3600
+    ):
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS llm_responses (
+                cache_key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                completion_tokens INTEGER NOT NULL DEFAULT 0,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses(last_used_at);
+            CREATE INDEX IF NOT EXISTS idx_llm_responses_created_at ON llm_responses(created_at);
+
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+
+    def _increment(self, counters: Dict[str, int]) -> None:
+        """Add to shared counters"""
+        self._connect().executemany(
+            """
+            INSERT INTO cache_stats (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+            """,
+            list(counters.items())
+        )
+
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """
+        Hash the parts of a request that determine its response
+
+        Args:
+            model: Model name
+            messages: Chat messages
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in the response
+
+        Returns:
+            Hex SHA-256 of the canonical request
+        """
+        canonical = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """
+        Look up a cached response
+
+        Args:
+            cache_key: Key from make_key
+
+        Returns:
+            Response text on a hit, otherwise None
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT model, response, prompt_tokens, completion_tokens, created_at FROM llm_responses WHERE cache_key = ?",
+            (cache_key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or now - row["created_at"] > self.max_age_seconds:
+            self._increment({"llm_misses": 1})
+            return None
+
+        conn.execute(
+            "UPDATE llm_responses SET last_used_at = ?, hits = hits + 1 WHERE cache_key = ?",
+            (now, cache_key)
+        )
+        saved = request_cost(row["model"], row["prompt_tokens"], row["completion_tokens"])
+        self._increment({
+            "llm_hits": 1,
+            "llm_saved_prompt_tokens": row["prompt_tokens"],
+            "llm_saved_completion_tokens": row["completion_tokens"],
+            # Kept as an integer number of micro-dollars
+            "llm_saved_microdollars": round(saved * 1_000_000)
+        })
+        return row["response"]
+
+    def put(
+        self,
+        cache_key: str,
+        model: str,
+        response: str,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0
+    ) -> None:
+        """
+        Cache a response
+
+        Args:
+            cache_key: Key from make_key
+            model: Model that produced the response
+            response: Response text
+            prompt_tokens: Prompt tokens the request used
+            completion_tokens: Completion tokens the request used
+        """
+        now = time.time()
+        self._connect().execute(
+            """
+            INSERT OR REPLACE INTO llm_responses
+                (cache_key, model, response, prompt_tokens, completion_tokens, size_bytes, created_at, last_used_at, hits)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+            """,
+            (cache_key, model, response, prompt_tokens, completion_tokens, len(response.encode("utf-8")), now, now)
+        )
+        self.evict()
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache lookup"""
+        self._increment({"llm_bypassed": 1})
+
+    def evict(self) -> int:
+        """
+        Remove entries older than max_age_seconds and the least recently used
+        entries beyond max_bytes
+
+        Returns:
+            Number of evicted entries
+        """
+        conn = self._connect()
+        expired = conn.execute(
+            "DELETE FROM llm_responses WHERE created_at < ?",
+            (time.time() - self.max_age_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            """
+            DELETE FROM llm_responses WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key, SUM(size_bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS total_bytes
+                    FROM llm_responses
+                ) WHERE total_bytes > ?
+            )
+            """,
+            (self.max_bytes,)
+        ).rowcount
+        return expired + overflow
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache size, hit/miss counters and the estimated savings
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        conn = self._connect()
+        counters = {
+            row["name"]: row["value"]
+            for row in conn.execute("SELECT name, value FROM cache_stats WHERE name LIKE 'llm_%'")
+        }
+        size = conn.execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(size_bytes), 0) AS size_bytes FROM llm_responses"
+        ).fetchone()
+
+        hits = counters.get("llm_hits", 0)
+        misses = counters.get("llm_misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": size["entries"],
+            "size_bytes": size["size_bytes"],
+            "hits": hits,
+            "misses": misses,
+            "bypassed": counters.get("llm_bypassed", 0),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_prompt_tokens": counters.get("llm_saved_prompt_tokens", 0),
+            "saved_completion_tokens": counters.get("llm_saved_completion_tokens", 0),
+            "dollars_saved": round(counters.get("llm_saved_microdollars", 0) / 1_000_000, 4)
+        }
@@ -0,0 +1,350 @@
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import openai
+
+from app.services.http_client import get_http_client
+from app.services.llm_cache import LlmResponseCache
+from app.services.rate_limit import AsyncRateLimiter
+from app.services.text_chunker import estimate_tokens
+
+# Status codes worth retrying: rate limiting, conflicts/timeouts and transient server errors
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class LlmGateway:
+    """
+    Shared entry point for chat completions
+
+    All agents go through one async client, so requests and tokens per minute
+    are limited across every paper being processed at once. Rate-limited and
+    failed requests are retried with exponential backoff and full jitter
+    (or the server's Retry-After). Responses are served from an optional
+    cache when the same request was answered before. Requests can also be
+    submitted through the Batch API and collected later, for bulk work that
+    isn't latency-sensitive.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_factor: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: Optional[float] = None,
+        cache: Optional[LlmResponseCache] = None,
+        bypass_cache: Optional[bool] = None
+    ):
+        """
+        Args:
+            api_key: OpenAI API key (defaults to OPENAI_API_KEY)
+            base_url: API base URL, e.g. a local mock server (defaults to OPENAI_BASE_URL)
+            requests_per_minute: Request rate limit (defaults to LLM_REQUESTS_PER_MINUTE)
+            tokens_per_minute: Prompt plus completion token rate limit (defaults to LLM_TOKENS_PER_MINUTE)
+            max_retries: Maximum retries of a failed request (defaults to LLM_MAX_RETRIES)
+            backoff_factor: Base delay of the exponential backoff in seconds
+            max_backoff: Maximum delay between retries in seconds
+            timeout: Request timeout in seconds (defaults to LLM_TIMEOUT_SECONDS)
+            cache: Response cache, or None to always call the API
+            bypass_cache: Skip cache lookups but still store fresh responses
+                (defaults to LLM_CACHE_BYPASS)
+        """
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.base_url = (base_url or os.environ.get("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+        self.requests_per_minute = requests_per_minute or float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "500"))
+        self.tokens_per_minute = tokens_per_minute or float(os.environ.get("LLM_TOKENS_PER_MINUTE", "300000"))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("LLM_MAX_RETRIES", "6"))
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout or float(os.environ.get("LLM_TIMEOUT_SECONDS", "120"))
+        self.cache = cache
+        self.bypass_cache = bypass_cache if bypass_cache is not None else (
+            os.environ.get("LLM_CACHE_BYPASS", "false").lower() in ("1", "true", "yes")
+        )
+
+        # Retries are handled here, where they can respect the shared rate limits
+        self.client = openai.AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0,
+            timeout=self.timeout
+        )
+        self.request_limiter = AsyncRateLimiter(self.requests_per_minute, per=60)
+        self.token_limiter = AsyncRateLimiter(self.tokens_per_minute, per=60)
+
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.throttled_seconds = 0.0
+
+    def _reserve_tokens(self, messages: List[Dict[str, str]], max_tokens: int) -> int:
+        """Upper estimate of the tokens a request will use, taken from the bucket up front"""
+        # Each message carries a few tokens of formatting overhead
+        return sum(estimate_tokens(message["content"]) + 4 for message in messages) + max_tokens
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Compute how long to wait before retrying a failed request
+
+        Args:
+            attempt: Zero-based number of the attempt that just failed
+            error: The error the attempt failed with
+
+        Returns:
+            Delay in seconds (Retry-After if the server sent one, otherwise full-jitter backoff)
+        """
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after = response.headers.get("retry-after", "")
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """Whether a failed request may succeed if sent again"""
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRY_STATUSES
+        return isinstance(error, openai.APIConnectionError)
+
+    async def _stream_completion(
+        self,
+        parts: List[str],
+        on_token: Callable[[str], None],
+        **request: Any
+    ) -> Optional[str]:
+        """
+        Run a streamed chat completion, passing each text delta to on_token
+
+        Args:
+            parts: List the received deltas are appended to
+            on_token: Callback for each delta
+            **request: Chat completion parameters
+
+        Returns:
+            Finish reason of the completion
+        """
+        finish_reason = None
+        stream = await self.client.chat.completions.create(stream=True, **request)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta is not None and choice.delta.content:
+                parts.append(choice.delta.content)
+                on_token(choice.delta.content)
+            finish_reason = choice.finish_reason or finish_reason
+        return finish_reason
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        model: str = "gpt-4-turbo",
+        temperature: float = 0.3,
+        max_tokens: int = 1000,
+        bypass_cache: Optional[bool] = None,
+        on_token: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Run a chat completion within the shared rate limits, retrying transient failures
+
+        Args:
+            messages: Chat messages
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens in the response
+            bypass_cache: Ignore a cached response and refresh it (defaults to the gateway setting)
+            on_token: Stream the completion, calling this with each piece of text as it
+                arrives (a cached response is passed in one piece)
+
+        Returns:
+            Response text
+        """
+        cache_key = None
+        if self.cache is not None:
+            # Cache lookups and writes are SQLite calls, so they run on a worker thread
+            cache_key = self.cache.make_key(model, messages, temperature, max_tokens)
+            if bypass_cache if bypass_cache is not None else self.bypass_cache:
+                await asyncio.to_thread(self.cache.record_bypass)
+            else:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    if on_token is not None:
+                        on_token(cached)
+                    return cached
+
+        request = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
+        reserved = self._reserve_tokens(messages, max_tokens)
+        attempt = 0
+        while True:
+            waited_at = time.monotonic()
+            await self.request_limiter.acquire()
+            await self.token_limiter.acquire(reserved)
+            self.throttled_seconds += time.monotonic() - waited_at
+            self.requests += 1
+
+            parts: List[str] = []
+            try:
+                if on_token is None:
+                    response = await self.client.chat.completions.create(**request)
+                    content = response.choices[0].message.content or ""
+                    finish_reason = response.choices[0].finish_reason
+                    usage = response.usage
+                    prompt_tokens = usage.prompt_tokens if usage is not None else 0
+                    completion_tokens = usage.completion_tokens if usage is not None else 0
+                else:
+                    finish_reason = await self._stream_completion(parts, on_token, **request)
+                    content = "".join(parts)
+                    # Streamed responses carry no usage, so it is estimated
+                    prompt_tokens = reserved - max_tokens
+                    completion_tokens = estimate_tokens(content)
+            except Exception as e:
+                if isinstance(e, openai.RateLimitError):
+                    self.rate_limited += 1
+                if not parts:
+                    # Nothing was generated, so the attempt shouldn't count against the token rate
+                    self.token_limiter.release(reserved)
+                # Text already passed on can't be taken back, so a broken stream isn't retried
+                if not self._is_retryable(e) or attempt >= self.max_retries or parts:
+                    self.failures += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._retry_delay(attempt, e))
+                attempt += 1
+                continue
+
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            # Give back what the estimate reserved beyond actual usage
+            unused = reserved - prompt_tokens - completion_tokens
+            if unused > 0:
+                self.token_limiter.release(unused)
+
+            # Truncated responses aren't worth replaying
+            if cache_key is not None and content and finish_reason == "stop":
+                await asyncio.to_thread(self.cache.put, cache_key, model, content, prompt_tokens, completion_tokens)
+            return content
+
+    def _headers(self) -> Dict[str, str]:
+        """Authorization headers for the raw Batch API requests"""
+        return {"Authorization": f"Bearer {self.api_key}"}
+
+    async def _api(self, method: str, path: str, **kwargs: Any) -> Any:
+        """Send a request to the API over the shared HTTP client, returning the parsed JSON body"""
+        # Creating files and batches isn't idempotent: a retried POST the server
+        # already accepted would submit the batch twice
+        response = await get_http_client().request(
+            method, f"{self.base_url}{path}", retry=method == "GET", headers=self._headers(), **kwargs
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def submit_batch(self, requests: List[Dict[str, Any]]) -> str:
+        """
+        Submit chat completions to the Batch API
+
+        Args:
+            requests: Dictionaries with a custom_id and the request body (model,
+                messages, temperature, max_tokens)
+
+        Returns:
+            ID of the created batch
+        """
+        lines = [
+            json.dumps({
+                "custom_id": request["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": request["body"]
+            })
+            for request in requests
+        ]
+        uploaded = await self._api(
+            "POST",
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("requests.jsonl", "\n".join(lines).encode("utf-8"), "application/jsonl")}
+        )
+        batch = await self._api(
+            "POST",
+            "/batches",
+            json={"input_file_id": uploaded["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"}
+        )
+        return batch["id"]
+
+    async def get_batch(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Get the status of a submitted batch
+
+        Args:
+            batch_id: Batch ID
+
+        Returns:
+            Batch object (status is one of validating, in_progress, finalizing,
+            completed, failed, expired, cancelling, cancelled)
+        """
+        return await self._api("GET", f"/batches/{batch_id}")
+
+    async def batch_results(self, batch: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Download the results of a finished batch
+
+        Args:
+            batch: Batch object returned by get_batch
+
+        Returns:
+            Dictionary by custom_id with either "content" (the response text) or "error"
+        """
+        results = {}
+        for file_field in ("output_file_id", "error_file_id"):
+            file_id = batch.get(file_field)
+            if not file_id:
+                continue
+            response = await get_http_client().get(f"{self.base_url}/files/{file_id}/content", headers=self._headers())
+            response.raise_for_status()
+            for line in response.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                result = record.get("response") or {}
+                body = result.get("body") or {}
+                if result.get("status_code") == 200 and body.get("choices"):
+                    results[record["custom_id"]] = {"content": body["choices"][0]["message"]["content"] or ""}
+                    usage = body.get("usage") or {}
+                    self.prompt_tokens += usage.get("prompt_tokens", 0)
+                    self.completion_tokens += usage.get("completion_tokens", 0)
+                else:
+                    error = record.get("error") or body.get("error") or {"message": f"status {result.get('status_code')}"}
+                    results[record["custom_id"]] = {"error": error.get("message", str(error))}
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get request, retry and token counters for this process
+
+        Returns:
+            Dictionary of gateway statistics
+        """
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "requests_per_minute": self.requests_per_minute,
+            "tokens_per_minute": self.tokens_per_minute,
+            "base_url": self.base_url
+        }
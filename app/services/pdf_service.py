@@ -1,44 +1,262 @@
 from datetime import datetime
 import PyPDF2
-from typing import Dict, Any, Optional
-import requests
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import httpx
+import asyncio
+import mmap
 import os
-import io
+
+from app.services.executor import ExecutionService
+from app.services.http_client import get_http_client
+from app.services.text_chunker import estimate_tokens
+
+# PDF files start with this header (the spec allows up to 1 KB of leading junk)
+PDF_MAGIC = b"%PDF-"
+PDF_HEADER_SEARCH_BYTES = 1024
+# Longest abstract taken from a first page, in case no end marker follows it
+MAX_ABSTRACT_CHARS = 3000
+
+
+def count_pages(file_path: str) -> int:
+    """
+    Count the pages of a PDF file without extracting any text
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        Number of pages
+    """
+    with open(file_path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages [start, stop) of a PDF file
+
+    Runs in a worker process. The file is memory-mapped, so workers extracting
+    different ranges of the same PDF share the page cache instead of each
+    reading their own copy.
+
+    Args:
+        file_path: Path to the PDF file
+        start: Index of the first page
+        stop: Index after the last page
+
+    Returns:
+        Text of each page in the range, in page order
+    """
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = PyPDF2.PdfReader(mapped)
+        return [reader.pages[page_num].extract_text() for page_num in range(start, min(stop, len(reader.pages)))]
 
 
 class PdfService:
     """Service for processing PDF files and extracting text and metadata"""
 
-    def extract_text(self, file_path: str) -> str:
+    def __init__(
+        self,
+        max_download_bytes: Optional[int] = None,
+        parallel_min_pages: Optional[int] = None,
+        pages_per_task: Optional[int] = None
+    ):
+        self.max_download_bytes = max_download_bytes or int(
+            float(os.environ.get("PDF_MAX_DOWNLOAD_MB", "100")) * 1024 * 1024
+        )
+        self.chunk_size = 256 * 1024
+        # Smaller PDFs are extracted serially: spreading them over processes costs more than it saves
+        self.parallel_min_pages = parallel_min_pages or int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "24"))
+        self.pages_per_task = pages_per_task or int(os.environ.get("PDF_PAGES_PER_TASK", "8"))
+
+    def iter_pages(self, file_path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """
+        Lazily yield the text of each page of a PDF file
+
+        Pages are only parsed when the caller asks for them; the file is closed
+        when the generator is exhausted or closed.
+
+        Args:
+            file_path: Path to the PDF file
+            start: Index of the first page to yield
+            stop: Index after the last page to yield (defaults to the end of the document)
+
+        Yields:
+            Text content of each page
+        """
+        with open(file_path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            yield from self._iter_reader_pages(reader, start, stop)
+
+    def _iter_reader_pages(self, reader: PyPDF2.PdfReader, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Yield page texts from an open reader"""
+        stop = len(reader.pages) if stop is None else min(stop, len(reader.pages))
+        for page_num in range(start, stop):
+            yield reader.pages[page_num].extract_text()
+
+    def _take_pages(
+        self,
+        pages: Iterable[str],
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ) -> List[str]:
+        """
+        Collect page texts until a character or token budget is reached
+
+        Args:
+            pages: Iterable of page texts (consumed lazily)
+            max_chars: Stop after this many characters
+            max_tokens: Stop after roughly this many LLM tokens
+
+        Returns:
+            Texts of the pages needed to fill the budget
+        """
+        taken = []
+        chars = 0
+        tokens = 0
+        for page_text in pages:
+            taken.append(page_text)
+            chars += len(page_text) + 2
+            if max_chars is not None and chars >= max_chars:
+                break
+            if max_tokens is not None:
+                tokens += estimate_tokens(page_text)
+                if tokens >= max_tokens:
+                    break
+        return taken
+
+    def join_pages(self, pages: List[str], max_chars: Optional[int] = None) -> str:
+        """
+        Join page texts into the document text
+
+        Args:
+            pages: Page texts in page order
+            max_chars: Truncate the text to this many characters
+
+        Returns:
+            Document text
+        """
+        text = "".join(page_text + "\n\n" for page_text in pages)
+        return text[:max_chars] if max_chars is not None else text
+
+    def extract_pages(self, file_path: str, max_chars: Optional[int] = None, max_tokens: Optional[int] = None) -> List[str]:
+        """
+        Extract the text of each page of a PDF file
+
+        Pages are parsed one at a time and parsing stops as soon as the budget
+        is reached, so callers that only need the beginning of a long document
+        don't pay for the rest of it.
+
+        Args:
+            file_path: Path to the PDF file
+            max_chars: Stop after this many characters (defaults to the whole document)
+            max_tokens: Stop after roughly this many LLM tokens
+
+        Returns:
+            Text of each extracted page, in page order
+        """
+        try:
+            pages = self.iter_pages(file_path)
+            try:
+                return self._take_pages(pages, max_chars, max_tokens)
+            finally:
+                pages.close()
+        except Exception as e:
+            print(f"Error extracting text from PDF: {str(e)}")
+            return []
+
+    def extract_text(self, file_path: str, max_chars: Optional[int] = None, max_tokens: Optional[int] = None) -> str:
         """
         Extract text content from a PDF file
 
         Args:
             file_path: Path to the PDF file
+            max_chars: Stop after this many characters (defaults to the whole document)
+            max_tokens: Stop after roughly this many LLM tokens
 
         Returns:
             Extracted text content as a string
         """
-        text = ""
+        return self.join_pages(self.extract_pages(file_path, max_chars, max_tokens), max_chars)
+
+    async def extract_pages_parallel(
+        self,
+        file_path: str,
+        executor: ExecutionService,
+        max_chars: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ) -> List[str]:
+        """
+        Extract the text of each page of a PDF file, spreading page ranges across the process pool
+
+        Ranges are collected in page order and ranges that haven't started yet are
+        cancelled once the budget is reached. PDFs with fewer than parallel_min_pages
+        pages (or a single CPU worker) are extracted serially in one worker.
+
+        Args:
+            file_path: Path to the PDF file
+            executor: Execution service whose process pool runs the page ranges
+            max_chars: Stop after this many characters (defaults to the whole document)
+            max_tokens: Stop after roughly this many LLM tokens
+
+        Returns:
+            Text of each extracted page, in page order
+        """
         try:
-            with open(file_path, "rb") as file:
-                reader = PyPDF2.PdfReader(file)
+            page_count = await executor.run_io(count_pages, file_path)
+        except Exception as e:
+            print(f"Error extracting text from PDF: {str(e)}")
+            return []
+
+        if page_count < self.parallel_min_pages or executor.cpu_workers < 2:
+            return await executor.run_cpu(self.extract_pages, file_path, max_chars=max_chars, max_tokens=max_tokens)
 
-                for page_num in range(len(reader.pages)):
-                    page = reader.pages[page_num]
-                    text += page.extract_text() + "\n\n"
+        loop = asyncio.get_running_loop()
+        futures = [
+            loop.run_in_executor(
+                executor.process_pool,
+                extract_page_range,
+                file_path,
+                start,
+                min(start + self.pages_per_task, page_count)
+            )
+            for start in range(0, page_count, self.pages_per_task)
+        ]
 
-            return text
+        pages = []
+        chars = 0
+        tokens = 0
+        try:
+            for future in futures:
+                for page_text in await future:
+                    pages.append(page_text)
+                    chars += len(page_text) + 2
+                    if max_tokens is not None:
+                        tokens += estimate_tokens(page_text)
+                if (max_chars is not None and chars >= max_chars) or (max_tokens is not None and tokens >= max_tokens):
+                    break
         except Exception as e:
             print(f"Error extracting text from PDF: {str(e)}")
-            return ""
+            return []
+        finally:
+            for future in futures:
+                future.cancel()
 
-    def extract_metadata(self, file_path: str) -> Dict[str, Any]:
+        return self._take_pages(pages, max_chars, max_tokens)
+
+    def extract_metadata(
+        self,
+        file_path: str,
+        reader: Optional[PyPDF2.PdfReader] = None,
+        first_page_text: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Extract metadata from a PDF file
 
         Args:
             file_path: Path to the PDF file
+            reader: Already open reader for the file, to avoid opening it again
+            first_page_text: Already extracted text of the first page
 
         Returns:
             Dictionary containing metadata fields
@@ -70,33 +288,40 @@ class PdfService:
                 print(f"Error parsing date '{date_str}': {e}")
                 return None
 
+        if reader is None:
+            try:
+                with open(file_path, "rb") as file:
+                    return self.extract_metadata(file_path, reader=PyPDF2.PdfReader(file))
+            except Exception as e:
+                print(f"Error extracting metadata from PDF: {str(e)}")
+                return metadata
+
         try:
-            with open(file_path, "rb") as file:
-                reader = PyPDF2.PdfReader(file)
-                info = reader.metadata
-
-                if info:
-                    # Extract title
-                    if info.title:
-                        metadata["title"] = info.title
-
-                    # Extract author(s)
-                    if info.author:
-                        if isinstance(info.author, str):
-                            authors = info.author.split(", ")
-                            metadata["authors"] = [a.strip() for a in authors]
-                        else:
-                            metadata["authors"] = [info.author]
-
-                    # Extract creation date
-                    if info.creation_date:
-                        metadata["publication_date"] = parse_date(str(info.creation_date))
-
-                # Try to extract abstract from first page text
+            info = reader.metadata
+
+            if info:
+                # Extract title
+                if info.title:
+                    metadata["title"] = info.title
+
+                # Extract author(s)
+                if info.author:
+                    if isinstance(info.author, str):
+                        authors = info.author.split(", ")
+                        metadata["authors"] = [a.strip() for a in authors]
+                    else:
+                        metadata["authors"] = [info.author]
+
+                # Extract creation date
+                if info.creation_date:
+                    metadata["publication_date"] = parse_date(str(info.creation_date))
+
+            # Try to extract abstract from first page text
+            if first_page_text is None:
                 first_page_text = reader.pages[0].extract_text()
-                abstract = self._extract_abstract(first_page_text)
-                if abstract:
-                    metadata["abstract"] = abstract
+            abstract = self._extract_abstract(first_page_text)
+            if abstract:
+                metadata["abstract"] = abstract
 
             return metadata
 
@@ -133,45 +358,145 @@ class PdfService:
                         end_idx = marker_idx
 
                 # Extract the abstract
-                abstract = text[start_idx:end_idx].strip()
+                abstract = text[start_idx:end_idx].strip()[:MAX_ABSTRACT_CHARS]
                 break
 
         return abstract
     
-    def download_pdf(self, url: str, output_path: str) -> bool:
+    async def download_pdf_async(
+        self,
+        url: str,
+        output_path: str,
+        max_bytes: Optional[int] = None,
+        max_resume_attempts: int = 3
+    ) -> bool:
         """
-        Download a PDF from a URL and save it to the specified path
-        
+        Download a PDF over the shared async HTTP client and save it to the specified path
+
+        The body is streamed to a ".part" file in chunks, so the whole document is
+        never held in memory, and its header and size are checked as it arrives.
+        If the connection drops, the download resumes from the partial file with
+        an HTTP Range request.
+
         Args:
             url: URL of the PDF to download
             output_path: Path where the PDF should be saved
-            
+            max_bytes: Maximum allowed size of the PDF (defaults to PDF_MAX_DOWNLOAD_MB)
+            max_resume_attempts: How many times an interrupted download is resumed
+
         Returns:
-            True if download was successful, False otherwise
+            True if download was successful
         """
+        max_bytes = max_bytes or self.max_download_bytes
+        partial_path = output_path + ".part"
+
         try:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Send HTTP request with timeout
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()  # Raise an exception for error status codes
-            
-            # Check if content is likely a PDF
-            content_type = response.headers.get('Content-Type', '')
-            if 'application/pdf' not in content_type and not url.lower().endswith('.pdf'):
-                # If URL doesn't end with .pdf and content-type isn't PDF, try to validate content
+
+            attempt = 0
+            while True:
                 try:
-                    # Try to read it as a PDF to validate
-                    PyPDF2.PdfReader(io.BytesIO(response.content))
-                except:
-                    raise ValueError("Downloaded content does not appear to be a valid PDF")
-            
-            # Save the PDF
-            with open(output_path, 'wb') as f:
-                f.write(response.content)
-                
+                    await self._stream_to_file_async(url, partial_path, max_bytes)
+                    break
+                except httpx.TransportError:
+                    attempt += 1
+                    if attempt > max_resume_attempts:
+                        raise
+
+            await asyncio.to_thread(self._finish_download, partial_path, output_path)
             return True
         except Exception as e:
             print(f"Error downloading PDF from {url}: {str(e)}")
+            # Keep partial data only for dropped connections, where a retry can resume it;
+            # error statuses (e.g. 404) and invalid content won't get better
+            if not isinstance(e, httpx.TransportError) and os.path.exists(partial_path):
+                os.remove(partial_path)
             raise e  # Re-raise the exception to be caught by the caller
+
+    async def _stream_to_file_async(self, url: str, partial_path: str, max_bytes: int) -> None:
+        """
+        Stream a response body into a partial file using the shared async client
+
+        Args:
+            url: URL to download
+            partial_path: Path of the partial file to create or append to
+            max_bytes: Maximum allowed total size in bytes
+        """
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        async with get_http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 416 and offset:
+                # The partial file doesn't match the remote file anymore; start over
+                os.remove(partial_path)
+                restart = True
+            else:
+                restart = False
+                response.raise_for_status()
+
+                if offset and response.status_code != 206:
+                    # Server ignored the Range header and sent the whole file
+                    offset = 0
+
+                self._check_content_length(response.headers.get("Content-Length"), offset, max_bytes)
+
+                written = offset
+                header = b""
+                # File writes go to a worker thread so a slow disk doesn't stall the event loop
+                f = await asyncio.to_thread(open, partial_path, "ab" if offset else "wb")
+                try:
+                    async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
+                        written, header = self._check_chunk(chunk, written, header, offset, max_bytes)
+                        await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await asyncio.to_thread(f.close)
+
+        if restart:
+            await self._stream_to_file_async(url, partial_path, max_bytes)
+
+    def _check_content_length(self, content_length: Optional[str], offset: int, max_bytes: int) -> None:
+        """Reject a download up front when the announced size exceeds the limit"""
+        if content_length and content_length.isdigit() and offset + int(content_length) > max_bytes:
+            raise ValueError(f"PDF exceeds the maximum download size of {max_bytes} bytes")
+
+    def _check_chunk(
+        self,
+        chunk: bytes,
+        written: int,
+        header: bytes,
+        offset: int,
+        max_bytes: int
+    ) -> Tuple[int, bytes]:
+        """
+        Account for a received chunk, enforcing the size limit and the PDF header check
+
+        Args:
+            chunk: Bytes just received
+            written: Bytes in the partial file before this chunk
+            header: Leading bytes collected so far for the header check
+            offset: Size of the partial file when this request started
+            max_bytes: Maximum allowed total size in bytes
+
+        Returns:
+            Updated (written, header) values
+        """
+        written += len(chunk)
+        if written > max_bytes:
+            raise ValueError(f"PDF exceeds the maximum download size of {max_bytes} bytes")
+
+        # Reject non-PDF responses (e.g. HTML landing pages) as soon as the header arrives
+        if offset == 0 and len(header) < PDF_HEADER_SEARCH_BYTES:
+            header += chunk[:PDF_HEADER_SEARCH_BYTES]
+            if len(header) >= PDF_HEADER_SEARCH_BYTES and PDF_MAGIC not in header[:PDF_HEADER_SEARCH_BYTES]:
+                raise ValueError("Downloaded content does not appear to be a valid PDF")
+
+        return written, header
+
+    def _finish_download(self, partial_path: str, output_path: str) -> None:
+        """Validate a complete partial file (including resumed ones) and move it into place"""
+        with open(partial_path, "rb") as f:
+            if PDF_MAGIC not in f.read(PDF_HEADER_SEARCH_BYTES):
+                raise ValueError("Downloaded content does not appear to be a valid PDF")
+
+        os.replace(partial_path, output_path)
@@ -0,0 +1,212 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+# Stages after which a task publishes nothing more
+TERMINAL_STAGES = ("completed", "failed")
+# Stages in which a task publishes nothing until something outside the pipeline
+# resumes it (a queued Batch API draft can take hours), so streams end there
+PARKED_STAGES = ("batched",)
+
+
+class TaskProgress:
+    """Stage transitions of one task, shared by all of its subscribers"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.events: List[Dict[str, Any]] = []
+        # Text streamed by the task so far, by stream name (e.g. "draft", "final")
+        self.texts: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+        self.started_at = time.monotonic()
+        self.stage: Optional[str] = None
+        self.stage_started_at = self.started_at
+        # Last publish or streamed text, and open iter_events/iter_text readers
+        self.updated_at = self.started_at
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the task reached a terminal stage"""
+        return self.stage in TERMINAL_STAGES
+
+    @property
+    def parked(self) -> bool:
+        """Whether the task is waiting to be resumed, e.g. for a Batch API draft"""
+        return self.stage in PARKED_STAGES
+
+    def publish(self, stage: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a stage transition and wake up subscribers"""
+        now = time.monotonic()
+        if self.stage is not None and self.stage not in TERMINAL_STAGES:
+            self.timings[self.stage] = round(self.timings.get(self.stage, 0.0) + now - self.stage_started_at, 3)
+        self.stage = stage
+        self.stage_started_at = now
+
+        event = {
+            "id": len(self.events),
+            "task_id": self.task_id,
+            "stage": stage,
+            "elapsed_seconds": round(now - self.started_at, 3),
+            "timings": dict(self.timings),
+            **data
+        }
+        self.events.append(event)
+        self._notify()
+        return event
+
+    def append_text(self, name: str, delta: str) -> None:
+        """Append a piece of streamed text (e.g. LLM tokens) and wake up subscribers"""
+        self.texts[name] = self.texts.get(name, "") + delta
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake up everyone waiting for a change"""
+        self.updated_at = time.monotonic()
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def iter_events(
+        self,
+        after: int = -1,
+        heartbeat_seconds: Optional[float] = None
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield events with an id greater than after, waiting for new ones until the task finishes or is parked
+
+        Args:
+            after: ID of the last event the subscriber has seen
+            heartbeat_seconds: Yield None after this long without events, so
+                idle connections can be kept alive
+
+        Yields:
+            Event dictionaries in publication order (or None as a heartbeat)
+        """
+        index = after + 1
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                while index < len(self.events):
+                    yield self.events[index]
+                    index += 1
+                if self.finished or self.parked:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.subscribers -= 1
+
+
+    async def iter_text(self, heartbeat_seconds: Optional[float] = None) -> AsyncIterator[Optional[Tuple[str, str]]]:
+        """
+        Yield streamed text as it arrives, starting with everything streamed so far, until the task finishes or is parked
+
+        Pieces appended between two wake-ups are yielded together, so slow
+        subscribers get fewer, larger deltas instead of falling behind.
+
+        Args:
+            heartbeat_seconds: Yield None after this long without new text
+
+        Yields:
+            Tuples of (stream name, text delta), or None as a heartbeat
+        """
+        sent: Dict[str, int] = {}
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                for name, text in list(self.texts.items()):
+                    offset = sent.get(name, 0)
+                    if len(text) > offset:
+                        sent[name] = len(text)
+                        yield name, text[offset:]
+                if self.finished or self.parked:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.subscribers -= 1
+
+
+class ProgressBroker:
+    """
+    In-process fan-out of task stage transitions to any number of subscribers
+
+    Each task keeps a single event log that every subscriber reads from, so
+    adding subscribers costs no extra work per published event. Finished
+    tasks are kept for retention_seconds so late subscribers still get the
+    full history. Tasks that stop publishing without finishing (e.g. waiting
+    on the Batch API, or lost with a crashed job) are dropped after
+    idle_seconds unless someone is still subscribed.
+    """
+
+    def __init__(self, retention_seconds: float = 600, idle_seconds: float = 3600):
+        self.retention_seconds = retention_seconds
+        self.idle_seconds = idle_seconds
+        self._tasks: Dict[str, TaskProgress] = {}
+        self._last_idle_check = time.monotonic()
+
+    def _track(self, task_id: str) -> TaskProgress:
+        """Get the progress of a task, creating it on first use and dropping idle tasks now and then"""
+        now = time.monotonic()
+        # Scanning every task on each event would be wasteful; a minute's delay doesn't matter
+        if now - self._last_idle_check >= min(self.idle_seconds, 60):
+            self._last_idle_check = now
+            idle = [
+                tracked_id for tracked_id, tracked in self._tasks.items()
+                if not tracked.finished and not tracked.subscribers and now - tracked.updated_at > self.idle_seconds
+            ]
+            for tracked_id in idle:
+                del self._tasks[tracked_id]
+
+        progress = self._tasks.get(task_id)
+        if progress is None:
+            progress = self._tasks[task_id] = TaskProgress(task_id)
+        return progress
+
+    def publish(self, task_id: str, stage: str, **data: Any) -> Dict[str, Any]:
+        """
+        Publish a stage transition of a task (must be called on the event loop)
+
+        Args:
+            task_id: Task identifier
+            stage: Stage the task entered
+            **data: Partial results and details to include in the event
+
+        Returns:
+            The published event
+        """
+        progress = self._track(task_id)
+        event = progress.publish(stage, data)
+        if progress.finished:
+            asyncio.get_running_loop().call_later(self.retention_seconds, self._tasks.pop, task_id, None)
+        return event
+
+    def append_text(self, task_id: str, name: str, delta: str) -> None:
+        """
+        Stream a piece of text produced by a task (must be called on the event loop)
+
+        Args:
+            task_id: Task identifier
+            name: Stream name, e.g. "draft" or "final"
+            delta: Text to append
+        """
+        self._track(task_id).append_text(name, delta)
+
+    def get(self, task_id: str) -> Optional[TaskProgress]:
+        """
+        Get the progress of a task published in this process
+
+        Args:
+            task_id: Task identifier
+
+        Returns:
+            The task's progress, or None if it hasn't published anything here
+        """
+        return self._tasks.get(task_id)
@@ -0,0 +1,153 @@
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# A single byte range: "bytes=0-499", "bytes=500-" or "bytes=-500" (the last 500 bytes)
+SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _etag(stat_result: os.stat_result) -> str:
+    """Strong validator for a file version from its modification time and size"""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Whether an If-None-Match header lists the current ETag (weak comparison)"""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _if_range_matches(header: str, etag: str) -> bool:
+    """Whether an If-Range entity tag is the current ETag (strong comparison, RFC 9110 section 13.1.5)"""
+    # A weak validator never matches, so the client gets the whole file
+    return header.strip() == etag
+
+
+def _not_modified_since(header: str, stat_result: os.stat_result) -> bool:
+    """Whether the file hasn't changed since the date of an If-Modified-Since/If-Range header"""
+    try:
+        since = parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(stat_result.st_mtime) <= since
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a Range header into an inclusive (start, end) byte range
+
+    Returns:
+        The range, or None for headers that should be ignored (multiple ranges,
+        other units, malformed values)
+
+    Raises:
+        ValueError: If the range can't be satisfied for a file of this size
+    """
+    match = SINGLE_RANGE.match(header.strip())
+    if match is None or match.group(0) == "bytes=-":
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range starts beyond the end of the file")
+    return start, end
+
+
+async def _read_range(path: str, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+    """Stream bytes [start, end] of a file"""
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    chunk_size: int = 64 * 1024
+) -> Response:
+    """
+    Serve a file with support for conditional GETs and single byte-range requests
+
+    Args:
+        request: The incoming request
+        path: Path of the file to serve
+        media_type: Content type of the file
+        filename: Download filename for the Content-Disposition header
+        chunk_size: Number of bytes read at a time
+
+    Returns:
+        304 if the client's copy is current, 206 for a satisfiable Range,
+        416 for an unsatisfiable one, otherwise 200 with the whole file
+    """
+    stat_result = os.stat(path)
+    size = stat_result.st_size
+    etag = _etag(stat_result)
+    headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since is not None and _not_modified_since(if_modified_since, stat_result):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range is not None:
+        # Only honour the range if the client's partial copy is of this version
+        current = _if_range_matches(if_range, etag) if if_range.strip().startswith(('"', "W/")) else \
+            _not_modified_since(if_range, stat_result)
+        if not current:
+            range_header = None
+
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+
+        if byte_range is not None:
+            start, end = byte_range
+            headers.update({
+                "content-range": f"bytes {start}-{end}/{size}",
+                "content-length": str(end - start + 1),
+            })
+            if filename:
+                headers["content-disposition"] = f'attachment; filename="{filename}"'
+            return StreamingResponse(
+                _read_range(path, start, end, chunk_size),
+                status_code=206,
+                media_type=media_type,
+                headers=headers
+            )
+
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=stat_result)
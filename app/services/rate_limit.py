@@ -0,0 +1,64 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class AsyncRateLimiter:
+    """Async token bucket limiting how fast a resource can be consumed"""
+
+    def __init__(self, rate: float, per: float = 1.0, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Number of tokens added per period
+            per: Length of the period in seconds
+            capacity: Maximum burst size (defaults to rate)
+        """
+        self.rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last update"""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Wait until the requested number of tokens is available and consume them
+
+        Requests larger than the bucket capacity are allowed once the bucket is
+        full, so an oversized request can't block forever.
+
+        Args:
+            tokens: Number of tokens to consume
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # Waiters are served in FIFO order
+        async with self._lock:
+            needed = min(tokens, self.capacity)
+            self._refill()
+            while self._tokens < needed:
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def release(self, tokens: float) -> None:
+        """
+        Return unused tokens, e.g. when a reservation overestimated actual usage
+
+        Args:
+            tokens: Number of tokens to give back
+        """
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + tokens)
+
+    @property
+    def available(self) -> float:
+        """Number of tokens currently available"""
+        self._refill()
+        return self._tokens
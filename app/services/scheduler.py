@@ -0,0 +1,304 @@
+import asyncio
+import contextvars
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Set
+
+from app.services.job_queue import PRIORITIES, JobQueue, MemoryJobQueue
+
+
+# The job the current asyncio task is running, if any
+_current_job: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_job", default=None)
+
+
+class QueueFullError(Exception):
+    """Raised when a priority class has no room for more jobs"""
+
+    def __init__(self, priority: str, retry_after: int):
+        super().__init__(f"The {priority} job queue is full, retry in {retry_after} seconds")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """
+    Bounded priority queue of pipeline jobs run by a fixed number of workers
+
+    Jobs wait in per-priority queues with a maximum depth; workers always take
+    the oldest job of the most urgent class. Within a job, each pipeline stage
+    (download, extract, llm, audio) runs under its own concurrency limit.
+
+    Jobs name a registered handler rather than carrying the function itself,
+    so with a shared queue they can be submitted by one process (the API) and
+    run by another (python -m app.worker).
+    """
+
+    def __init__(
+        self,
+        workers: int = 16,
+        max_queued: Optional[Dict[str, int]] = None,
+        stage_limits: Optional[Dict[str, int]] = None,
+        on_start: Optional[Callable[[str, float], None]] = None,
+        queue: Optional[JobQueue] = None,
+        visibility_timeout: float = 3600
+    ):
+        """
+        Args:
+            workers: Maximum number of jobs running at once in this process
+            max_queued: Maximum number of waiting jobs per priority class (default 100)
+            stage_limits: Maximum concurrent executions per pipeline stage
+            on_start: Called on a worker thread with (job_id, seconds spent queued)
+                when a job starts, e.g. to record the wait in a database
+            queue: Where jobs wait (default: an in-process queue)
+            visibility_timeout: Seconds after which a job whose worker stopped
+                renewing its claim is run again (shared queues only); running
+                jobs renew their claim every third of it
+        """
+        self.queue = queue or MemoryJobQueue()
+        self.visibility_timeout = visibility_timeout
+        self.handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+        self.workers = workers
+        self.max_queued = {priority: 100 for priority in PRIORITIES}
+        self.max_queued.update(max_queued or {})
+        self.stage_limits = dict(stage_limits or {})
+        self._stages = {name: asyncio.Semaphore(limit) for name, limit in self.stage_limits.items()}
+        self._stage_active = {name: 0 for name in self.stage_limits}
+        self.on_start = on_start
+        self._dispatcher: Optional["asyncio.Task[None]"] = None
+        self._reaper: Optional["asyncio.Task[None]"] = None
+        self._jobs: Set["asyncio.Task[None]"] = set()
+        self._running = 0
+        # Recent queue waits and run times (seconds) for stats and Retry-After estimates
+        self._waits: Deque[float] = deque(maxlen=200)
+        self._durations: Deque[float] = deque(maxlen=200)
+
+    def register(self, *funcs: Callable[..., Awaitable[Any]]) -> None:
+        """
+        Allow coroutine functions to be run as jobs
+
+        Args:
+            *funcs: Job handlers, registered under their function names
+        """
+        for func in funcs:
+            self.handlers[func.__name__] = func
+
+    def start(self) -> None:
+        """Start taking jobs from the queue (must be called on the event loop)"""
+        if self._dispatcher is None and self.workers > 0:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+            if self.queue.shared:
+                self._reaper = asyncio.create_task(self._requeue_stale())
+
+    async def stop(self) -> None:
+        """Cancel running jobs; jobs in an in-process queue are dropped, shared queues get them back"""
+        tasks = [task for task in (self._dispatcher, self._reaper) if task is not None] + list(self._jobs)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._dispatcher = None
+        self._reaper = None
+
+    def _check_priority(self, priority: str) -> None:
+        """Reject unknown priority classes"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {', '.join(PRIORITIES)}")
+
+    def retry_after(self, priority: str) -> int:
+        """
+        Estimate how long until a job of this class would get a worker
+
+        Args:
+            priority: Priority class
+
+        Returns:
+            Estimated number of seconds
+        """
+        depth = self.queue.depth()
+        ahead = sum(depth[p] for p in PRIORITIES[:PRIORITIES.index(priority) + 1])
+        average_duration = sum(self._durations) / len(self._durations) if self._durations else 30.0
+        return max(1, math.ceil(ahead * average_duration / max(self.workers, 1)))
+
+    def ensure_capacity(self, priority: str, jobs: int = 1) -> None:
+        """
+        Check that a priority class can take more jobs, before doing any work for them
+
+        Args:
+            priority: Priority class
+            jobs: Number of jobs about to be submitted
+
+        Raises:
+            ValueError: If the priority class is unknown
+            QueueFullError: If the class doesn't have room for the jobs
+        """
+        self._check_priority(priority)
+        if self.queue.depth()[priority] + jobs > self.max_queued[priority]:
+            raise QueueFullError(priority, self.retry_after(priority))
+
+    def submit(
+        self,
+        job_id: str,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        priority: str = "interactive",
+        force: bool = False,
+        **kwargs: Any
+    ) -> None:
+        """
+        Queue a job
+
+        Args:
+            job_id: Identifier of the job (the task ID)
+            func: Registered coroutine function to run
+            *args: Positional arguments for the function (JSON-serializable for shared queues)
+            priority: Priority class
+            force: Queue the job even if the class is full (for jobs whose
+                capacity was already checked as part of a batch)
+            **kwargs: Keyword arguments for the function
+
+        Raises:
+            ValueError: If the priority class is unknown or func isn't registered
+            QueueFullError: If the class is full
+        """
+        if self.handlers.get(func.__name__) is not func:
+            raise ValueError(f"{func.__name__} is not a registered job handler")
+        if not force:
+            self.ensure_capacity(priority)
+        else:
+            self._check_priority(priority)
+
+        job = {
+            "job_id": job_id,
+            "priority": priority,
+            "name": func.__name__,
+            "args": list(args),
+            "kwargs": kwargs,
+            # Wall-clock time, comparable across processes and nodes
+            "enqueued_at": time.time()
+        }
+        self.queue.put(job)
+
+    async def _dispatch(self) -> None:
+        """Claim a job whenever a worker slot is free and run it"""
+        slots = asyncio.Semaphore(self.workers)
+        while True:
+            await slots.acquire()
+            # Only one claim is outstanding at a time, so a busy process leaves
+            # jobs in a shared queue for other workers
+            job = await self.queue.get(timeout=5)
+            if job is None:
+                slots.release()
+                continue
+            task = asyncio.create_task(self._run(job))
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        """Run one claimed job and acknowledge it"""
+        _current_job.set(job)
+        started_at = time.monotonic()
+        wait = max(0.0, time.time() - job["enqueued_at"])
+        self._waits.append(wait)
+        self._running += 1
+        heartbeat = asyncio.create_task(self._extend_lease(job)) if self.queue.shared else None
+        try:
+            func = self.handlers.get(job["name"])
+            if func is None:
+                raise ValueError(f"No handler registered for job type {job['name']}")
+            if self.on_start is not None:
+                await asyncio.to_thread(self.on_start, job["job_id"], wait)
+            await func(*job["args"], **job["kwargs"])
+        except asyncio.CancelledError:
+            # Shutting down: hand the unfinished job back rather than dropping it
+            self.queue.release(job)
+            raise
+        except Exception as e:
+            print(f"Error running job {job['job_id']}: {str(e)}")
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            self._running -= 1
+            self._durations.append(time.monotonic() - started_at)
+        # Failed jobs are acknowledged too: their task is already marked failed
+        self.queue.ack(job)
+
+    async def _extend_lease(self, job: Dict[str, Any]) -> None:
+        """Keep renewing the claim of a running job, so a long job isn't handed to a second worker"""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            try:
+                if not await asyncio.to_thread(self.queue.extend_lease, job):
+                    print(f"Lost the claim of job {job['job_id']}; another worker may run it too")
+                    return
+            except Exception as e:
+                print(f"Error extending the claim of job {job['job_id']}: {str(e)}")
+
+    async def _requeue_stale(self) -> None:
+        """Periodically hand jobs abandoned by crashed workers to another worker"""
+        while True:
+            await asyncio.sleep(min(60.0, self.visibility_timeout / 2))
+            try:
+                requeued = await asyncio.to_thread(self.queue.requeue_stale, self.visibility_timeout)
+                if requeued:
+                    print(f"Requeued {requeued} abandoned jobs")
+            except Exception as e:
+                print(f"Error requeueing abandoned jobs: {str(e)}")
+
+    def current_priority(self) -> Optional[str]:
+        """
+        Get the priority class of the job running in the current asyncio task
+
+        Returns:
+            Priority class, or None outside of a job
+        """
+        job = _current_job.get()
+        return job["priority"] if job is not None else None
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        """
+        Run a block of a job under the concurrency limit of a pipeline stage
+
+        Stages without a configured limit are not limited.
+
+        Args:
+            name: Stage name
+        """
+        semaphore = self._stages.get(name)
+        if semaphore is None:
+            yield
+            return
+
+        async with semaphore:
+            self._stage_active[name] += 1
+            try:
+                yield
+            finally:
+                self._stage_active[name] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get queue depth, wait times and stage usage
+
+        Depth covers the whole queue; the other figures cover the jobs run by
+        this process.
+
+        Returns:
+            Dictionary of scheduler statistics
+        """
+        return {
+            "backend": self.queue.name,
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self.queue.depth(),
+            "max_queued": dict(self.max_queued),
+            "average_wait_seconds": round(sum(self._waits) / len(self._waits), 3) if self._waits else 0.0,
+            "max_wait_seconds": round(max(self._waits), 3) if self._waits else 0.0,
+            "average_run_seconds": round(sum(self._durations) / len(self._durations), 3) if self._durations else 0.0,
+            "stages": {
+                name: {"active": self._stage_active[name], "limit": limit}
+                for name, limit in self.stage_limits.items()
+            }
+        }
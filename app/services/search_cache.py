@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class SearchCache:
+    """
+    TTL cache with an in-memory LRU tier and an optional on-disk tier
+
+    Disk entries are JSON files; values that aren't JSON types need a
+    serialize/deserialize pair. The disk tier is trimmed to max_disk_bytes by
+    removing the least recently used files (file mtimes track use, so the
+    order survives restarts and is shared by workers using the same directory).
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_entries: int = 256,
+        disk_dir: Optional[str] = None,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+        serialize: Optional[Callable[[Any], Any]] = None,
+        deserialize: Optional[Callable[[Any], Any]] = None
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.serialize = serialize or (lambda value: value)
+        self.deserialize = deserialize or (lambda data: data)
+        self._memory: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._scan_disk())
+
+    def _disk_path(self, key: Hashable) -> str:
+        """Path of the on-disk entry for a key"""
+        digest = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.json")
+
+    def get(self, key: Hashable, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Look up a value, checking memory first and then disk
+
+        Args:
+            key: Cache key (must have a stable repr)
+            accept: Optional check that the cached value can serve this lookup;
+                rejected values are counted as misses
+
+        Returns:
+            The cached value, or None if missing, expired or rejected
+        """
+        entry = self._get_memory(key)
+        if entry is None:
+            entry = self._load_disk(key)
+        return self._finish_lookup(entry, accept)
+
+    async def get_async(self, key: Hashable, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Look up a value without blocking the event loop on disk reads
+
+        Args:
+            key: Cache key (must have a stable repr)
+            accept: Optional check that the cached value can serve this lookup
+
+        Returns:
+            The cached value, or None if missing, expired or rejected
+        """
+        entry = self._get_memory(key)
+        if entry is None and self.disk_dir:
+            entry = await asyncio.to_thread(self._load_disk, key)
+        return self._finish_lookup(entry, accept)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value in both tiers
+
+        Args:
+            key: Cache key (must have a stable repr)
+            value: Value to cache (JSON serializable after serialize)
+        """
+        self.set_many([(key, value)])
+
+    def set_many(self, items: Iterable[Tuple[Hashable, Any]]) -> None:
+        """
+        Store several values in both tiers
+
+        Args:
+            items: (key, value) pairs
+        """
+        entries = self._store_many(items)
+        if self.disk_dir:
+            self._write_disk(entries)
+
+    async def set_many_async(self, items: Iterable[Tuple[Hashable, Any]]) -> None:
+        """
+        Store several values without blocking the event loop on disk writes
+
+        Args:
+            items: (key, value) pairs
+        """
+        entries = self._store_many(items)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, entries)
+
+    def _get_memory(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """Look up an unexpired entry in the memory tier"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _finish_lookup(self, entry: Optional[Tuple[float, Any]], accept: Optional[Callable[[Any], bool]]) -> Optional[Any]:
+        """Count a lookup as a hit or miss and return the value on a hit"""
+        with self._lock:
+            if entry is not None and (accept is None or accept(entry[1])):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def _store_many(self, items: Iterable[Tuple[Hashable, Any]]) -> Dict[Hashable, Tuple[float, Any]]:
+        """Insert values into the memory tier and return their entries"""
+        expires_at = time.time() + self.ttl_seconds
+        entries = {key: (expires_at, value) for key, value in items}
+        with self._lock:
+            for key, entry in entries.items():
+                self._store_memory(key, entry)
+        return entries
+
+    def _store_memory(self, key: Hashable, entry: Tuple[float, Any]) -> None:
+        """Insert into the LRU tier, evicting the least recently used entries (lock must be held)"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load_disk(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        """Read an entry from the disk tier and promote it to the memory tier"""
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(f.read())
+            entry = (data["expires_at"], self.deserialize(data["value"]))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading search cache entry: {str(e)}")
+            self._remove_disk(path)
+            return None
+
+        if entry[0] <= time.time():
+            self._remove_disk(path)
+            return None
+
+        try:
+            # Mark the file as recently used for disk eviction
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._store_memory(key, entry)
+        return entry
+
+    def _write_disk(self, entries: Dict[Hashable, Tuple[float, Any]]) -> None:
+        """Write entries to the disk tier, then trim it to max_disk_bytes"""
+        written = 0
+        for key, (expires_at, value) in entries.items():
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                data = json.dumps(
+                    {"expires_at": expires_at, "value": self.serialize(value)},
+                    separators=(",", ":")
+                ).encode("utf-8")
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                written += len(data)
+            except Exception as e:
+                print(f"Error writing search cache entry: {str(e)}")
+                self._remove_disk(tmp_path)
+
+        with self._disk_lock:
+            self._disk_bytes += written
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _scan_disk(self) -> List[Tuple[float, int, str]]:
+        """List (mtime, size, path) of the disk tier's entries"""
+        files = []
+        with os.scandir(self.disk_dir) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = dir_entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+        return files
+
+    def _evict_disk(self) -> int:
+        """
+        Remove the least recently used disk entries until the tier fits in max_disk_bytes
+
+        The directory is rescanned, so entries written by other workers count
+        too (disk lock must be held).
+
+        Returns:
+            Number of evicted entries
+        """
+        files = sorted(self._scan_disk())
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            self._remove_disk(path)
+            total -= size
+            evicted += 1
+        self._disk_bytes = total
+        return evicted
+
+    @staticmethod
+    def _remove_disk(path: str) -> None:
+        """Remove a disk entry, ignoring entries that are already gone"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache size and hit/miss counters
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "disk_tier": bool(self.disk_dir),
+            "disk_bytes": self._disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes
+        }
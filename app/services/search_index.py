@@ -0,0 +1,243 @@
+import re
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from app.models.paper import PaperSummary
+from app.services.classification import EMBEDDING_DIM, embed_text
+from app.services.storage import SqliteDatabase, SqliteStore
+
+# Query words, searched as quoted FTS5 terms so user input can't break the query syntax
+QUERY_TERM_PATTERN = re.compile(r"\w+")
+
+# BM25 weights of the title, authors, summary and key findings columns
+COLUMN_WEIGHTS = (4.0, 2.0, 1.0, 1.5)
+
+
+class SummarySearchIndex(SqliteDatabase):
+    """
+    Full-text and embedding search over stored summaries
+
+    Titles, authors, summaries and key findings are indexed with SQLite FTS5
+    and ranked by BM25. With embeddings enabled, each summary also gets a
+    hashed n-gram embedding, and semantic queries rank summaries by cosine
+    similarity over an in-memory matrix that is extended with newly indexed
+    summaries, including ones indexed by other workers.
+    """
+
+    def __init__(self, db_path: str, embeddings: bool = True):
+        """
+        Args:
+            db_path: SQLite database file
+            embeddings: Whether to maintain the embedding index for semantic search
+        """
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._loaded_rowid = 0
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS summary_search USING fts5(
+                title, authors, summary, key_findings,
+                tokenize = 'porter unicode61'
+            );
+
+            CREATE TABLE IF NOT EXISTS summary_search_docs (
+                summary_id TEXT PRIMARY KEY,
+                search_rowid INTEGER NOT NULL,
+                vector BLOB,
+                indexed_at REAL NOT NULL
+            );
+        """)
+
+    def index(self, summary_id: str, paper_summary: PaperSummary) -> None:
+        """
+        Add a summary to the index, replacing an earlier version
+
+        Args:
+            summary_id: Summary identifier
+            paper_summary: The stored summary
+        """
+        metadata = paper_summary.metadata
+        fields = (
+            metadata.title,
+            "; ".join(metadata.authors),
+            paper_summary.summary,
+            "\n".join(paper_summary.key_findings)
+        )
+        vector = None
+        if self.embeddings:
+            vector = embed_text(" ".join(fields)).astype(np.float32).tobytes()
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT search_rowid FROM summary_search_docs WHERE summary_id = ?", (summary_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM summary_search WHERE rowid = ?", (row["search_rowid"],))
+            search_rowid = conn.execute(
+                "INSERT INTO summary_search (title, authors, summary, key_findings) VALUES (?, ?, ?, ?)",
+                fields
+            ).lastrowid
+            # Replacing gives the document a new rowid, so other workers pick the new vector up
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_search_docs (summary_id, search_rowid, vector, indexed_at) VALUES (?, ?, ?, ?)",
+                (summary_id, search_rowid, vector, time.time())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sync(self, store: SqliteStore) -> int:
+        """
+        Index stored summaries that are missing from the index, e.g. ones written
+        before the index existed
+
+        Args:
+            store: Store holding the summaries
+
+        Returns:
+            Number of summaries indexed
+        """
+        indexed = {
+            row["summary_id"] for row in self._connect().execute("SELECT summary_id FROM summary_search_docs")
+        }
+        count = 0
+        for summary_id in store.summary_ids():
+            if summary_id in indexed:
+                continue
+            paper_summary = store.get_summary(summary_id)
+            if paper_summary is not None:
+                self.index(summary_id, paper_summary)
+                count += 1
+        return count
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find summaries containing all words of a query, best BM25 match first
+
+        Args:
+            query: Search words (the last one also matches as a prefix)
+            limit: Maximum number of results
+
+        Returns:
+            Results with summary_id, title, authors, score and a highlighted snippet
+        """
+        terms = QUERY_TERM_PATTERN.findall(query)
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+
+        rows = self._connect().execute(
+            f"""
+            SELECT docs.summary_id, summary_search.title, summary_search.authors,
+                   bm25(summary_search, {", ".join(str(weight) for weight in COLUMN_WEIGHTS)}) AS rank,
+                   snippet(summary_search, -1, '[', ']', '...', 16) AS snippet
+            FROM summary_search
+            JOIN summary_search_docs AS docs ON docs.search_rowid = summary_search.rowid
+            WHERE summary_search MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            """,
+            (match, limit)
+        ).fetchall()
+        return [
+            {
+                "summary_id": row["summary_id"],
+                "title": row["title"],
+                "authors": [author for author in row["authors"].split("; ") if author],
+                # bm25() is lower for better matches
+                "score": round(-row["rank"], 4),
+                "snippet": row["snippet"]
+            }
+            for row in rows
+        ]
+
+    def _refresh_vectors(self) -> None:
+        """Load the vectors indexed since the last refresh into the in-memory matrix"""
+        rows = self._connect().execute(
+            "SELECT rowid, summary_id, vector FROM summary_search_docs WHERE rowid > ? AND vector IS NOT NULL ORDER BY rowid",
+            (self._loaded_rowid,)
+        ).fetchall()
+        if not rows:
+            return
+
+        added = []
+        for row in rows:
+            vector = np.frombuffer(row["vector"], dtype=np.float32)
+            position = self._positions.get(row["summary_id"])
+            if position is not None:
+                self._matrix[position] = vector
+            else:
+                self._positions[row["summary_id"]] = len(self._ids) + len(added)
+                added.append((row["summary_id"], vector))
+            self._loaded_rowid = row["rowid"]
+        if added:
+            self._ids.extend(summary_id for summary_id, _ in added)
+            self._matrix = np.vstack([self._matrix, np.stack([vector for _, vector in added])])
+
+    def search_semantic(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Find the summaries most similar to a query by embedding cosine similarity
+
+        Args:
+            query: Free-text query
+            limit: Maximum number of results
+
+        Returns:
+            Results with summary_id, title, authors and score (cosine similarity)
+
+        Raises:
+            ValueError: If the embedding index is disabled
+        """
+        if not self.embeddings:
+            raise ValueError("Semantic search is disabled (SEARCH_EMBEDDINGS=false)")
+        query_vector = embed_text(query)
+        if not query_vector.any():
+            return []
+
+        with self._lock:
+            self._refresh_vectors()
+            if not self._ids:
+                return []
+            similarity = self._matrix @ query_vector
+            ids = self._ids
+
+        top = np.argpartition(-similarity, min(limit, len(ids)) - 1)[:limit]
+        top = top[np.argsort(-similarity[top])]
+        best = [(ids[position], float(similarity[position])) for position in top if similarity[position] > 0]
+        if not best:
+            return []
+
+        placeholders = ", ".join("?" for _ in best)
+        rows = self._connect().execute(
+            f"""
+            SELECT docs.summary_id, summary_search.title, summary_search.authors
+            FROM summary_search_docs AS docs
+            JOIN summary_search ON summary_search.rowid = docs.search_rowid
+            WHERE docs.summary_id IN ({placeholders})
+            """,
+            [summary_id for summary_id, _ in best]
+        ).fetchall()
+        documents = {row["summary_id"]: row for row in rows}
+        return [
+            {
+                "summary_id": summary_id,
+                "title": documents[summary_id]["title"],
+                "authors": [author for author in documents[summary_id]["authors"].split("; ") if author],
+                "score": round(score, 4),
+                "snippet": None
+            }
+            for summary_id, score in best
+            if summary_id in documents
+        ]
@@ -0,0 +1,379 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.paper import PaperSummary
+
+
+def _json_default(value: Any) -> Any:
+    """Serialize values the json module doesn't handle natively"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class SqliteDatabase(abc.ABC):
+    """Base class for components that keep their tables in a shared SQLite file"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the SQLite connection for the current thread
+
+        Returns:
+            A connection configured for concurrent access from several processes
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            # WAL lets readers in other workers proceed while one worker writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    @abc.abstractmethod
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+
+
+class SqliteStore(SqliteDatabase):
+    """Persistent store for processing tasks and paper summaries backed by SQLite"""
+
+    # Task fields stored in their own (indexable) columns; anything else goes in the data blob
+    TASK_COLUMNS = (
+        "status", "message", "source", "doi", "url", "file_path",
+        "summary_id", "summary_file_path", "created_at", "updated_at"
+    )
+
+    def __init__(self, db_path: str, summaries_dir: str = "outputs/summaries"):
+        self.summaries_dir = summaries_dir
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                message TEXT,
+                source TEXT,
+                doi TEXT,
+                url TEXT,
+                file_path TEXT,
+                summary_id TEXT,
+                summary_file_path TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                data TEXT NOT NULL DEFAULT '{}'
+            );
+            CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+            CREATE INDEX IF NOT EXISTS idx_tasks_source ON tasks(source);
+            CREATE INDEX IF NOT EXISTS idx_tasks_doi ON tasks(doi);
+            CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at);
+
+            CREATE TABLE IF NOT EXISTS summaries (
+                summary_id TEXT PRIMARY KEY,
+                paper_id TEXT NOT NULL,
+                title TEXT,
+                source TEXT,
+                doi TEXT,
+                url TEXT,
+                audio_file_path TEXT,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_summaries_source ON summaries(source);
+            CREATE INDEX IF NOT EXISTS idx_summaries_doi ON summaries(doi);
+            CREATE INDEX IF NOT EXISTS idx_summaries_created_at ON summaries(created_at);
+
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+        """)
+
+    def _split_task_fields(self, fields: Dict[str, Any]):
+        """Separate column-backed task fields from the ones stored in the data blob"""
+        columns = {k: v for k, v in fields.items() if k in self.TASK_COLUMNS}
+        extra = {k: v for k, v in fields.items() if k not in self.TASK_COLUMNS}
+        return columns, extra
+
+    def create_task(self, task_id: str, status: str = "pending", **fields: Any) -> None:
+        """
+        Create a new processing task
+
+        Args:
+            task_id: Unique task identifier
+            status: Initial task status
+            **fields: Additional task fields (source, doi, url, file_path, ...)
+        """
+        now = datetime.now().isoformat()
+        columns, extra = self._split_task_fields(fields)
+        columns.update({"status": status, "created_at": now, "updated_at": now})
+
+        names = ["task_id", *columns.keys(), "data"]
+        values = [task_id, *columns.values(), json.dumps(extra, default=_json_default)]
+        placeholders = ", ".join("?" for _ in names)
+        self._connect().execute(
+            f"INSERT INTO tasks ({', '.join(names)}) VALUES ({placeholders})",
+            values
+        )
+
+    def update_task(self, task_id: str, **fields: Any) -> None:
+        """
+        Update fields of an existing task
+
+        Args:
+            task_id: Task identifier
+            **fields: Fields to set; unknown fields are merged into the task's data blob
+        """
+        columns, extra = self._split_task_fields(fields)
+        columns["updated_at"] = datetime.now().isoformat()
+
+        assignments = [f"{name} = ?" for name in columns]
+        values = list(columns.values())
+        if extra:
+            assignments.append("data = json_patch(data, ?)")
+            values.append(json.dumps(extra, default=_json_default))
+        values.append(task_id)
+
+        self._connect().execute(
+            f"UPDATE tasks SET {', '.join(assignments)} WHERE task_id = ?",
+            values
+        )
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a task by its ID
+
+        Args:
+            task_id: Task identifier
+
+        Returns:
+            Dictionary of task fields or None if not found
+        """
+        row = self._connect().execute(
+            "SELECT * FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._task_from_row(row)
+
+    def list_tasks(self, status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        List the most recent tasks, optionally filtered by status
+
+        Args:
+            status: Only return tasks with this status
+            limit: Maximum number of tasks to return
+
+        Returns:
+            List of task dictionaries, newest first
+        """
+        if status:
+            rows = self._connect().execute(
+                "SELECT * FROM tasks WHERE status = ? ORDER BY created_at DESC LIMIT ?",
+                (status, limit)
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT * FROM tasks ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._task_from_row(row) for row in rows]
+
+    def get_tasks(self, task_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Retrieve several tasks at once
+
+        Args:
+            task_ids: Task identifiers
+
+        Returns:
+            Dictionary of task fields by task ID, for the tasks that exist
+        """
+        tasks = {}
+        conn = self._connect()
+        # Stay well below SQLite's limit on the number of bound parameters
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            rows = conn.execute(
+                f"SELECT * FROM tasks WHERE task_id IN ({', '.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            for row in rows:
+                tasks[row["task_id"]] = self._task_from_row(row)
+        return tasks
+
+    def create_batch(self, batch_id: str, items: List[Dict[str, Any]], **fields: Any) -> None:
+        """
+        Record a batch of tasks submitted together
+
+        Args:
+            batch_id: Unique batch identifier
+            items: One dictionary per item, each with at least a task_id
+            **fields: Additional batch fields (priority, topics, ...)
+        """
+        self._connect().execute(
+            "INSERT INTO batches (batch_id, created_at, data) VALUES (?, ?, ?)",
+            (batch_id, datetime.now().isoformat(), json.dumps({**fields, "items": items}, default=_json_default))
+        )
+
+    def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retrieve a batch by its ID
+
+        Args:
+            batch_id: Batch identifier
+
+        Returns:
+            Dictionary of batch fields (including items) or None if not found
+        """
+        row = self._connect().execute(
+            "SELECT * FROM batches WHERE batch_id = ?", (batch_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"batch_id": row["batch_id"], "created_at": row["created_at"], **json.loads(row["data"])}
+
+    def _task_from_row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a tasks row into a flat dictionary"""
+        task = {key: row[key] for key in row.keys() if key != "data"}
+        task.update(json.loads(row["data"]))
+        return task
+
+    def save_summary(self, summary_id: str, paper_summary: PaperSummary) -> None:
+        """
+        Insert or replace a paper summary
+
+        Args:
+            summary_id: Summary identifier
+            paper_summary: The summary to store
+        """
+        metadata = paper_summary.metadata
+        self._connect().execute(
+            """
+            INSERT OR REPLACE INTO summaries
+                (summary_id, paper_id, title, source, doi, url, audio_file_path, created_at, data)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                summary_id,
+                paper_summary.paper_id,
+                metadata.title,
+                metadata.source,
+                metadata.doi,
+                metadata.url,
+                paper_summary.audio_file_path,
+                paper_summary.created_at.isoformat(),
+                json.dumps(paper_summary.dict(), default=_json_default)
+            )
+        )
+
+    def set_summary_audio(self, summary_id: str, audio_file_path: str) -> None:
+        """
+        Attach a generated audio file to an existing summary
+
+        Args:
+            summary_id: Summary identifier
+            audio_file_path: Path of the generated audio file
+        """
+        self._connect().execute(
+            """
+            UPDATE summaries
+            SET audio_file_path = ?, data = json_set(data, '$.audio_file_path', ?)
+            WHERE summary_id = ?
+            """,
+            (audio_file_path, audio_file_path, summary_id)
+        )
+
+    def get_summary(self, summary_id: str) -> Optional[PaperSummary]:
+        """
+        Load a paper summary, falling back to its JSON file on disk
+
+        Args:
+            summary_id: Summary identifier
+
+        Returns:
+            The paper summary or None if not found
+        """
+        row = self._connect().execute(
+            "SELECT data FROM summaries WHERE summary_id = ?", (summary_id,)
+        ).fetchone()
+        if row is not None:
+            return PaperSummary(**json.loads(row["data"]))
+
+        # Summaries written before the database existed only live on disk
+        summary_file_path = os.path.join(self.summaries_dir, f"{summary_id}.json")
+        if not os.path.exists(summary_file_path):
+            return None
+
+        try:
+            with open(summary_file_path, "r") as f:
+                paper_summary = PaperSummary(**json.load(f))
+        except Exception as e:
+            print(f"Error loading summary file {summary_file_path}: {str(e)}")
+            return None
+
+        self.save_summary(summary_id, paper_summary)
+        return paper_summary
+
+    def summary_ids(self) -> List[str]:
+        """
+        List the IDs of all summaries in the database
+
+        Returns:
+            Summary identifiers, oldest first
+        """
+        rows = self._connect().execute("SELECT summary_id FROM summaries ORDER BY created_at").fetchall()
+        return [row["summary_id"] for row in rows]
+
+    def has_summary(self, summary_id: str) -> bool:
+        """
+        Check whether a summary exists without loading it
+
+        Args:
+            summary_id: Summary identifier
+
+        Returns:
+            True if the summary is in the database or on disk
+        """
+        row = self._connect().execute(
+            "SELECT 1 FROM summaries WHERE summary_id = ?", (summary_id,)
+        ).fetchone()
+        if row is not None:
+            return True
+        return os.path.exists(os.path.join(self.summaries_dir, f"{summary_id}.json"))
+
+
+def create_store(database_url: Optional[str] = None) -> SqliteStore:
+    """
+    Create the storage backend configured by DATABASE_URL
+
+    Args:
+        database_url: Backend URL, e.g. sqlite:///outputs/papers.db
+
+    Returns:
+        Storage backend instance
+    """
+    database_url = database_url or os.environ.get("DATABASE_URL", "sqlite:///outputs/papers.db")
+
+    if database_url.startswith("sqlite:///"):
+        return SqliteStore(database_url[len("sqlite:///"):])
+
+    raise ValueError(f"Unsupported storage backend: {database_url}")
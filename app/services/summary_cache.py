@@ -0,0 +1,317 @@
+import hashlib
+import re
+import time
+from typing import Any, BinaryIO, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse, urlunparse
+
+from app.services.storage import SqliteDatabase
+
+# Matches new-style (2304.02924) and old-style (hep-th/9901001) arXiv identifiers
+ARXIV_ID_PATTERN = r"(\d{4}\.\d{4,5}|[a-z\-]+(?:\.[a-z]{2})?/\d{7})(?:v\d+)?"
+
+
+def hash_stream(source: BinaryIO, sink: Optional[BinaryIO] = None, chunk_size: int = 1024 * 1024) -> Tuple[str, int]:
+    """
+    Compute the SHA-256 of a binary stream, optionally copying it to another stream
+
+    Args:
+        source: Stream to read from
+        sink: Optional stream the data is copied to while hashing
+        chunk_size: Number of bytes read at a time
+
+    Returns:
+        Tuple of (hex digest, number of bytes read)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+        if sink is not None:
+            sink.write(chunk)
+    return digest.hexdigest(), size
+
+
+def hash_file(file_path: str) -> Tuple[str, int]:
+    """
+    Compute the SHA-256 of a file on disk
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Tuple of (hex digest, file size in bytes)
+    """
+    with open(file_path, "rb") as f:
+        return hash_stream(f)
+
+
+def normalize_doi(doi: str) -> str:
+    """
+    Normalize a DOI (or DOI URL) into a cache alias
+
+    arXiv DOIs (10.48550/arXiv.<id>) map to the same alias as arXiv URLs, so a
+    paper submitted once by URL and once by DOI is recognised as the same paper.
+
+    Args:
+        doi: DOI string, "doi:" prefixed DOI or doi.org URL
+
+    Returns:
+        Normalized alias string
+    """
+    doi = doi.strip().lower()
+    doi = re.sub(r"^(https?://)?(dx\.)?doi\.org/", "", doi)
+    if doi.startswith("doi:"):
+        doi = doi[4:].strip()
+
+    arxiv_match = re.fullmatch(r"10\.48550/arxiv\." + ARXIV_ID_PATTERN, doi)
+    if arxiv_match:
+        return f"arxiv:{arxiv_match.group(1)}"
+
+    return f"doi:{doi}"
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a paper URL into a cache alias
+
+    arXiv abstract and PDF links (with or without a version suffix) collapse to
+    the same "arxiv:<id>" alias; doi.org links are treated as DOIs.
+
+    Args:
+        url: URL of the paper
+
+    Returns:
+        Normalized alias string
+    """
+    url = url.strip()
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    if host == "doi.org" or host.endswith(".doi.org"):
+        return normalize_doi(parsed.path.lstrip("/"))
+
+    if host in ("arxiv.org", "export.arxiv.org"):
+        arxiv_match = re.fullmatch(r"/(?:abs|pdf)/" + ARXIV_ID_PATTERN + r"(?:\.pdf)?/?", parsed.path.lower())
+        if arxiv_match:
+            return f"arxiv:{arxiv_match.group(1)}"
+
+    path = parsed.path.rstrip("/") or "/"
+    return "url:" + urlunparse((parsed.scheme.lower(), host, path, "", parsed.query, ""))
+
+
+class SummaryCache(SqliteDatabase):
+    """Content-addressed cache mapping PDF hashes and DOI/URL aliases to finished summaries"""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 10000,
+        max_age_seconds: float = 30 * 24 * 3600
+    ):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS content_cache (
+                content_hash TEXT PRIMARY KEY,
+                summary_id TEXT NOT NULL,
+                size_bytes INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_content_cache_last_used ON content_cache(last_used_at);
+            CREATE INDEX IF NOT EXISTS idx_content_cache_created_at ON content_cache(created_at);
+
+            CREATE TABLE IF NOT EXISTS content_aliases (
+                alias TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_content_aliases_hash ON content_aliases(content_hash);
+
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+
+    def _increment(self, counter: str) -> None:
+        """Increment a shared hit/miss counter"""
+        self._connect().execute(
+            """
+            INSERT INTO cache_stats (name, value) VALUES (?, 1)
+            ON CONFLICT(name) DO UPDATE SET value = value + 1
+            """,
+            (counter,)
+        )
+
+    def lookup_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Look up the summary produced for a PDF with the given hash
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+
+        Returns:
+            Summary ID on a hit, otherwise None
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT summary_id, created_at FROM content_cache WHERE content_hash = ?",
+            (content_hash,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or now - row["created_at"] > self.max_age_seconds:
+            self._increment("summary_misses")
+            return None
+
+        conn.execute(
+            "UPDATE content_cache SET last_used_at = ?, hits = hits + 1 WHERE content_hash = ?",
+            (now, content_hash)
+        )
+        self._increment("summary_hits")
+        return row["summary_id"]
+
+    def lookup_alias(self, alias: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a cached summary through a normalized DOI/URL alias
+
+        Only hits are counted here: a miss falls through to a hash lookup once
+        the PDF has been downloaded, which records the miss.
+
+        Args:
+            alias: Alias from normalize_doi or normalize_url
+
+        Returns:
+            Tuple of (content hash, summary ID) on a hit, otherwise None
+        """
+        row = self._connect().execute(
+            "SELECT content_hash FROM content_aliases WHERE alias = ?", (alias,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        summary_id = self.lookup_hash(row["content_hash"])
+        if summary_id is None:
+            return None
+        return row["content_hash"], summary_id
+
+    def put(
+        self,
+        content_hash: str,
+        summary_id: str,
+        size_bytes: int = 0,
+        aliases: Iterable[str] = ()
+    ) -> None:
+        """
+        Remember the summary produced for a PDF
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+            summary_id: ID of the finished summary
+            size_bytes: Size of the PDF in bytes
+            aliases: Normalized DOI/URL aliases that resolve to this PDF
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO content_cache
+                (content_hash, summary_id, size_bytes, created_at, last_used_at, hits)
+            VALUES (?, ?, ?, ?, ?, 0)
+            """,
+            (content_hash, summary_id, size_bytes, now, now)
+        )
+        self.add_aliases(content_hash, aliases)
+        self.evict()
+
+    def add_aliases(self, content_hash: str, aliases: Iterable[str]) -> None:
+        """
+        Point DOI/URL aliases at a cached PDF
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+            aliases: Normalized aliases
+        """
+        self._connect().executemany(
+            "INSERT OR REPLACE INTO content_aliases (alias, content_hash) VALUES (?, ?)",
+            [(alias, content_hash) for alias in aliases if alias]
+        )
+
+    def invalidate(self, content_hash: str) -> None:
+        """
+        Drop a cache entry, e.g. when its summary no longer exists
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+        """
+        conn = self._connect()
+        conn.execute("DELETE FROM content_cache WHERE content_hash = ?", (content_hash,))
+        conn.execute("DELETE FROM content_aliases WHERE content_hash = ?", (content_hash,))
+
+    def evict(self) -> int:
+        """
+        Remove entries older than max_age_seconds and the least recently used
+        entries beyond max_entries
+
+        Returns:
+            Number of evicted entries
+        """
+        conn = self._connect()
+        expired = conn.execute(
+            "DELETE FROM content_cache WHERE created_at < ?",
+            (time.time() - self.max_age_seconds,)
+        ).rowcount
+        overflow = conn.execute(
+            """
+            DELETE FROM content_cache WHERE content_hash IN (
+                SELECT content_hash FROM content_cache
+                ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        ).rowcount
+
+        evicted = expired + overflow
+        if evicted:
+            conn.execute(
+                "DELETE FROM content_aliases WHERE content_hash NOT IN (SELECT content_hash FROM content_cache)"
+            )
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache size and hit/miss counters
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        conn = self._connect()
+        counters = {
+            row["name"]: row["value"]
+            for row in conn.execute("SELECT name, value FROM cache_stats WHERE name LIKE 'summary_%'")
+        }
+        size = conn.execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(size_bytes), 0) AS size_bytes FROM content_cache"
+        ).fetchone()
+
+        hits = counters.get("summary_hits", 0)
+        misses = counters.get("summary_misses", 0)
+        lookups = hits + misses
+        return {
+            "entries": size["entries"],
+            "size_bytes": size["size_bytes"],
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
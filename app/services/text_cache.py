@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from app.services.storage import SqliteDatabase
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib (deflate, as used by gzip) is always available
+    zstandard = None
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    """Compress one page with the given codec"""
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    """Decompress one page with the given codec"""
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+class TextCache(SqliteDatabase):
+    """
+    Persistent cache of extracted PDF text keyed by the PDF's content hash
+
+    Each page is compressed separately and appended to one file per PDF; the
+    byte offset and length of every page are indexed in SQLite, so a range of
+    pages can be read without decompressing the rest of the document.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_dir: str = "outputs/text_cache",
+        max_bytes: int = 512 * 1024 * 1024,
+        codec: Optional[str] = None
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.codec = codec or ("zstd" if zstandard is not None else "zlib")
+        if self.codec == "zstd" and zstandard is None:
+            raise ValueError("The zstd codec requires the zstandard package")
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        super().__init__(db_path)
+
+    def _init_schema(self) -> None:
+        """Create tables and indexes if they don't exist yet"""
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS extracted_text (
+                content_hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                page_offsets TEXT NOT NULL,
+                complete INTEGER NOT NULL,
+                chars INTEGER NOT NULL,
+                size_bytes INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_extracted_text_last_used ON extracted_text(last_used_at);
+        """)
+
+    def _path(self, content_hash: str) -> str:
+        """Path of the page data file for a PDF"""
+        return os.path.join(self.cache_dir, f"{content_hash}.pages")
+
+    def get_pages(
+        self,
+        content_hash: str,
+        start: int = 0,
+        stop: Optional[int] = None,
+        min_chars: Optional[int] = None
+    ) -> Optional[List[str]]:
+        """
+        Read cached page texts for pages [start, stop)
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+            start: Index of the first page
+            stop: Index after the last page (defaults to the last cached page)
+            min_chars: For partially cached documents, only serve the entry if at
+                least this many characters were extracted
+
+        Returns:
+            Page texts in page order, or None if the range isn't cached
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT codec, page_offsets, complete, chars FROM extracted_text WHERE content_hash = ?",
+            (content_hash,)
+        ).fetchone()
+
+        offsets = json.loads(row["page_offsets"]) if row is not None else []
+        covered = row is not None and (
+            row["complete"] or (
+                (stop is None or stop <= len(offsets)) and (min_chars is None or row["chars"] >= min_chars)
+            )
+        )
+        if not covered:
+            self.misses += 1
+            return None
+
+        selected = offsets[start:stop]
+        pages = []
+        try:
+            if selected:
+                with open(self._path(content_hash), "rb") as f:
+                    first_offset = selected[0][0]
+                    f.seek(first_offset)
+                    data = f.read(selected[-1][0] + selected[-1][1] - first_offset)
+                for offset, length in selected:
+                    chunk = data[offset - first_offset:offset - first_offset + length]
+                    pages.append(_decompress(row["codec"], chunk).decode("utf-8"))
+        except (OSError, zlib.error, ValueError) as e:
+            # Missing or damaged data file: drop the entry so it gets re-extracted
+            print(f"Error reading text cache entry: {str(e)}")
+            self.invalidate(content_hash)
+            self.misses += 1
+            return None
+
+        conn.execute(
+            "UPDATE extracted_text SET last_used_at = ? WHERE content_hash = ?",
+            (time.time(), content_hash)
+        )
+        self.hits += 1
+        return pages
+
+    def put(self, content_hash: str, pages: List[str], complete: bool) -> None:
+        """
+        Store the extracted page texts of a PDF
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+            pages: Page texts in page order, starting at the first page
+            complete: Whether pages covers the whole document (False when
+                extraction stopped at a text budget)
+        """
+        offsets = []
+        offset = 0
+        path = self._path(content_hash)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                for page_text in pages:
+                    chunk = _compress(self.codec, page_text.encode("utf-8"))
+                    f.write(chunk)
+                    offsets.append([offset, len(chunk)])
+                    offset += len(chunk)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing text cache entry: {str(e)}")
+            return
+
+        now = time.time()
+        self._connect().execute(
+            """
+            INSERT OR REPLACE INTO extracted_text
+                (content_hash, codec, page_offsets, complete, chars, size_bytes, created_at, last_used_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                content_hash, self.codec, json.dumps(offsets), int(complete),
+                sum(len(page_text) + 2 for page_text in pages), offset, now, now
+            )
+        )
+        self.evict()
+
+    def invalidate(self, content_hash: str) -> None:
+        """
+        Remove the cached text of a PDF
+
+        Args:
+            content_hash: SHA-256 of the PDF bytes
+        """
+        self._connect().execute("DELETE FROM extracted_text WHERE content_hash = ?", (content_hash,))
+        try:
+            os.remove(self._path(content_hash))
+        except OSError:
+            pass
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used entries until the cache fits in max_bytes
+
+        Returns:
+            Number of evicted entries
+        """
+        conn = self._connect()
+        rows = conn.execute(
+            """
+            SELECT content_hash FROM (
+                SELECT content_hash, last_used_at,
+                       SUM(size_bytes) OVER (ORDER BY last_used_at DESC, content_hash) AS cumulative_bytes
+                FROM extracted_text
+            )
+            WHERE cumulative_bytes > ?
+            """,
+            (self.max_bytes,)
+        ).fetchall()
+
+        for row in rows:
+            self.invalidate(row["content_hash"])
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache size and hit/miss counters for this process
+
+        Returns:
+            Dictionary of cache statistics
+        """
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS entries, COALESCE(SUM(size_bytes), 0) AS size_bytes, "
+            "COALESCE(SUM(chars), 0) AS chars FROM extracted_text"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": row["entries"],
+            "size_bytes": row["size_bytes"],
+            "max_bytes": self.max_bytes,
+            "compression_ratio": row["chars"] / row["size_bytes"] if row["size_bytes"] else 0.0,
+            "codec": self.codec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,123 @@
+import re
+from typing import List
+
+# Section headings commonly found in papers, either numbered ("3.1 Results")
+# or one of the standard section names on a line of their own
+NUMBERED_HEADING = re.compile(r"^(?:\d+(?:\.\d+)*|[IVX]+)\.?\s+[A-Z][^\n]{0,80}$")
+NAMED_HEADING = re.compile(
+    r"^(?:abstract|introduction|background|related work|preliminaries|method(?:s|ology)?|approach|"
+    r"experiments?|experimental setup|evaluation|results|discussion|analysis|limitations|"
+    r"conclusions?|future work|acknowledg(?:e)?ments?|appendix|references|bibliography)\s*:?$",
+    re.IGNORECASE
+)
+TRAILING_SECTIONS = re.compile(r"^(?:references|bibliography)\s*:?$", re.IGNORECASE)
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of LLM tokens in a text
+
+    Uses tiktoken when it is installed, otherwise the usual ~4 characters per token rule.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def split_sections(text: str, drop_references: bool = True) -> List[str]:
+    """
+    Split paper text into sections at heading lines
+
+    Args:
+        text: Full text of the paper
+        drop_references: Stop at the references/bibliography heading
+
+    Returns:
+        List of section texts, each starting with its heading
+    """
+    sections = []
+    current: List[str] = []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped and (NUMBERED_HEADING.match(stripped) or NAMED_HEADING.match(stripped)):
+            if drop_references and TRAILING_SECTIONS.match(stripped):
+                break
+            if current:
+                sections.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+
+    if current:
+        sections.append("\n".join(current).strip())
+    return [section for section in sections if section]
+
+
+def _split_oversized(text: str, max_tokens: int, level: int = 0) -> List[str]:
+    """Split a section that doesn't fit in one chunk at paragraph, then sentence boundaries"""
+    separators = [r"\n\s*\n", r"(?<=[.!?])\s+"]
+    if level >= len(separators):
+        # A single huge sentence: fall back to a hard cut by characters
+        step = max_tokens * 4
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    parts: List[str] = []
+    for piece in re.split(separators[level], text):
+        if not piece.strip():
+            continue
+        if estimate_tokens(piece) <= max_tokens:
+            parts.append(piece)
+        else:
+            parts.extend(_split_oversized(piece, max_tokens, level + 1))
+    return parts
+
+
+def chunk_text(text: str, max_tokens: int = 3000, drop_references: bool = True) -> List[str]:
+    """
+    Split paper text into token-bounded chunks along section boundaries
+
+    Consecutive sections are packed into the same chunk while they fit;
+    sections larger than max_tokens are split at paragraph or sentence boundaries.
+
+    Args:
+        text: Full text of the paper
+        max_tokens: Maximum estimated tokens per chunk
+        drop_references: Leave out the references/bibliography section
+
+    Returns:
+        List of chunk texts in document order
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    for section in split_sections(text, drop_references):
+        section_tokens = estimate_tokens(section)
+        parts = [section] if section_tokens <= max_tokens else _split_oversized(section, max_tokens)
+
+        for part in parts:
+            part_tokens = estimate_tokens(part)
+            if current and current_tokens + part_tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current = []
+                current_tokens = 0
+            current.append(part)
+            current_tokens += part_tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
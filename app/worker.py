@@ -0,0 +1,32 @@
+import asyncio
+import signal
+
+from app.services.http_client import get_http_client
+from app.pipeline import executor, scheduler, start_background_tasks, stop_background_tasks
+
+
+async def run_worker() -> None:
+    """Run queued pipeline jobs until the process receives SIGINT or SIGTERM"""
+    if not scheduler.queue.shared:
+        raise RuntimeError("Workers need a shared JOB_QUEUE_URL (sqlite:// or redis://)")
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+
+    scheduler.start()
+    start_background_tasks()
+    print(f"Worker running {scheduler.workers} jobs at a time from the {scheduler.queue.name} queue")
+    try:
+        await stopping.wait()
+    finally:
+        # Unfinished jobs go back to the queue for another worker
+        await stop_background_tasks()
+        await scheduler.stop()
+        executor.shutdown(wait=False)
+        await get_http_client().aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
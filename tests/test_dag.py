@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from app.services.dag import Stage, StageGraph, StopPipeline
+
+
+def recorder(log, name, result=None, delay=0.0, error=None):
+    """Stage function appending its name to log when it starts and when it ends"""
+    async def run(dag_run):
+        log.append(f"start:{name}")
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        log.append(f"end:{name}")
+        return result if result is not None else name
+    return run
+
+
+def test_stages_run_after_their_requirements():
+    log = []
+    graph = StageGraph([
+        Stage("save", recorder(log, "save"), requires=["draft", "metadata"]),
+        Stage("draft", recorder(log, "draft", delay=0.05), requires=["fetch"]),
+        Stage("metadata", recorder(log, "metadata"), requires=["fetch"]),
+        Stage("fetch", recorder(log, "fetch"))
+    ])
+    assert graph.order == ["fetch", "draft", "metadata", "save"]
+
+    run = asyncio.run(graph.run({"task_id": "t"}))
+    assert run.results == {"fetch": "fetch", "draft": "draft", "metadata": "metadata", "save": "save"}
+    assert run.context == {"task_id": "t"}
+    # Independent stages start together; save waits for both
+    assert log.index("start:metadata") < log.index("end:draft")
+    assert log[-2:] == ["start:save", "end:save"]
+    # draft took longest, so it is what save actually waited for
+    assert run.critical_path() == ["fetch", "draft", "save"]
+    assert set(run.timings()) == {"fetch", "draft", "metadata", "save"}
+
+
+def test_invalid_graphs_are_rejected():
+    async def noop(dag_run):
+        return None
+
+    with pytest.raises(ValueError, match="Duplicate"):
+        StageGraph([Stage("a", noop), Stage("a", noop)])
+    with pytest.raises(ValueError, match="unknown"):
+        StageGraph([Stage("a", noop, requires=["b"])])
+    with pytest.raises(ValueError, match="cycle"):
+        StageGraph([Stage("a", noop, requires=["b"]), Stage("b", noop, requires=["a"])])
+
+
+def test_optional_stage_failure_leaves_none():
+    log = []
+    graph = StageGraph([
+        Stage("fetch", recorder(log, "fetch")),
+        Stage("lookup", recorder(log, "lookup", error=RuntimeError("lookup down")), requires=["fetch"], optional=True),
+        Stage("save", recorder(log, "save"), requires=["lookup"])
+    ])
+
+    run = asyncio.run(graph.run())
+    assert run.results["lookup"] is None
+    assert run.errors == {"lookup": "lookup down"}
+    assert run.results["save"] == "save"
+
+
+def test_required_stage_failure_cancels_the_run():
+    log = []
+    finished = []
+    graph = StageGraph([
+        Stage("fetch", recorder(log, "fetch", error=ValueError("bad pdf"))),
+        Stage("slow", recorder(log, "slow", delay=5)),
+        Stage("draft", recorder(log, "draft"), requires=["fetch"])
+    ])
+
+    with pytest.raises(ValueError, match="bad pdf"):
+        asyncio.run(graph.run(on_finish=finished.append))
+    # The independent stage was cancelled and dependants never started
+    assert "end:slow" not in log
+    assert "start:draft" not in log
+    run = finished[0]
+    assert "slow" not in run.started
+    assert list(run.timings()) == ["fetch"]
+
+
+def test_stop_pipeline_ends_the_run_early():
+    log = []
+
+    async def reuse_cached(dag_run):
+        raise StopPipeline()
+
+    graph = StageGraph([
+        Stage("lookup", reuse_cached),
+        Stage("draft", recorder(log, "draft"), requires=["lookup"])
+    ])
+
+    run = asyncio.run(graph.run())
+    assert run.stopped
+    assert "draft" not in run.results
+    assert log == []
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from app.services.job_queue import LocalRedis, RedisJobQueue, SqliteJobQueue
+from app.services.scheduler import JobScheduler
+
+
+def test_redis_queue_runs_jobs_by_priority():
+    queue = RedisJobQueue(LocalRedis())
+    scheduler = JobScheduler(workers=1, queue=queue)
+    ran = []
+    started = asyncio.Event()
+
+    async def run_paper(name):
+        ran.append(name)
+
+    async def run_blocking(name):
+        ran.append(name)
+        started.set()
+        await asyncio.Event().wait()
+
+    scheduler.register(run_paper, run_blocking)
+    jobs = [
+        ("background-1", run_blocking, "background"),
+        ("bulk-1", run_paper, "bulk"),
+        ("interactive-1", run_paper, "interactive"),
+        ("bulk-2", run_paper, "bulk"),
+        ("interactive-2", run_paper, "interactive")
+    ]
+
+    async def run_jobs():
+        for name, func, priority in jobs:
+            scheduler.submit(name, func, name, priority=priority)
+        assert queue.depth() == {"interactive": 2, "bulk": 2, "background": 1}
+
+        scheduler.start()
+        # The background job only starts once the more urgent classes are empty
+        await asyncio.wait_for(started.wait(), 5)
+        assert ran == ["interactive-1", "interactive-2", "bulk-1", "bulk-2", "background-1"]
+        assert queue.depth() == {"interactive": 0, "bulk": 0, "background": 0}
+        # Finished jobs are acknowledged; only the running one is still claimed
+        assert len(queue.client.hgetall(queue._claimed_key)) == 1
+
+        # Stopping hands the unfinished job back to the queue
+        await scheduler.stop()
+        assert queue.depth() == {"interactive": 0, "bulk": 0, "background": 1}
+        assert queue.client.hgetall(queue._claimed_key) == {}
+
+    asyncio.run(run_jobs())
+
+
+def test_redis_queue_redelivers_unacknowledged_jobs():
+    client = LocalRedis()
+    queue = RedisJobQueue(client)
+    # A second worker sharing the same server
+    other_worker = RedisJobQueue(client)
+    for job_id in ("paper-a", "paper-b"):
+        queue.put({"job_id": job_id, "priority": "bulk", "name": "run_paper", "args": [], "kwargs": {}, "enqueued_at": 0})
+
+    async def claim_and_redeliver():
+        # A worker claims a job and disappears without acknowledging it
+        abandoned = await queue.get(timeout=1)
+        assert abandoned["job_id"] == "paper-a"
+        assert queue.depth()["bulk"] == 1
+        assert queue.requeue_stale(3600) == 0
+
+        # Once the visibility timeout has passed the job goes back to the front of its class
+        assert other_worker.requeue_stale(0) == 1
+        redelivered = await other_worker.get(timeout=1)
+        assert redelivered["job_id"] == "paper-a"
+        assert redelivered["claim_id"] == abandoned["claim_id"]
+        other_worker.ack(redelivered)
+        assert other_worker.requeue_stale(0) == 0
+
+        # A released job is delivered again straight away
+        released = await queue.get(timeout=1)
+        assert released["job_id"] == "paper-b"
+        queue.release(released)
+        assert queue.depth()["bulk"] == 1
+        again = await other_worker.get(timeout=1)
+        assert again["job_id"] == "paper-b"
+        other_worker.ack(again)
+
+        assert queue.depth() == {"interactive": 0, "bulk": 0, "background": 0}
+        assert client.hgetall(queue._claimed_key) == {}
+        assert await queue.get(timeout=1) is None
+
+    asyncio.run(claim_and_redeliver())
+
+
+def test_redis_queue_recovers_jobs_claimed_without_a_lease():
+    queue = RedisJobQueue(LocalRedis())
+    queue.put({"job_id": "paper-a", "priority": "bulk", "name": "run_paper", "args": [], "kwargs": {}, "enqueued_at": 0})
+    # A worker died right after moving the job to the processing list
+    queue.client.lmove("papers:jobs:bulk", queue._processing_key, "RIGHT", "LEFT")
+    assert queue.depth()["bulk"] == 0
+
+    # The first pass starts the visibility clock, a later one requeues the job
+    assert queue.requeue_stale(0) == 0
+    assert queue.requeue_stale(0) == 1
+    assert queue.depth()["bulk"] == 1
+    assert queue.client.lrange(queue._processing_key, 0, -1) == []
+
+
+@pytest.fixture(params=["redis", "sqlite"])
+def shared_queue(request, tmp_path):
+    """A shared queue backend, with jobs visible to every worker"""
+    if request.param == "redis":
+        client = LocalRedis()
+        return lambda: RedisJobQueue(client, poll_seconds=0.05)
+    return lambda: SqliteJobQueue(str(tmp_path / "jobs.db"), poll_seconds=0.05)
+
+
+def test_expired_claim_cannot_ack_the_requeued_job(shared_queue):
+    worker, other_worker = shared_queue(), shared_queue()
+    worker.put({"job_id": "paper-a", "priority": "interactive", "name": "run_paper", "args": [], "kwargs": {}, "enqueued_at": 0})
+
+    async def take_over():
+        slow = await worker.get(timeout=1)
+        assert worker.extend_lease(slow)
+        # The slow worker's lease expires and another worker takes the job over
+        assert other_worker.requeue_stale(0) == 1
+        taken = await other_worker.get(timeout=1)
+        assert taken["job_id"] == "paper-a"
+
+        # The slow worker can no longer renew, acknowledge or release it
+        assert not worker.extend_lease(slow)
+        worker.ack(slow)
+        worker.release(slow)
+        assert other_worker.extend_lease(taken)
+        assert other_worker.depth()["interactive"] == 0
+        assert other_worker.requeue_stale(3600) == 0
+
+        other_worker.ack(taken)
+        assert other_worker.requeue_stale(0) == 0
+        assert await worker.get(timeout=0.1) is None
+
+    asyncio.run(take_over())
+
+
+def test_running_jobs_extend_their_lease(shared_queue):
+    queue = shared_queue()
+    # The scheduler's own reaper checks for expired claims every 0.15 seconds
+    scheduler = JobScheduler(workers=2, queue=queue, visibility_timeout=0.3)
+    runs = []
+
+    async def run_slow_paper():
+        runs.append("slow")
+        await asyncio.sleep(1)
+
+    scheduler.register(run_slow_paper)
+
+    async def run_job():
+        scheduler.submit("slow", run_slow_paper, priority="bulk")
+        scheduler.start()
+        try:
+            await asyncio.sleep(1.2)
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(run_job())
+    # The job ran past the visibility timeout without being handed out again
+    assert len(runs) == 1
+    assert queue.depth() == {"interactive": 0, "bulk": 0, "background": 0}
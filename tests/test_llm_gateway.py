@@ -0,0 +1,197 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import openai
+import pytest
+
+from app.services.http_client import get_http_client
+from app.services.llm_gateway import LlmGateway
+
+
+def completion(content, finish_reason="stop"):
+    """Chat completion response body"""
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4-turbo",
+        "choices": [{"index": 0, "finish_reason": finish_reason, "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 3, "total_tokens": 15}
+    }
+
+
+class StubOpenAI(BaseHTTPRequestHandler):
+    """Minimal OpenAI API: chat completions (with scripted 429s), file uploads and batches"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        payload = body.encode("utf-8") if isinstance(body, str) else json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        state = self.server.state
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/v1/chat/completions":
+            state["chat_calls"] += 1
+            if state["rate_limited"] > 0:
+                state["rate_limited"] -= 1
+                self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after": "0.05"})
+                return
+            messages = json.loads(body)["messages"]
+            self._send(200, completion("echo: " + messages[-1]["content"]))
+        elif self.path == "/v1/files":
+            # Keep the JSONL lines of the multipart upload
+            lines = [line for line in body.decode("utf-8").splitlines() if line.startswith('{"custom_id"')]
+            file_id = f"file-{len(state['files'])}"
+            state["files"][file_id] = lines
+            self._send(200, {"id": file_id, "object": "file", "purpose": "batch"})
+        elif self.path == "/v1/batches":
+            request = json.loads(body)
+            state["batch_posts"] += 1
+            if state["batch_errors"] > 0:
+                # The server fails after accepting the request
+                state["batch_errors"] -= 1
+                self._send(500, {"error": {"message": "internal error"}})
+                return
+            batch_id = f"batch-{len(state['batches'])}"
+            output, errors = [], []
+            for line in state["files"][request["input_file_id"]]:
+                item = json.loads(line)
+                if "fail" in item["body"]["messages"][-1]["content"]:
+                    errors.append(json.dumps({
+                        "custom_id": item["custom_id"],
+                        "response": {"status_code": 400, "body": {"error": {"message": "bad request"}}}
+                    }))
+                else:
+                    output.append(json.dumps({
+                        "custom_id": item["custom_id"],
+                        "response": {"status_code": 200, "body": completion("batched: " + item["body"]["messages"][-1]["content"])}
+                    }))
+            state["files"][f"{batch_id}-output"] = output
+            state["files"][f"{batch_id}-errors"] = errors
+            state["batches"][batch_id] = {"id": batch_id, "status": "in_progress", "input_file_id": request["input_file_id"]}
+            self._send(200, state["batches"][batch_id])
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_GET(self):
+        state = self.server.state
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["v1", "batches"]:
+            batch = state["batches"][parts[2]]
+            # The first poll finds the batch still running
+            if batch["status"] == "in_progress" and batch.setdefault("polls", 0) > 0:
+                batch.update(status="completed", output_file_id=f"{parts[2]}-output", error_file_id=f"{parts[2]}-errors")
+            batch["polls"] += 1
+            self._send(200, batch)
+        elif parts[:2] == ["v1", "files"] and parts[-1] == "content":
+            self._send(200, "\n".join(state["files"][parts[2]]))
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    """Run the stub API on a free local port and point OPENAI_BASE_URL at it"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOpenAI)
+    server.state = {"chat_calls": 0, "rate_limited": 0, "batch_posts": 0, "batch_errors": 0, "files": {}, "batches": {}}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    yield server.state
+    server.shutdown()
+    server.server_close()
+
+
+def test_rate_limited_requests_are_retried(stub_api):
+    stub_api["rate_limited"] = 2
+    gateway = LlmGateway(tokens_per_minute=600, max_retries=3, backoff_factor=0.01)
+
+    content = asyncio.run(gateway.chat([{"role": "user", "content": "hello"}], max_tokens=50))
+
+    assert content == "echo: hello"
+    assert stub_api["chat_calls"] == 3
+    stats = gateway.stats()
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 2
+    assert stats["failures"] == 0
+    assert stats["prompt_tokens"] == 12
+    # The base URL comes from OPENAI_BASE_URL
+    assert stats["base_url"].startswith("http://127.0.0.1:")
+    # Only the successful attempt is charged against the token rate (within a little refill)
+    assert gateway.token_limiter.available == pytest.approx(gateway.tokens_per_minute - 15, abs=5)
+
+
+def test_rate_limit_retries_give_up_after_max_retries(stub_api):
+    stub_api["rate_limited"] = 5
+    gateway = LlmGateway(max_retries=1, backoff_factor=0.01)
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(gateway.chat([{"role": "user", "content": "hello"}], max_tokens=50))
+
+    assert stub_api["chat_calls"] == 2
+    assert gateway.stats()["failures"] == 1
+
+
+def test_batch_submit_and_collect(stub_api):
+    gateway = LlmGateway()
+    requests = [
+        {
+            "custom_id": f"draft:{name}",
+            "body": {"model": "gpt-4-turbo", "messages": [{"role": "user", "content": name}], "temperature": 0.3, "max_tokens": 100}
+        }
+        for name in ("paper-a", "paper-b", "fail-c")
+    ]
+
+    async def submit_and_collect():
+        try:
+            batch_id = await gateway.submit_batch(requests)
+            first = await gateway.get_batch(batch_id)
+            finished = await gateway.get_batch(batch_id)
+            return batch_id, first, finished, await gateway.batch_results(finished)
+        finally:
+            await get_http_client().aclose()
+
+    batch_id, first, finished, results = asyncio.run(submit_and_collect())
+
+    assert batch_id == "batch-0"
+    assert len(stub_api["files"]["file-0"]) == 3
+    assert first["status"] == "in_progress"
+    assert finished["status"] == "completed"
+    assert results["draft:paper-a"] == {"content": "batched: paper-a"}
+    assert results["draft:paper-b"] == {"content": "batched: paper-b"}
+    assert results["draft:fail-c"] == {"error": "bad request"}
+    assert gateway.stats()["prompt_tokens"] == 24
+
+
+def test_batch_submission_is_not_retried(stub_api):
+    stub_api["batch_errors"] = 1
+    gateway = LlmGateway()
+    requests = [{
+        "custom_id": "draft:paper-a",
+        "body": {"model": "gpt-4-turbo", "messages": [{"role": "user", "content": "paper-a"}], "max_tokens": 100}
+    }]
+
+    async def submit():
+        try:
+            await gateway.submit_batch(requests)
+        finally:
+            await get_http_client().aclose()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(submit())
+    # A retry could create a second batch for the same requests
+    assert stub_api["batch_posts"] == 1
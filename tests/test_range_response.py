@@ -0,0 +1,92 @@
+from email.utils import formatdate
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.range_response import ranged_file_response
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "summary.mp3"
+    path.write_bytes(CONTENT)
+    app = FastAPI()
+
+    @app.get("/audio")
+    def audio(request: Request):
+        return ranged_file_response(request, str(path), "audio/mpeg")
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_whole_file_with_validators(client):
+    response = client.get("/audio")
+    assert response.status_code == 200
+    assert response.content == CONTENT
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["etag"].startswith('"')
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+    ("bytes=1000-5000", 1000, 1023),
+])
+def test_partial_content(client, header, start, end):
+    response = client.get("/audio", headers={"range": header})
+    assert response.status_code == 206
+    assert response.content == CONTENT[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(CONTENT)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=1024-", "bytes=500-400", "bytes=-0"])
+def test_unsatisfiable_range(client, header):
+    response = client.get("/audio", headers={"range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "items=0-1", "bytes=x-y"])
+def test_ignored_range_serves_whole_file(client, header):
+    response = client.get("/audio", headers={"range": header})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+
+def test_if_none_match_uses_weak_comparison(client):
+    etag = client.get("/audio").headers["etag"]
+    assert client.get("/audio", headers={"if-none-match": etag}).status_code == 304
+    assert client.get("/audio", headers={"if-none-match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get("/audio", headers={"if-none-match": "*"}).status_code == 304
+    assert client.get("/audio", headers={"if-none-match": '"other"'}).status_code == 200
+
+
+def test_if_range_requires_a_strong_match(client):
+    response = client.get("/audio")
+    etag = response.headers["etag"]
+
+    current = client.get("/audio", headers={"range": "bytes=0-9", "if-range": etag})
+    assert current.status_code == 206
+    assert current.content == CONTENT[:10]
+
+    # A weak or outdated validator gets the whole file instead of a range
+    for validator in (f"W/{etag}", '"outdated"'):
+        stale = client.get("/audio", headers={"range": "bytes=0-9", "if-range": validator})
+        assert stale.status_code == 200
+        assert stale.content == CONTENT
+
+
+def test_if_range_date(client):
+    last_modified = client.get("/audio").headers["last-modified"]
+    current = client.get("/audio", headers={"range": "bytes=0-9", "if-range": last_modified})
+    assert current.status_code == 206
+
+    stale = client.get("/audio", headers={"range": "bytes=0-9", "if-range": formatdate(0, usegmt=True)})
+    assert stale.status_code == 200
+    assert stale.content == CONTENT
@@ -0,0 +1,76 @@
+import pytest
+
+from app.models.paper import PaperMetadata, PaperSummary
+from app.services.search_index import SummarySearchIndex
+
+
+def paper(title, authors, summary, key_findings=()):
+    return PaperSummary(
+        paper_id=title,
+        metadata=PaperMetadata(title=title, authors=list(authors), abstract="", source="upload"),
+        summary=summary,
+        key_findings=list(key_findings),
+        methodology="",
+        implications=""
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SummarySearchIndex(str(tmp_path / "search.db"))
+    index.index("transformers", paper(
+        "Attention Is All You Need", ["Ashish Vaswani", "Noam Shazeer"],
+        "A sequence transduction model based solely on attention mechanisms.",
+        ["Self-attention replaces recurrence"]
+    ))
+    index.index("resnets", paper(
+        "Deep Residual Learning for Image Recognition", ["Kaiming He"],
+        "Residual connections make very deep convolutional networks trainable, unlike plain attention-free stacks.",
+        ["Residual networks won ImageNet 2015"]
+    ))
+    index.index("graphs", paper(
+        "Graph Attention Networks", ["Petar Velickovic"],
+        "Masked self-attention layers applied to graph-structured data.",
+    ))
+    return index
+
+
+def test_search_ranks_title_matches_first(index):
+    results = index.search("attention")
+    ids = [result["summary_id"] for result in results]
+    assert set(ids[:2]) == {"transformers", "graphs"}
+    # A match only in the summary body ranks below title matches
+    assert ids[2] == "resnets"
+    assert results[0]["score"] >= results[1]["score"] >= results[2]["score"]
+    assert "[" in results[0]["snippet"]
+
+
+def test_search_requires_every_word_and_stems(index):
+    assert [result["summary_id"] for result in index.search("residual networks")] == ["resnets"]
+    # Porter stemming matches "recognizing" against "Recognition"
+    assert [result["summary_id"] for result in index.search("image recognizing")] == ["resnets"]
+    assert index.search("attention imagenet")[0]["summary_id"] == "resnets"
+
+
+def test_last_word_matches_as_a_prefix(index):
+    assert [result["summary_id"] for result in index.search("vasw")] == ["transformers"]
+    assert index.search("vasw")[0]["authors"] == ["Ashish Vaswani", "Noam Shazeer"]
+
+
+def test_query_syntax_is_not_interpreted(index):
+    assert index.search('"graph" OR NOT (') == []
+    assert index.search("graph -data")[0]["summary_id"] == "graphs"
+    assert index.search("  ") == []
+
+
+def test_reindexing_replaces_the_document(index):
+    index.index("graphs", paper("Graph Convolutional Networks", ["Thomas Kipf"], "Spectral convolutions on graphs."))
+
+    assert [result["summary_id"] for result in index.search("attention")] == ["transformers", "resnets"]
+    assert [result["summary_id"] for result in index.search("spectral")] == ["graphs"]
+
+
+def test_semantic_search(index):
+    results = index.search_semantic("residual learning for deep image recognition networks", limit=2)
+    assert results[0]["summary_id"] == "resnets"
+    assert len(results) <= 2
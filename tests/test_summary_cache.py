@@ -0,0 +1,103 @@
+import pytest
+
+from app.services import summary_cache as summary_cache_module
+from app.services.summary_cache import SummaryCache, normalize_doi, normalize_url
+
+
+class Clock:
+    """Stand-in for the time module with a manually advanced time()"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(summary_cache_module, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("source", [
+    "https://arxiv.org/abs/2304.02924",
+    "http://arxiv.org/abs/2304.02924v3",
+    "https://www.arxiv.org/pdf/2304.02924v1.pdf",
+    "https://export.arxiv.org/pdf/2304.02924/",
+    "https://doi.org/10.48550/arXiv.2304.02924",
+])
+def test_arxiv_urls_share_one_alias(source):
+    assert normalize_url(source) == "arxiv:2304.02924"
+
+
+@pytest.mark.parametrize("source", [
+    "10.48550/arXiv.2304.02924",
+    "doi:10.48550/ARXIV.2304.02924v2",
+    " https://dx.doi.org/10.48550/arxiv.2304.02924 ",
+])
+def test_arxiv_dois_share_the_arxiv_alias(source):
+    assert normalize_doi(source) == "arxiv:2304.02924"
+
+
+def test_old_style_arxiv_ids():
+    assert normalize_url("https://arxiv.org/abs/hep-th/9901001v2") == "arxiv:hep-th/9901001"
+    assert normalize_doi("10.48550/arXiv.hep-th/9901001") == "arxiv:hep-th/9901001"
+
+
+def test_dois_and_urls():
+    assert normalize_doi("10.1000/ABC.123") == "doi:10.1000/abc.123"
+    assert normalize_doi("doi: 10.1000/abc.123") == "doi:10.1000/abc.123"
+    assert normalize_url("https://doi.org/10.1000/ABC.123") == "doi:10.1000/abc.123"
+    assert normalize_url("HTTPS://WWW.Example.com/papers/a.pdf/#page=2") == "url:https://example.com/papers/a.pdf"
+    # Query strings can select different documents, so they are kept
+    assert normalize_url("https://example.com/get?id=1") != normalize_url("https://example.com/get?id=2")
+
+
+def test_aliases_resolve_to_the_cached_summary(tmp_path, clock):
+    cache = SummaryCache(str(tmp_path / "cache.db"))
+    cache.put("hash-a", "summary-a", size_bytes=100, aliases=[normalize_url("https://arxiv.org/abs/2304.02924")])
+
+    assert cache.lookup_alias(normalize_doi("10.48550/arXiv.2304.02924v2")) == ("hash-a", "summary-a")
+    assert cache.lookup_alias(normalize_url("https://example.com/other.pdf")) is None
+    cache.add_aliases("hash-a", [normalize_url("https://example.com/other.pdf")])
+    assert cache.lookup_alias("url:https://example.com/other.pdf") == ("hash-a", "summary-a")
+
+    cache.invalidate("hash-a")
+    assert cache.lookup_hash("hash-a") is None
+    assert cache.lookup_alias("arxiv:2304.02924") is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = SummaryCache(str(tmp_path / "cache.db"), max_entries=2)
+    cache.put("hash-a", "summary-a", aliases=["doi:10.1/a"])
+    clock.now += 1
+    cache.put("hash-b", "summary-b", aliases=["doi:10.1/b"])
+    clock.now += 1
+    # Using a makes b the least recently used entry
+    assert cache.lookup_hash("hash-a") == "summary-a"
+    clock.now += 1
+    cache.put("hash-c", "summary-c")
+
+    assert cache.lookup_hash("hash-b") is None
+    assert cache.lookup_alias("doi:10.1/b") is None
+    assert cache.lookup_alias("doi:10.1/a") == ("hash-a", "summary-a")
+    assert cache.lookup_hash("hash-c") == "summary-c"
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_entries_are_evicted(tmp_path, clock):
+    cache = SummaryCache(str(tmp_path / "cache.db"), max_age_seconds=100)
+    cache.put("hash-a", "summary-a", aliases=["doi:10.1/a"])
+    clock.now += 50
+    cache.put("hash-b", "summary-b")
+    clock.now += 60
+
+    # Expired entries miss even before they are evicted
+    assert cache.lookup_hash("hash-a") is None
+    assert cache.evict() == 1
+    assert cache.lookup_alias("doi:10.1/a") is None
+    assert cache.lookup_hash("hash-b") == "summary-b"
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
@@ -0,0 +1,80 @@
+import os
+
+import pytest
+
+from app.services import text_cache as text_cache_module
+from app.services.text_cache import TextCache
+
+PAGES = [f"Page {number} " + "lorem ipsum " * 40 for number in range(5)]
+
+
+class Clock:
+    """Stand-in for the time module with a manually advanced time()"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(text_cache_module, "time", clock)
+    return clock
+
+
+def make_cache(tmp_path, **kwargs):
+    return TextCache(str(tmp_path / "cache.db"), cache_dir=str(tmp_path / "text"), codec="zlib", **kwargs)
+
+
+def test_page_ranges_round_trip(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put("hash-a", PAGES, complete=True)
+
+    assert cache.get_pages("hash-a") == PAGES
+    assert cache.get_pages("hash-a", 1, 3) == PAGES[1:3]
+    assert cache.get_pages("hash-b") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 2, 1)
+    assert stats["compression_ratio"] > 1
+
+
+def test_partial_entries_only_serve_what_was_extracted(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put("hash-a", PAGES[:2], complete=False)
+
+    assert cache.get_pages("hash-a", 0, 2) == PAGES[:2]
+    assert cache.get_pages("hash-a", 0, 4) is None
+    assert cache.get_pages("hash-a", min_chars=sum(len(page) for page in PAGES)) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    for content_hash in ("hash-a", "hash-b"):
+        cache.put(content_hash, PAGES, complete=True)
+        clock.now += 1
+    entry_bytes = cache.stats()["size_bytes"] // 2
+
+    # Room for two entries; reading a makes b the least recently used one
+    cache.max_bytes = entry_bytes * 2
+    assert cache.get_pages("hash-a", 0, 1) == PAGES[:1]
+    clock.now += 1
+    cache.put("hash-c", PAGES, complete=True)
+
+    assert cache.get_pages("hash-b") is None
+    assert not os.path.exists(cache._path("hash-b"))
+    assert cache.get_pages("hash-a") == PAGES
+    assert cache.get_pages("hash-c") == PAGES
+    assert cache.stats()["size_bytes"] <= cache.max_bytes
+
+
+def test_damaged_entries_are_dropped(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put("hash-a", PAGES, complete=True)
+    with open(cache._path("hash-a"), "wb") as f:
+        f.write(b"not compressed text")
+
+    assert cache.get_pages("hash-a") is None
+    assert cache.stats()["entries"] == 0